@@ -0,0 +1,131 @@
+import logging
+import os
+
+# MongoDB connection and connection pool, timeouts of 0 mean no timeout
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DATABASE = os.getenv("MONGO_DATABASE", "UsersDubgetData")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000")) or None
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")) or None
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+
+# Write concern of every write: MONGO_WRITE_W is a number of nodes or "majority", unset uses the server default
+MONGO_WRITE_W = os.getenv("MONGO_WRITE_W")
+MONGO_WRITE_W = int(MONGO_WRITE_W) if MONGO_WRITE_W and MONGO_WRITE_W.isdigit() else MONGO_WRITE_W
+MONGO_WRITE_JOURNAL = os.getenv("MONGO_WRITE_JOURNAL", "").lower() in ("1", "true", "yes") or None
+MONGO_WRITE_TIMEOUT_MS = int(os.getenv("MONGO_WRITE_TIMEOUT_MS", "0")) or None
+
+# Known-user cache used when validating operation writes
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("USER_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "100000"))
+
+# Bulk operation ingest
+BULK_MAX_OPERATIONS = int(os.getenv("BULK_MAX_OPERATIONS", "50000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+# Streaming operation import: rows per batch, largest batch a request may ask for, and longest line or
+# CSV record in characters
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+MAX_IMPORT_BATCH_SIZE = int(os.getenv("MAX_IMPORT_BATCH_SIZE", "10000"))
+IMPORT_MAX_LINE_LENGTH = int(os.getenv("IMPORT_MAX_LINE_LENGTH", str(64 * 1024)))
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+
+# Operation listings
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "1000"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "10000"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+# Chart rendering worker processes, 0 renders on the event loop
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "32"))
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "10"))
+
+# Largest number of buckets a bucketed aggregation may return
+MAX_BUCKETS = int(os.getenv("MAX_BUCKETS", "10000"))
+
+# Rendered chart cache
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CHART_CACHE_CONTROL = os.getenv("CHART_CACHE_CONTROL", "private, no-cache")
+
+# Token expected in the X-Admin-Token header of /admin requests, /admin is disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def parse_sample_rate(value: str) -> float:
+    """
+    Parse a share of requests, clamped to [0, 1].
+
+    Args:
+        value (str): The share, e.g. "0.1".
+
+    Returns:
+        float: The share.
+
+    Raises:
+        ValueError: If the value is not a number.
+    """
+
+    rate = float(value)
+    if rate != rate:
+        raise ValueError(f"Rate is not a number: {value!r}")
+    return min(max(rate, 0.0), 1.0)
+
+
+def parse_sample_rates(value: str) -> dict:
+    """
+    Parse shares of requests per route from "route template=rate,...", skipping the entries that are not valid.
+
+    Args:
+        value (str): The setting.
+
+    Returns:
+        dict: The share of each route template.
+    """
+
+    rates = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        route, separator, rate = item.rpartition("=")
+        try:
+            if not separator or not route.strip():
+                raise ValueError("Expected route template=rate")
+            rates[route.strip()] = parse_sample_rate(rate)
+        except ValueError as e:
+            logging.getLogger(__name__).warning(f"Ignored LOG_SAMPLE_RATES entry {item!r}: {e}")
+    return rates
+
+
+
+def sample_rate_setting(name: str, default: str) -> float:
+    """
+    Read a share of requests from an environment variable, falling back to the default if it is not a number.
+
+    Args:
+        name (str): The environment variable.
+        default (str): The share used when the variable is unset or not valid.
+
+    Returns:
+        float: The share, clamped to [0, 1].
+    """
+
+    try:
+        return parse_sample_rate(os.getenv(name, default))
+    except ValueError as e:
+        logging.getLogger(__name__).warning(f"Ignored {name}: {e}")
+        return parse_sample_rate(default)
+
+# Logging: level, file, longest logged argument or result summary, and share of the requests logged,
+# overall and for some routes given as "route template=rate,..."
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "200"))
+LOG_SAMPLE_RATE = sample_rate_setting("LOG_SAMPLE_RATE", "1")
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+# Profiling: share of the requests profiled, besides requests sent with an X-Profile header equal to ADMIN_TOKEN,
+# number of profiles kept and number of functions kept per profile
+PROFILE_SAMPLE_RATE = sample_rate_setting("PROFILE_SAMPLE_RATE", "0")
+PROFILE_MAX_COUNT = int(os.getenv("PROFILE_MAX_COUNT", "50"))
+PROFILE_MAX_FUNCTIONS = int(os.getenv("PROFILE_MAX_FUNCTIONS", "40"))
@@ -1,15 +1,47 @@
+from contextlib import asynccontextmanager
 import uvicorn
 from fastapi import FastAPI
 from app.routes.user_router import user_router
 from app.routes.operation_router import operation_router
 from app.routes.visualization_router import visualization_router
+from app.routes.admin_router import admin_router
+from app.routes.metrics_router import metrics_router
+from app.services import db_service, index_service, render_pool
+from utils.metrics import metrics_middleware
+from utils.profiling import profiling_middleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Connects to the database, prepares it and starts the chart render workers before the application starts
+    serving requests, and stops the workers and closes the connections when it shuts down.
+
+    Parameters:
+    - app (FastAPI): The application.
+    """
+    db_service.connect()
+    await index_service.ensure_indexes()
+    render_pool.start()
+    yield
+    await render_pool.shutdown()
+    db_service.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Record the count and latency of every request
+app.middleware("http")(metrics_middleware)
+
+# Profile the requests asking for it
+app.middleware("http")(profiling_middleware)
 
 # Include routers for different endpoints
 app.include_router(operation_router, prefix="/operations")
 app.include_router(user_router, prefix="/users")
 app.include_router(visualization_router, prefix="/visualization")
+app.include_router(admin_router, prefix="/admin")
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     # Run the application using Uvicorn server
@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import sys
+from app import config
+from app.services import db_service, operations_service, import_service, index_service
+
+
+async def rebuild_rollups(args):
+    """
+    Recomputes the monthly totals from the raw operations.
+
+    Parameters:
+    - args (Namespace): Parsed command line arguments.
+
+    Returns:
+    - int: Exit code.
+    """
+    rebuilt = await operations_service.rebuild_monthly_totals(args.user_id)
+    print(f"Rebuilt monthly totals of {rebuilt} user(s)")
+    return 0
+
+
+async def verify_rollups(args):
+    """
+    Reports monthly totals that drifted from the raw operations.
+
+    Parameters:
+    - args (Namespace): Parsed command line arguments.
+
+    Returns:
+    - int: Exit code, 1 if any drift was found.
+    """
+    drift = await operations_service.verify_monthly_totals(args.user_id)
+    for total in drift:
+        print(f"user {total['userId']} {total['year']}-{total['month']:02d} {total['type']}: "
+              f"expected {total['expected']}, found {total['actual']}")
+    print(f"{len(drift)} drifted monthly total(s)")
+    return 1 if drift else 0
+
+
+async def import_operations(args):
+    """
+    Imports operations from a CSV or NDJSON file, printing the progress after every batch.
+
+    Parameters:
+    - args (Namespace): Parsed command line arguments.
+
+    Returns:
+    - int: Exit code, 1 if any row was rejected.
+    """
+    file_format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    def print_progress(report):
+        print(f"job {report['job_id']}: {report['rows']} rows, {report['inserted']} inserted, "
+              f"{report['failed']} failed, {report['rows_per_second']} rows/s", flush=True)
+
+    report = await import_service.import_operations(read_file(args.path), file_format, args.job_id,
+                                                    args.batch_size, print_progress)
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}")
+    return 1 if report["failed"] else 0
+
+
+async def ensure_indexes(args):
+    """
+    Creates the indexes the services rely on.
+
+    Parameters:
+    - args (Namespace): Parsed command line arguments.
+
+    Returns:
+    - int: Exit code.
+    """
+    built = await index_service.ensure_indexes()
+    print(f"Built {len(built)} index(es): {', '.join(built) or '-'}")
+    return 0
+
+
+async def check_indexes(args):
+    """
+    Explains every service query and reports the ones that scan a whole collection.
+
+    Parameters:
+    - args (Namespace): Parsed command line arguments.
+
+    Returns:
+    - int: Exit code, 1 if any query does not use an index.
+    """
+    plans = await index_service.check_query_plans()
+    unindexed = 0
+    for plan in plans:
+        if plan["indexes"]:
+            print(f"ok        {plan['collection']}: {plan['query']} uses {', '.join(plan['indexes'])}")
+        else:
+            unindexed += 1
+            print(f"NO INDEX  {plan['collection']}: {plan['query']} ({' > '.join(plan['stages'])})")
+    return 1 if unindexed else 0
+
+
+async def read_file(path: str, chunk_size: int = 1 << 16):
+    """
+    Reads a file in chunks.
+
+    Parameters:
+    - path (str): Path of the file.
+    - chunk_size (int): Number of bytes per chunk.
+
+    Yields:
+    - bytes: The next chunk of the file.
+    """
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def build_parser():
+    """
+    Builds the command line parser.
+
+    Returns:
+    - ArgumentParser: The parser with one sub command per maintenance task.
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.manage", description="Maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-rollups", help="recompute monthly totals from operations")
+    rebuild.add_argument("--user-id", type=int, help="only this user")
+    rebuild.set_defaults(handler=rebuild_rollups)
+
+    verify = commands.add_parser("verify-rollups", help="report monthly totals that drifted from operations")
+    verify.add_argument("--user-id", type=int, help="only this user")
+    verify.set_defaults(handler=verify_rollups)
+
+    import_parser = commands.add_parser("import-operations", help="import operations from a CSV or NDJSON file")
+    import_parser.add_argument("path", help="file with a header row (CSV) or one JSON object per line (NDJSON)")
+    import_parser.add_argument("--format", choices=import_service.file_formats,
+                               help="file format, guessed from the extension by default")
+    import_parser.add_argument("--job-id", help="resume the import with this job ID")
+    import_parser.add_argument("--batch-size", type=int, default=config.IMPORT_BATCH_SIZE,
+                               help="rows written per batch")
+    import_parser.set_defaults(handler=import_operations)
+
+    ensure = commands.add_parser("ensure-indexes", help="create the indexes the services rely on")
+    ensure.set_defaults(handler=ensure_indexes)
+
+    check = commands.add_parser("check-indexes", help="explain every service query and report collection scans")
+    check.set_defaults(handler=check_indexes)
+
+    return parser
+
+
+async def run(args):
+    """
+    Runs a command with its own database connections.
+
+    Parameters:
+    - args (Namespace): Parsed command line arguments.
+
+    Returns:
+    - int: Exit code.
+    """
+    db_service.connect()
+    try:
+        return await args.handler(args)
+    finally:
+        db_service.close()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
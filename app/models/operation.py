@@ -1,12 +1,11 @@
 from datetime import datetime
 from pydantic import BaseModel, field_validator
-from app.services import users_service
 from app.models.operation_type import Operation_type
 
 
-class Operation(BaseModel):
+class OperationBase(BaseModel):
     """
-    Represents an operation.
+    Fields shared by every representation of an operation.
 
     Attributes:
     - id (int): The unique identifier for the operation.
@@ -22,6 +21,17 @@ class Operation(BaseModel):
     type: Operation_type
     date: datetime
 
+    class Config:
+        use_enum_values = True
+
+
+class Operation(OperationBase):
+    """
+    Represents an operation sent by a client.
+
+    The existence of the user is checked asynchronously by operations_service when the operation is written.
+    """
+
     @field_validator('sum')
     def check_sum(cls, sum):
         """
@@ -40,24 +50,29 @@ class Operation(BaseModel):
             raise ValueError('Sum cannot be negative')
         return sum
 
-    @field_validator('userId')
-    def check_user_id(cls, userId):
+
+class StoredOperation(OperationBase):
+    """
+    Represents an operation that was already validated and stored in the database.
+
+    Used on the read path: it has no validators, so building it never touches the database.
+    """
+
+    @classmethod
+    def from_document(cls, document: dict):
         """
-        Validates that the user associated with the operation exists.
+        Builds an operation from a database document without running validation.
 
         Parameters:
-        - userId (int): The ID of the user.
-
-        Raises:
-        - ValueError: If the user does not exist.
+        - document (dict): The operation document as returned by the database.
 
         Returns:
-        - int: The validated user ID.
+        - StoredOperation: The operation built from the document.
         """
-        user = users_service.get_user_by_id(userId)
-        if not user:
-            raise ValueError('User does not exist')
-        return userId
-
-    class Config:
-        use_enum_values = True
+        return cls.model_construct(
+            id=document["id"],
+            sum=float(document["sum"]),
+            userId=document["userId"],
+            type=document["type"],
+            date=document["date"]
+        )
@@ -0,0 +1,106 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from utils.log import log
+from utils import profiling
+from app import config
+from app.services import chart_cache, single_flight, db_service
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Checks the X-Admin-Token header against the ADMIN_TOKEN setting.
+
+    Parameters:
+    - x_admin_token (str): The X-Admin-Token header of the request.
+
+    Raises:
+    - HTTPException: If ADMIN_TOKEN is not set or the header does not match it.
+    """
+    if not config.ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+
+admin_router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@admin_router.get("/chart_cache")
+@log
+async def get_chart_cache_stats(request: Request):
+    """
+    Retrieves the usage of the rendered chart cache.
+
+    Parameters:
+    - request (Request): The incoming request.
+
+    Returns:
+    - dict: The number of entries, their size and the hit, miss and eviction counters.
+    """
+    return chart_cache.charts.stats()
+
+
+@admin_router.get("/single_flight")
+@log
+async def get_single_flight_stats(request: Request):
+    """
+    Retrieves how many calls of the coalesced service functions were made and how many joined a call in flight.
+
+    Parameters:
+    - request (Request): The incoming request.
+
+    Returns:
+    - dict: The calls in flight, the totals and the counters of each function.
+    """
+    return single_flight.flights.stats()
+
+
+@admin_router.get("/db_pool")
+@log
+async def get_db_pool_stats(request: Request):
+    """
+    Retrieves the usage of the database connection pool.
+
+    Parameters:
+    - request (Request): The incoming request.
+
+    Returns:
+    - dict: The pool settings, the connections open and in use, and the connection event counters.
+    """
+    return db_service.pool_stats.stats()
+
+
+@admin_router.get("/profiles")
+@log
+async def get_profiles(request: Request):
+    """
+    Lists the stored request profiles, newest first.
+
+    Parameters:
+    - request (Request): The incoming request.
+
+    Returns:
+    - list: The id, request, status, duration and database command time of each profile.
+    """
+    return profiling.profiles.summaries()
+
+
+@admin_router.get("/profiles/{profile_id}")
+@log
+async def get_profile(request: Request, profile_id: int):
+    """
+    Retrieves a request profile.
+
+    Parameters:
+    - request (Request): The incoming request.
+    - profile_id (int): The id of the profile, from the X-Profile-Id header of the profiled response.
+
+    Returns:
+    - dict: The request, the functions that took the most time and the database commands of the request.
+
+    Raises:
+    - HTTPException: If the profile does not exist or was dropped.
+    """
+    profile = profiling.profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from starlette.responses import PlainTextResponse
+from utils import metrics
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Exposes the metrics of the process in the Prometheus text format.
+
+    Returns:
+    - PlainTextResponse: Request counts and latencies by route, chart render times and database command latencies.
+    """
+    return PlainTextResponse(metrics.registry.expose(), media_type="text/plain; version=0.0.4")
@@ -1,66 +1,142 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Request
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request, Response, Body, Query
+from app import config
+from starlette.responses import StreamingResponse
 from utils.log import log
-from app.models.operation import Operation
-from app.services import operations_service
+from app.models.operation import Operation, StoredOperation
+from app.services import operations_service, import_service
 
 operation_router = APIRouter()
 
 
-@operation_router.get('/all_operations/{user_id}', response_model=List[Operation])
+@operation_router.get('/all_operations/{user_id}', response_model=List[StoredOperation])
 @log
-async def get_operations(request: Request, user_id: int):
+async def get_operations(request: Request, response: Response, user_id: int,
+                         limit: int = Query(config.PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE,
+                                            description="Maximum number of operations returned"),
+                         page_token: Optional[str] = Query(None, description="Token of the page to return")):
     """
-    Retrieves all operations for a specific user.
+    Retrieves one page of the operations of a specific user, ordered by date.
+
+    When more operations follow, the token of the next page is returned in the X-Next-Page-Token header.
+    With "Accept: application/x-ndjson", all operations (after page_token, if given) are streamed instead,
+    one JSON object per line, and limit is ignored.
 
     Parameters:
     - request (Request): The incoming request.
+    - response (Response): The outgoing response.
     - user_id (int): ID of the user whose operations are to be fetched.
+    - limit (int): Maximum number of operations returned.
+    - page_token (str): optional: token of the page to return, as returned with the previous page.
 
     Returns:
-    - List[Operation]: List of operations for the specified user.
+    - List[StoredOperation]: List of operations for the specified user.
 
     Raises:
-    - HTTPException: If no operations are found for the user.
+    - HTTPException: If the page token is not valid or no operations are found for the user.
     """
-    try:
-        operations = await operations_service.get_all_operations(user_id)
-    except Exception as e:
-        raise e
-    if operations:
-        return operations
-    else:
-        raise HTTPException(status_code=404, detail="No operations found")
+    return await _list_operations(request, response, user_id, limit, page_token)
 
 
-@operation_router.get('/{user_id}/{start_date}/{end_date}')
+@operation_router.get('/{user_id}/{start_date}/{end_date}', response_model=List[StoredOperation])
 @log
-async def get_term(request: Request, user_id: int, start_date: str, end_date: str):
+async def get_term(request: Request, response: Response, user_id: int, start_date: str, end_date: str,
+                   limit: int = Query(config.PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE,
+                                      description="Maximum number of operations returned"),
+                   page_token: Optional[str] = Query(None, description="Token of the page to return")):
     """
-    Retrieves all operations for a specific user within a date range.
+    Retrieves one page of the operations of a specific user within a date range, ordered by date.
+
+    When more operations follow, the token of the next page is returned in the X-Next-Page-Token header.
+    With "Accept: application/x-ndjson", all operations (after page_token, if given) are streamed instead,
+    one JSON object per line, and limit is ignored.
 
     Parameters:
     - request (Request): The incoming request.
+    - response (Response): The outgoing response.
     - user_id (int): ID of the user whose operations are to be fetched.
     - start_date (str): Start date of the range in 'YYYY-MM-DD' format.
     - end_date (str): End date of the range in 'YYYY-MM-DD' format.
+    - limit (int): Maximum number of operations returned.
+    - page_token (str): optional: token of the page to return, as returned with the previous page.
+
+    Returns:
+    - List[StoredOperation]: List of operations for the specified user within the date range.
+
+    Raises:
+    - HTTPException: If the page token is not valid or no operations are found for the user within the
+      specified date range.
+    """
+    return await _list_operations(request, response, user_id, limit, page_token, start_date, end_date)
+
+
+async def _list_operations(request: Request, response: Response, user_id: int, limit: int,
+                           page_token: Optional[str], start_date: str = None, end_date: str = None):
+    """
+    Fetches one page of operations and sets the X-Next-Page-Token header, or streams them as NDJSON.
+
+    Parameters:
+    - request (Request): The incoming request.
+    - response (Response): The outgoing response.
+    - user_id (int): ID of the user whose operations are to be fetched.
+    - limit (int): Maximum number of operations returned.
+    - page_token (str): Token of the page to return, or None for the first page.
+    - start_date (str): optional: Start date of the range in 'YYYY-MM-DD' format.
+    - end_date (str): optional: End date of the range in 'YYYY-MM-DD' format.
 
     Returns:
-    - List[Operation]: List of operations for the specified user within the date range.
+    - List[StoredOperation]: The operations of the page, or a StreamingResponse of NDJSON lines.
 
     Raises:
-    - HTTPException: If no operations are found for the user within the specified date range.
+    - HTTPException: If the page token is not valid or no operations are found.
     """
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return await _stream_operations(user_id, page_token, start_date, end_date)
     try:
-        operations = await operations_service.get_all_operations_between_dates(user_id, start_date, end_date)
-    except Exception as e:
-        raise e
+        operations, next_page_token = await operations_service.get_operations_page(user_id, limit, page_token,
+                                                                                   start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_page_token:
+        response.headers["X-Next-Page-Token"] = next_page_token
     if operations:
         return operations
     else:
         raise HTTPException(status_code=404, detail="No operations found")
 
 
+async def _stream_operations(user_id: int, page_token: Optional[str], start_date: str = None, end_date: str = None):
+    """
+    Streams operations as NDJSON, writing each one as soon as the database returns it.
+
+    Parameters:
+    - user_id (int): ID of the user whose operations are to be fetched.
+    - page_token (str): Token to continue from, or None to start with the first operation.
+    - start_date (str): optional: Start date of the range in 'YYYY-MM-DD' format.
+    - end_date (str): optional: End date of the range in 'YYYY-MM-DD' format.
+
+    Returns:
+    - StreamingResponse: Response with one JSON operation per line.
+
+    Raises:
+    - HTTPException: If the page token is not valid or no operations are found.
+    """
+    try:
+        operations = operations_service.stream_operations(user_id, page_token, start_date, end_date)
+        first_operation = await anext(operations, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if first_operation is None:
+        raise HTTPException(status_code=404, detail="No operations found")
+
+    async def lines():
+        yield first_operation.model_dump_json() + "\n"
+        async for operation in operations:
+            yield operation.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @operation_router.get('/{operation_id}')
 @log
 async def get_operation(request: Request, operation_id: int):
@@ -72,7 +148,7 @@ async def get_operation(request: Request, operation_id: int):
     - operation_id (int): ID of the operation to retrieve.
 
     Returns:
-    - Operation: The operation with the specified ID.
+    - StoredOperation: The operation with the specified ID.
 
     Raises:
     - HTTPException: If no operation is found with the provided ID.
@@ -109,6 +185,57 @@ async def add_operation(request: Request, operation: Operation):
     raise HTTPException(status_code=400, detail="One or more details of the operation are invalid")
 
 
+@operation_router.post("/bulk")
+@log
+async def add_operations(request: Request, operations: List[dict] = Body(...),
+                         chunk_size: int = Query(config.BULK_CHUNK_SIZE, ge=1,
+                                                 description="Number of operations written per insert")):
+    """
+    Adds many operations at once.
+
+    Parameters:
+    - request (Request): The incoming request.
+    - operations (List[dict]): The operations to add. Their id is ignored.
+    - chunk_size (int): Number of operations written per insert.
+
+    Returns:
+    - dict: The number of operations added and the errors of the operations that were rejected.
+
+    Raises:
+    - HTTPException: If more operations are sent than allowed in one request.
+    """
+    if len(operations) > config.BULK_MAX_OPERATIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {config.BULK_MAX_OPERATIONS} operations can be added at once")
+    return await operations_service.add_operations(operations, chunk_size)
+
+
+@operation_router.post("/import")
+@log
+async def import_operations(request: Request,
+                            file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$",
+                                                     description="Format of the request body"),
+                            job_id: Optional[str] = Query(None, description="ID of an interrupted import to resume"),
+                            batch_size: int = Query(config.IMPORT_BATCH_SIZE, ge=1, le=config.MAX_IMPORT_BATCH_SIZE,
+                                                    description="Number of rows written per batch")):
+    """
+    Imports operations from a CSV file (with a header row) or an NDJSON file sent as the request body.
+
+    The body is parsed as it arrives and written in batches, so files of any size can be imported.
+    To resume an interrupted import, send the same file again with the job_id of the first attempt.
+
+    Parameters:
+    - request (Request): The incoming request, its body being the file.
+    - file_format (str): csv or ndjson.
+    - job_id (str): optional: ID of the import to resume.
+    - batch_size (int): Number of rows written per batch.
+
+    Returns:
+    - dict: The report of the import, including its job_id, counts, row errors and rows per second.
+    """
+    return await import_service.import_operations(request.stream(), file_format, job_id, batch_size)
+
+
 @operation_router.put("/{operation_id}")
 @log
 async def update_operation(request: Request, operation_id: int, operation: Operation):
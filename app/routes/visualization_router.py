@@ -11,7 +11,8 @@ visualization_router = APIRouter()
 @log
 async def year_divide_to_months_budget(request: Request, user_id: int, visual_type: str,
                                        month: Optional[str] = Query(None,
-                                                                    description="Optional search query parameter")):
+                                                                    description="Optional search query parameter"),
+                                       format: str = Query("png", description="Image format - png/svg")):
     """
     Retrieves a visualization comparing expenses and revenues for each month of the year.
 
@@ -19,36 +20,128 @@ async def year_divide_to_months_budget(request: Request, user_id: int, visual_ty
     - user_id (int): The ID of the user.
     - visual_type (str): The type of visualization - graph/bar chart.
     - month (str):  optional: specific month or all year (if not have month).
+    - format (str): optional: image format - png (default) or svg.
 
     Returns:
-    - StreamingResponse: Response containing visualization image.
+    - StreamingResponse: Response containing visualization image, or 304 if it matches the If-None-Match header.
     """
+    if_none_match = request.headers.get("if-none-match")
     if visual_type == "bar" and month is None:
-        return await visualization_service.get_expenses_against_revenues_by_month_all_year(user_id)
+        return await visualization_service.get_expenses_against_revenues_by_month_all_year(user_id, if_none_match,
+                                                                                            format)
     if visual_type == "graph" and month is None:
-        return await visualization_service.get_yearly_graph(user_id)
+        return await visualization_service.get_yearly_graph(user_id, if_none_match, format)
     if month is not None:
-        return await visualization_service.get_expenses_against_revenues_by_month(user_id, month)
+        return await visualization_service.get_expenses_against_revenues_by_month(user_id, month, if_none_match, format)
     else:
         raise HTTPException(status_code=404, detail="not valid url")
 
 
-@visualization_router.get("/balance/{user_id}/{visual_type}}")
+@visualization_router.get("/balance/{user_id}/{visual_type}")
 @log
-async def yearly_balance_graph(request: Request, user_id: int, visual_type: str):
+async def yearly_balance_graph(request: Request, user_id: int, visual_type: str,
+                               format: str = Query("png", description="Image format - png/svg")):
     """
     Retrieves a line plot showing the monthly balance for the year.
 
     Parameters:
     - user_id (int): The ID of the user.
     -type (str): The type of visualization - graph/bar chart.
+    - format (str): optional: image format - png (default) or svg.
 
     Returns:
-    - StreamingResponse: Response containing the line plot image.
+    - StreamingResponse: Response containing the line plot image, or 304 if it matches the If-None-Match header.
     """
+    if_none_match = request.headers.get("if-none-match")
     if visual_type == "bar":
-        return await visualization_service.get_balance_yearly_bar(user_id)
+        return await visualization_service.get_balance_yearly_bar(user_id, if_none_match, format)
     if visual_type == "graph":
-        return await visualization_service.get_balances_yearly_graph(user_id)
+        return await visualization_service.get_balances_yearly_graph(user_id, if_none_match, format)
     else:
         raise HTTPException(status_code=404, detail="not valid url")
+
+
+@visualization_router.get("/series/{user_id}")
+@log
+async def monthly_series(request: Request, user_id: int,
+                         year: Optional[int] = Query(None, description="Optional year, the current year by default")):
+    """
+    Retrieves the monthly expenses, revenues and balances the charts are drawn from.
+
+    Parameters:
+    - user_id (int): The ID of the user.
+    - year (int): optional: the year of the series (current year if not have year).
+
+    Returns:
+    - JSONResponse: The year, months, expenses, revenues and balances, or 304 if it matches the If-None-Match header.
+    """
+    return await visualization_service.get_monthly_series(user_id, year, request.headers.get("if-none-match"))
+
+
+@visualization_router.get("/totals/{user_id}")
+@log
+async def totals_by_bucket(request: Request, user_id: int,
+                           start_date: str = Query(..., description="First day, YYYY-MM-DD"),
+                           end_date: str = Query(..., description="Last day, YYYY-MM-DD, included"),
+                           granularity: str = Query("month", description="day/week/month/quarter/year")):
+    """
+    Retrieves expenses, revenues and balance per day, week, month, quarter or year over a date range.
+
+    Parameters:
+    - user_id (int): The ID of the user.
+    - start_date (str): The first day of the range.
+    - end_date (str): The last day of the range.
+    - granularity (str): optional: the size of the buckets (month if not have granularity).
+
+    Returns:
+    - dict: The start date of each bucket and its expenses, revenues and balance.
+    """
+    return await visualization_service.get_totals_by_bucket(user_id, start_date, end_date, granularity)
+
+
+@visualization_router.get("/running_balance/{user_id}")
+@log
+async def running_balance(request: Request, user_id: int,
+                          start_date: str = Query(..., description="First day, YYYY-MM-DD"),
+                          end_date: str = Query(..., description="Last day, YYYY-MM-DD, included"),
+                          granularity: str = Query("day", description="day/week/month/quarter/year")):
+    """
+    Retrieves the balance at the end of each day, week, month, quarter or year over a date range.
+
+    Parameters:
+    - user_id (int): The ID of the user.
+    - start_date (str): The first day of the range.
+    - end_date (str): The last day of the range.
+    - granularity (str): optional: the size of the buckets (day if not have granularity).
+
+    Returns:
+    - dict: The balance before the range and the start date of each bucket with the balance at its end.
+    """
+    return await visualization_service.get_running_balance(user_id, start_date, end_date, granularity)
+
+
+@visualization_router.get("/dashboard/{user_id}")
+@log
+async def dashboard(request: Request, user_id: int,
+                    year: Optional[int] = Query(None, description="Optional year, the current year by default"),
+                    charts: Optional[str] = Query(None, description="Comma separated charts - expenses_vs_revenues_bar,"
+                                                                    "expenses_vs_revenues_graph,balance_bar,"
+                                                                    "balance_graph"),
+                    format: str = Query("png", description="Image format - png/svg"),
+                    bundle: str = Query("json", description="json/zip")):
+    """
+    Retrieves the monthly series and the requested charts of the dashboard in one response.
+
+    Parameters:
+    - user_id (int): The ID of the user.
+    - year (int): optional: the year of the dashboard (current year if not have year).
+    - charts (str): optional: comma separated names of the charts to include (no charts if not have charts).
+    - format (str): optional: image format of the charts - png (default) or svg.
+    - bundle (str): optional: json (default) with base64 charts, or a zip archive.
+
+    Returns:
+    - Response: The series and charts, or 304 if it matches the If-None-Match header.
+    """
+    chart_names = [name.strip() for name in charts.split(",") if name.strip()] if charts else []
+    return await visualization_service.get_dashboard(user_id, year, chart_names, format, bundle,
+                                                     request.headers.get("if-none-match"))
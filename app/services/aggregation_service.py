@@ -0,0 +1,134 @@
+from datetime import timedelta
+import numpy as np
+from app.models.operation_type import Operation_type
+
+# Bucket granularities, with the NumPy unit and step of the bucket starts
+granularities = {
+    "day": ("D", 1),
+    "week": ("D", 7),
+    "month": ("M", 1),
+    "quarter": ("M", 3),
+    "year": ("Y", 1)
+}
+
+# 1970-01-01, day 0 of datetime64, was a Thursday: days to add to a day number to count weekdays from Monday
+_epoch_weekday = 3
+
+
+def bucket_starts(dates, granularity: str):
+    """
+    Finds the start of the bucket of each date.
+
+    Weeks start on Monday and quarters in January, April, July and October.
+
+    Args:
+        dates (numpy.ndarray): datetime64 dates.
+        granularity (str): One of granularities.
+
+    Returns:
+        numpy.ndarray: The datetime64[D] start of the bucket of each date.
+    """
+
+    unit, step = granularities[granularity]
+    if granularity == "week":
+        days = dates.astype("datetime64[D]")
+        return days - (days.astype(np.int64) + _epoch_weekday) % 7
+    periods = dates.astype(f"datetime64[{unit}]")
+    if step > 1:
+        periods = periods - periods.astype(np.int64) % step
+    return periods.astype("datetime64[D]")
+
+
+def bucket_range(start_date, end_date, granularity: str):
+    """
+    Lists the starts of all buckets between two dates, including the buckets of both dates.
+
+    Args:
+        start_date (datetime | numpy.datetime64): The first date.
+        end_date (datetime | numpy.datetime64): The last date.
+        granularity (str): One of granularities.
+
+    Returns:
+        numpy.ndarray: The datetime64[D] bucket starts, in order.
+    """
+
+    unit, step = granularities[granularity]
+    first, last = bucket_starts(np.array([start_date, end_date], dtype="datetime64[ms]"), granularity)
+    return np.arange(first.astype(f"datetime64[{unit}]"), last.astype(f"datetime64[{unit}]") + 1,
+                     step).astype("datetime64[D]")
+
+
+def bucket_count(start_date, end_date, granularity: str):
+    """
+    Counts the buckets between two dates, including the buckets of both dates, without listing them.
+
+    Args:
+        start_date (datetime): The first date.
+        end_date (datetime): The last date, not before start_date.
+        granularity (str): One of granularities.
+
+    Returns:
+        int: The number of buckets bucket_range would list.
+    """
+
+    if granularity == "day":
+        return (end_date.date() - start_date.date()).days + 1
+    if granularity == "week":
+        first_monday = start_date.date() - timedelta(days=start_date.weekday())
+        last_monday = end_date.date() - timedelta(days=end_date.weekday())
+        return (last_monday - first_monday).days // 7 + 1
+    months = (end_date.year - start_date.year) * 12 + end_date.month - start_date.month
+    if granularity == "month":
+        return months + 1
+    if granularity == "quarter":
+        return (end_date.year * 4 + (end_date.month - 1) // 3) - (start_date.year * 4 + (start_date.month - 1) // 3) + 1
+    return end_date.year - start_date.year + 1
+
+
+def aggregate(frame, start_date, end_date, granularity: str):
+    """
+    Totals expenses and revenues per bucket between two dates.
+
+    Every bucket of the range is reported, including the ones without operations.
+
+    Args:
+        frame (OperationFrame): The operations, all within the range.
+        start_date (datetime): The first date of the range.
+        end_date (datetime): The last date of the range.
+        granularity (str): One of granularities.
+
+    Returns:
+        dict: The ISO start date of each bucket and its expenses, revenues and balance.
+    """
+
+    starts = bucket_range(start_date, end_date, granularity)
+    index = np.searchsorted(starts, bucket_starts(frame.dates, granularity))
+    is_expense = frame.of_type(Operation_type.EXPENSE)
+    expenses = np.bincount(index, weights=np.where(is_expense, frame.sums, 0.0), minlength=len(starts))
+    revenues = np.bincount(index, weights=np.where(is_expense, 0.0, frame.sums), minlength=len(starts))
+    return {
+        "buckets": np.datetime_as_string(starts).tolist(),
+        "expenses": expenses.tolist(),
+        "revenues": revenues.tolist(),
+        "balances": (revenues - expenses).tolist()
+    }
+
+
+def running_balance(frame, start_date, end_date, granularity: str, opening_balance: float = 0.0):
+    """
+    Calculates the balance at the end of each bucket between two dates.
+
+    Args:
+        frame (OperationFrame): The operations, all within the range.
+        start_date (datetime): The first date of the range.
+        end_date (datetime): The last date of the range.
+        granularity (str): One of granularities.
+        opening_balance (float, optional): The balance before the first date.
+
+    Returns:
+        dict: The ISO start date of each bucket and the balance at its end.
+    """
+
+    totals = aggregate(frame, start_date, end_date, granularity)
+    balances = opening_balance + np.cumsum(totals["balances"])
+    return {"buckets": totals["buckets"], "balances": balances.tolist()}
@@ -0,0 +1,84 @@
+import hashlib
+import json
+from collections import OrderedDict
+from app import config
+
+
+class ChartCache:
+    """
+    Least recently used cache of encoded chart images, limited by their total size in bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        """
+        Looks up an image.
+
+        Parameters:
+        - key (str): The key of the chart, as built by chart_key.
+
+        Returns:
+        - bytes: The encoded image, or None if it is not cached.
+        """
+        image = self._entries.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return image
+
+    def put(self, key: str, image: bytes):
+        """
+        Stores an image, evicting the least recently used ones until the cache fits in max_bytes.
+
+        Parameters:
+        - key (str): The key of the chart, as built by chart_key.
+        - image (bytes): The encoded image.
+        """
+        if len(image) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = image
+        self.size += len(image)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Reports the usage of the cache.
+
+        Returns:
+        - dict: The number of entries, their size in bytes, the size limit and the hit, miss and eviction counters.
+        """
+        return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def chart_key(kind: str, *series):
+    """
+    Builds the key of a chart from everything it is drawn from.
+
+    Parameters:
+    - kind (str): The kind of chart, e.g. the name of the function drawing it.
+    - *series: The data, labels and titles of the chart. They must be JSON serializable.
+
+    Returns:
+    - str: A hex digest identifying the chart, also used as its ETag.
+    """
+    return hashlib.sha256(json.dumps([kind, series], separators=(",", ":")).encode()).hexdigest()
+
+
+# Cache shared by all visualization endpoints
+charts = ChartCache(config.CHART_CACHE_MAX_BYTES)
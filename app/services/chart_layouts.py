@@ -0,0 +1,11 @@
+# List of month names
+months_names = ['January', 'February', 'March', 'April', 'May', 'June',
+                'July', 'August', 'September', 'October', 'November', 'December']
+
+# Layouts of the charts served by the visualization endpoints, as (chart function name, x, labels, title, ylabel)
+standard_layouts = [
+    ('create_bar_chart', months_names, ['Expenses', 'Revenues'], 'Monthly Expenses vs Revenues', 'Value'),
+    ('create_plot', months_names, ['Expenses', 'Revenues'], 'Monthly Expenses vs Revenues', 'Value'),
+    ('create_bar_chart', months_names, ['Monthly Balance'], 'Monthly Balance', 'Value'),
+    ('create_plot', months_names, ['Balance'], 'Monthly Balance', 'Value')
+]
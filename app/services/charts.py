@@ -0,0 +1,173 @@
+import io
+from collections import OrderedDict
+import matplotlib
+
+# Charts are only rendered to images, never shown, so no GUI backend is needed
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from app.services.chart_layouts import standard_layouts
+
+# Maximum number of figure templates kept by a process
+max_templates = 32
+
+# Figure templates of this process, by layout
+_templates = OrderedDict()
+
+
+class PlotTemplate:
+    """
+    A line plot whose figure, axes, ticks, labels and legend are built once, so only the lines change per render.
+    """
+
+    def __init__(self, x, labels, title, ylabel):
+        self.figure = Figure()
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.subplots()
+        self.lines = [self.ax.plot(x, [0] * len(x), label=label, marker='o')[0] for label in labels]
+        for tick_label in self.ax.get_xticklabels():
+            tick_label.set_rotation(45)
+        self.ax.set_xlabel('Month')
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_title(title)
+        self.ax.legend()
+
+    def render(self, y_data):
+        """
+        Renders the plot with new data.
+
+        Parameters:
+        - y_data (list of lists): Y-axis data for each line.
+
+        Returns:
+        - BytesIO: In-memory buffer containing the plot image.
+        """
+        for line, y in zip(self.lines, y_data):
+            line.set_ydata(y)
+        return _render(self.figure, self.ax)
+
+
+class BarChartTemplate:
+    """
+    A bar chart whose figure, axes, ticks, labels and legend are built once, so only the bar heights change per render.
+    """
+
+    def __init__(self, x, labels, title, ylabel):
+        self.figure = Figure()
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.subplots()
+        bar_width = 0.35
+        index = range(len(x))
+        self.bars = [self.ax.bar([p + i * bar_width for p in index], [0] * len(x), bar_width, label=label)
+                     for i, label in enumerate(labels)]
+        for tick_label in self.ax.get_xticklabels():
+            tick_label.set_rotation(45)
+        self.ax.set_xlabel('Month')
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_title(title)
+        self.ax.set_xticks([p + bar_width for p in index])
+        self.ax.set_xticklabels(x)
+        self.ax.legend()
+
+    def render(self, y_data):
+        """
+        Renders the chart with new data.
+
+        Parameters:
+        - y_data (list of lists): Y-axis data for each set of bars.
+
+        Returns:
+        - BytesIO: In-memory buffer containing the bar chart image.
+        """
+        for bars, y in zip(self.bars, y_data):
+            for bar, height in zip(bars, y):
+                bar.set_height(height)
+        return _render(self.figure, self.ax)
+
+
+def _render(figure, ax):
+    """
+    Rescales the axes to the current data and encodes the figure.
+
+    Parameters:
+    - figure (Figure): The figure of a template.
+    - ax (Axes): Its axes.
+
+    Returns:
+    - BytesIO: In-memory buffer containing the PNG image.
+    """
+    ax.relim()
+    ax.autoscale_view()
+    buf = io.BytesIO()
+    figure.savefig(buf, format='png')
+    buf.seek(0)
+    return buf
+
+
+def get_template(template_class, x, labels, title, ylabel):
+    """
+    Gets the template of a chart layout, building it the first time it is used.
+
+    Parameters:
+    - template_class (type): PlotTemplate or BarChartTemplate.
+    - x (list): X-axis labels.
+    - labels (list): Labels for each set of data.
+    - title (str): Title of the chart.
+    - ylabel (str): Label for the Y-axis.
+
+    Returns:
+    - PlotTemplate | BarChartTemplate: The template.
+    """
+    key = (template_class.__name__, tuple(x), tuple(labels), title, ylabel)
+    template = _templates.get(key)
+    if template is None:
+        template = template_class(x, labels, title, ylabel)
+        _templates[key] = template
+        if len(_templates) > max_templates:
+            _templates.popitem(last=False)
+    else:
+        _templates.move_to_end(key)
+    return template
+
+
+def prepare_templates():
+    """
+    Builds the templates of the standard layouts, so the first requests of a render worker are as fast as the next.
+    """
+    for chart_function_name, x, labels, title, ylabel in standard_layouts:
+        template_class = PlotTemplate if chart_function_name == 'create_plot' else BarChartTemplate
+        get_template(template_class, x, labels, title, ylabel)
+
+
+def create_plot(x, y_data, labels, title, ylabel):
+    """
+    Creates a line plot with the given data.
+
+    Parameters:
+    - x (list): X-axis labels.
+    - y_data (list of lists): Y-axis data for multiple lines.
+    - labels (list): Labels for each line.
+    - title (str): Title of the plot.
+    - ylabel (str): Label for the Y-axis.
+
+    Returns:
+    - BytesIO: In-memory buffer containing the plot image.
+    """
+    return get_template(PlotTemplate, x, labels, title, ylabel).render(y_data)
+
+
+def create_bar_chart(x, y_data, labels, title, ylabel):
+    """
+    Creates a bar chart with the given data.
+
+    Parameters:
+    - x (list): X-axis labels.
+    - y_data (list of lists): Y-axis data for multiple bars.
+    - labels (list): Labels for each set of bars.
+    - title (str): Title of the chart.
+    - ylabel (str): Label for the Y-axis.
+
+    Returns:
+    - BytesIO: In-memory buffer containing the bar chart image.
+    """
+    return get_template(BarChartTemplate, x, labels, title, ylabel).render(y_data)
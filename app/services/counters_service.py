@@ -0,0 +1,83 @@
+from pymongo import DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.services.db_service import counters, operations, users
+
+# Collections whose "id" field is allocated from a counter, by counter name
+sequences = {"operations": operations, "users": users}
+
+# Counters already brought up to the highest existing ID by this process
+_seeded_counters = set()
+
+
+async def allocate_ids(name: str, count: int = 1):
+    """
+    Reserve a block of consecutive IDs with a single atomic $inc.
+
+    Concurrent callers always get disjoint blocks, so the IDs can be inserted without further checks.
+
+    Args:
+        name (str): The counter name, one of the keys of `sequences`.
+        count (int): The number of IDs to reserve.
+
+    Returns:
+        int: The first reserved ID. The block is [first, first + count).
+    """
+
+    if count < 1:
+        raise ValueError('Cannot allocate less than one ID')
+    if name not in _seeded_counters:
+        await _seed_counter(name)
+    counter = await counters.find_one_and_update({"_id": name}, {"$inc": {"seq": count}}, upsert=True,
+                                                 return_document=ReturnDocument.AFTER)
+    return counter["seq"] - count + 1
+
+
+async def get_next_id(name: str):
+    """
+    Get the ID the next allocation will return, without reserving it.
+
+    Args:
+        name (str): The counter name, one of the keys of `sequences`.
+
+    Returns:
+        int: The next ID.
+    """
+
+    counter = await counters.find_one({"_id": name})
+    if counter:
+        return counter["seq"] + 1
+    return await _get_max_id(name) + 1
+
+
+async def _seed_counter(name: str):
+    """
+    Make sure a counter is not behind the highest ID already stored, e.g. for data inserted before counters.
+
+    Args:
+        name (str): The counter name, one of the keys of `sequences`.
+    """
+
+    max_id = await _get_max_id(name)
+    try:
+        await counters.update_one({"_id": name}, {"$max": {"seq": max_id}}, upsert=True)
+    except DuplicateKeyError:
+        # Another writer created the counter at the same time, retry as a plain update
+        await counters.update_one({"_id": name}, {"$max": {"seq": max_id}})
+    _seeded_counters.add(name)
+
+
+async def _get_max_id(name: str):
+    """
+    Get the highest ID stored in the collection of a counter.
+
+    Args:
+        name (str): The counter name, one of the keys of `sequences`.
+
+    Returns:
+        int: The highest ID, or 0 if the collection is empty.
+    """
+
+    max_id_document = await sequences[name].find_one({}, {"id": 1}, sort=[("id", DESCENDING)])
+    if max_id_document:
+        return max_id_document["id"]
+    return 0
@@ -1,17 +1,153 @@
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient
+from pymongo import monitoring
+from pymongo.write_concern import WriteConcern
+from app import config
+from utils.metrics import command_metrics
+from utils.profiling import command_timings
 
-# Asynchronous MongoDB client
-client = AsyncIOMotorClient('mongodb://localhost:27017')
+logger = logging.getLogger(__name__)
 
-# Synchronous MongoDB client
-synchronise_client = MongoClient('mongodb://localhost:27017')
+# Write concern of every write, from the MONGO_WRITE_* settings
+write_concern = WriteConcern(w=config.MONGO_WRITE_W, wtimeout=config.MONGO_WRITE_TIMEOUT_MS,
+                             j=config.MONGO_WRITE_JOURNAL)
 
-# Database and collections
-db = client['UsersDubgetData']
-users = db['users']
-operations = db['operations']
+# Asynchronous MongoDB client, created by connect() and closed by close()
+client = None
 
-synchronise_db = synchronise_client['UsersDubgetData']
-synchronise_users = synchronise_db['users']
-synchronise_operations = synchronise_db['operations']
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Counts the connections of the client's pools, from the driver's connection pool events.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pools_cleared = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open += 1
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open -= 1
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.in_use += 1
+        self.checkouts += 1
+
+    def connection_checked_in(self, event):
+        self.in_use -= 1
+
+    def stats(self):
+        """
+        Reports the usage of the pools.
+
+        Returns:
+            dict: The pool settings, the connections open and in use, and the event counters.
+        """
+        return {"connected": client is not None, "max_pool_size": config.MONGO_MAX_POOL_SIZE,
+                "min_pool_size": config.MONGO_MIN_POOL_SIZE, "open": self.open, "in_use": self.in_use,
+                "created": self.created, "closed": self.closed, "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures, "pools_cleared": self.pools_cleared}
+
+
+# Usage of the connection pools of the client
+pool_stats = PoolStats()
+
+# Listeners of the driver's events, registered on the client when it is created
+event_listeners = [pool_stats, command_metrics, command_timings]
+
+
+def connect():
+    """
+    Create the client from the MONGO_* settings, if it does not exist yet.
+
+    The application connects in its lifespan; scripts and tests connect on first use of a collection.
+
+    Returns:
+        AsyncIOMotorClient: The client.
+    """
+
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(
+            config.MONGO_URI,
+            maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=config.MONGO_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            connectTimeoutMS=config.MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS,
+            serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=event_listeners
+        )
+        logger.info(f"Connected to MongoDB with a pool of {config.MONGO_MIN_POOL_SIZE}-{config.MONGO_MAX_POOL_SIZE} "
+                    f"connections per server")
+    return client
+
+
+def close():
+    """
+    Close the client and its connections, if it exists.
+    """
+
+    global client
+    if client is not None:
+        client.close()
+        client = None
+        logger.info("Closed the MongoDB connections")
+
+
+class Collection:
+    """
+    A collection of the database, resolved on the current client when it is used.
+
+    Services import collections when they are imported, before the client exists, so they hold
+    these stand-ins rather than the driver's collections.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._client = None
+        self._collection = None
+
+    def __getattr__(self, attribute):
+        if self._client is not client or self._collection is None:
+            self._collection = connect().get_database(config.MONGO_DATABASE, write_concern=write_concern)[self.name]
+            self._client = client
+        return getattr(self._collection, attribute)
+
+
+# Collections
+users = Collection('users')
+operations = Collection('operations')
+monthly_totals = Collection('monthly_totals')
+counters = Collection('counters')
+import_jobs = Collection('import_jobs')
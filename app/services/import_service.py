@@ -0,0 +1,287 @@
+import codecs
+import csv
+import json
+import time
+import uuid
+from app import config
+from app.services import counters_service, operations_service
+from app.services.db_service import import_jobs, operations
+
+# Supported file formats
+file_formats = ("csv", "ndjson")
+
+
+async def iter_lines(chunks):
+    """
+    Split a stream of UTF-8 encoded chunks into lines, holding at most one line in memory.
+
+    A line longer than IMPORT_MAX_LINE_LENGTH characters is dropped as it arrives and yielded as None.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The content of the file.
+
+    Yields:
+        str: Every line, without its line break, or None for a line that is too long.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    skipping = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        if skipping:
+            # Drop the rest of a line that is too long
+            if "\n" not in pending:
+                pending = ""
+                continue
+            pending = pending.split("\n", 1)[1]
+            skipping = False
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r") if len(line) <= config.IMPORT_MAX_LINE_LENGTH else None
+        if len(pending) > config.IMPORT_MAX_LINE_LENGTH:
+            pending = ""
+            skipping = True
+            yield None
+    pending += decoder.decode(b"", final=True)
+    if pending and not skipping:
+        yield pending.rstrip("\r") if len(pending) <= config.IMPORT_MAX_LINE_LENGTH else None
+
+
+async def iter_rows(lines, file_format: str):
+    """
+    Parse lines of a CSV file with a header row, or of an NDJSON file, into rows.
+
+    Lines that were too long, and CSV records longer than IMPORT_MAX_LINE_LENGTH characters over several
+    lines, become errors.
+
+    Args:
+        lines (AsyncIterator[str]): The lines of the file, None for a line that was too long.
+        file_format (str): "csv" or "ndjson".
+
+    Yields:
+        tuple: (row, error) pairs, row being a dict when the row could be parsed and error a message otherwise.
+    """
+
+    line_too_long = f"Line longer than {config.IMPORT_MAX_LINE_LENGTH} characters"
+    if file_format == "ndjson":
+        async for line in lines:
+            if line is None:
+                yield None, line_too_long
+                continue
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield None, f"Not valid JSON: {e}"
+                continue
+            if isinstance(row, dict):
+                yield row, None
+            else:
+                yield None, "Row should be a JSON object"
+        return
+
+    header = None
+    record = ""
+    # Whether the rest of a record that is too long is being dropped, until its quoted value ends
+    skipping = False
+    async for line in lines:
+        if skipping:
+            if line is not None and line.count('"') % 2:
+                skipping = False
+            continue
+        if line is None:
+            if record:
+                # The quoted value can no longer be followed, the line ending it is not known
+                record = ""
+            yield None, line_too_long
+            continue
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            # A quoted value goes on over the next line
+            if len(record) > config.IMPORT_MAX_LINE_LENGTH:
+                record = ""
+                skipping = True
+                yield None, f"Row longer than {config.IMPORT_MAX_LINE_LENGTH} characters"
+            continue
+        if not record.strip():
+            record = ""
+            continue
+        values = next(csv.reader([record]))
+        record = ""
+        if header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield None, f"Expected {len(header)} values, found {len(values)}"
+        else:
+            yield dict(zip(header, values)), None
+    if record:
+        yield None, "Unterminated quoted value"
+
+
+async def import_operations(chunks, file_format: str, job_id: str = None, batch_size: int = config.IMPORT_BATCH_SIZE,
+                            on_progress=None):
+    """
+    Import operations from a CSV or NDJSON stream in fixed-size batches.
+
+    Memory use does not depend on the size of the file. Progress is saved in the import_jobs collection
+    after every batch; calling again with the same job ID and file skips the rows already committed.
+    The IDs of a batch are saved before it is written, so a batch interrupted half way is written again
+    with the same IDs and its operations that were already stored are not added twice. The job also
+    records whether the monthly totals of its last batch were updated; when they may not have been,
+    the totals of the months of the interrupted batch are recomputed from the stored operations.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The content of the file.
+        file_format (str): "csv" or "ndjson".
+        job_id (str, optional): The ID of an import to resume. If None, a new import is started.
+        batch_size (int): The number of rows written per batch. A resumed import keeps its own batch size.
+        on_progress (Callable, optional): Called with the report after every batch.
+
+    Returns:
+        dict: The report of the import with keys "job_id", "rows", "inserted", "failed", "errors",
+        "seconds" and "rows_per_second".
+    """
+
+    job_id = job_id or uuid.uuid4().hex
+    job = await import_jobs.find_one({"_id": job_id})
+    if job is None:
+        job = {"_id": job_id, "format": file_format, "batchSize": batch_size, "committedRows": 0, "inserted": 0,
+               "failed": 0, "pendingFirstId": None, "rollupApplied": True, "status": "running"}
+        await import_jobs.insert_one(job)
+    report = {"job_id": job_id, "rows": job["committedRows"], "inserted": job["inserted"], "failed": job["failed"],
+              "errors": [], "seconds": 0.0, "rows_per_second": 0.0}
+    started = time.perf_counter()
+    imported_rows = 0
+
+    batch = []
+    row_number = 0
+    async for row, error in iter_rows(iter_lines(chunks), file_format):
+        row_number += 1
+        if row_number <= job["committedRows"]:
+            continue
+        batch.append((row_number, row, error))
+        if len(batch) >= job["batchSize"]:
+            await _commit_batch(job, batch, report)
+            imported_rows += len(batch)
+            batch = []
+            _update_speed(report, imported_rows, started)
+            if on_progress:
+                on_progress(report)
+    if batch:
+        await _commit_batch(job, batch, report)
+        imported_rows += len(batch)
+        _update_speed(report, imported_rows, started)
+        if on_progress:
+            on_progress(report)
+    await import_jobs.update_one({"_id": job_id}, {"$set": {"status": "done"}})
+    return report
+
+
+async def _commit_batch(job: dict, batch, report: dict):
+    """
+    Write one batch of rows and save the progress of the import.
+
+    Args:
+        job (dict): The import job document, updated in place.
+        batch (List[tuple]): (row number, row, parse error) of every row of the batch.
+        report (dict): The report of the import, updated in place.
+    """
+
+    first_id = job["pendingFirstId"]
+    months = set()
+    if first_id is None:
+        first_id = await counters_service.allocate_ids("operations", len(batch))
+        job["pendingFirstId"] = first_id
+        job["rollupApplied"] = False
+        await import_jobs.update_one({"_id": job["_id"]}, {"$set": {"pendingFirstId": first_id,
+                                                                    "rollupApplied": False}})
+        stored_ids = set()
+    else:
+        # The batch was interrupted, its operations that were already written keep their IDs
+        stored = await _get_stored_operations(first_id, len(batch))
+        stored_ids = {operation["id"] for operation in stored}
+        if not job.get("rollupApplied"):
+            # They may have been written without updating the monthly totals, which are recomputed
+            months = _months_of(stored)
+
+    errors = []
+    rows = []
+    row_numbers = []
+    operation_ids = []
+    for position, (row_number, row, error) in enumerate(batch):
+        if error:
+            errors.append({"row": row_number, "error": error})
+        elif first_id + position not in stored_ids:
+            rows.append(row)
+            row_numbers.append(row_number)
+            operation_ids.append(first_id + position)
+    result = await operations_service.add_operations(rows, len(rows) or 1, operation_ids)
+    errors += [{"row": row_numbers[error["index"]], "error": error["error"]} for error in result["errors"]]
+    if not result["totals_updated"]:
+        # Recompute the totals of the batch's months; if that fails too, the job stays pending and
+        # resuming it recomputes them
+        months |= _months_of(await _get_stored_operations(first_id, len(batch)))
+    if months:
+        await operations_service.rebuild_monthly_totals_of_months(months)
+
+    job["committedRows"] += len(batch)
+    job["inserted"] += result["inserted"] + len(stored_ids)
+    job["failed"] += len(errors)
+    job["pendingFirstId"] = None
+    job["rollupApplied"] = True
+    await import_jobs.update_one({"_id": job["_id"]}, {"$set": {
+        "committedRows": job["committedRows"], "inserted": job["inserted"], "failed": job["failed"],
+        "pendingFirstId": None, "rollupApplied": True
+    }})
+
+    report["rows"] = job["committedRows"]
+    report["inserted"] = job["inserted"]
+    report["failed"] = job["failed"]
+    room = config.IMPORT_MAX_REPORTED_ERRORS - len(report["errors"])
+    report["errors"] += sorted(errors, key=lambda error: error["row"])[:max(room, 0)]
+
+
+async def _get_stored_operations(first_id: int, count: int):
+    """
+    Read the user and date of the operations of a batch that were written.
+
+    Args:
+        first_id (int): The ID of the first operation of the batch.
+        count (int): The number of rows of the batch.
+
+    Returns:
+        List[dict]: Documents with keys "id", "userId" and "date".
+    """
+
+    return await operations.find({"id": {"$gte": first_id, "$lt": first_id + count}},
+                                 {"_id": 0, "id": 1, "userId": 1, "date": 1}).to_list(None)
+
+
+def _months_of(stored_operations):
+    """
+    Get the months of stored operations.
+
+    Args:
+        stored_operations (List[dict]): Documents with keys "userId" and "date".
+
+    Returns:
+        set: The (user ID, year, month) of every operation.
+    """
+
+    return {(operation["userId"], operation["date"].year, operation["date"].month) for operation in stored_operations}
+
+
+def _update_speed(report: dict, imported_rows: int, started: float):
+    """
+    Update the duration and speed of an import.
+
+    Args:
+        report (dict): The report of the import, updated in place.
+        imported_rows (int): The number of rows processed since the import was (re)started.
+        started (float): The value of time.perf_counter() when the import was (re)started.
+    """
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["rows_per_second"] = round(imported_rows / report["seconds"], 1) if report["seconds"] else 0.0
@@ -0,0 +1,116 @@
+import logging
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.services import db_service
+
+logger = logging.getLogger(__name__)
+
+# Indexes every service query relies on, by collection name
+indexes = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("username", ASCENDING)], unique=True, name="username_unique")
+    ],
+    "operations": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("userId", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], name="userId_date_id")
+    ],
+    "monthly_totals": [
+        IndexModel([("userId", ASCENDING), ("year", ASCENDING), ("month", ASCENDING), ("type", ASCENDING)],
+                   unique=True, name="userId_year_month_type_unique")
+    ]
+}
+
+# Queries made by the services, as (name, collection name, filter, sort)
+service_queries = [
+    ("operation by id", "operations", {"id": 0}, None),
+    ("highest operation id", "operations", {}, [("id", DESCENDING)]),
+    ("operations of a user", "operations", {"userId": 0}, [("date", ASCENDING), ("id", ASCENDING)]),
+    ("operations of a user between dates", "operations",
+     {"userId": 0, "date": {"$gte": datetime(2000, 1, 1), "$lte": datetime(2000, 12, 31)}},
+     [("date", ASCENDING), ("id", ASCENDING)]),
+    ("operation values of a user between dates", "operations",
+     {"userId": 0, "date": {"$gte": datetime(2000, 1, 1), "$lt": datetime(2001, 1, 1)}}, None),
+    ("user by id", "users", {"id": 0}, None),
+    ("highest user id", "users", {}, [("id", DESCENDING)]),
+    ("user sign in", "users", {"username": "", "password": ""}, None),
+    ("monthly totals of a year", "monthly_totals", {"userId": 0, "year": 0}, None)
+]
+
+
+async def ensure_indexes():
+    """
+    Create the declared indexes that do not exist yet.
+
+    Existing indexes are left as they are, so this is cheap to run on every start. An index that cannot
+    be built, e.g. a unique index over duplicated data, is logged and skipped.
+
+    Returns:
+        List[str]: The "collection.index" names of the indexes built.
+    """
+
+    built = []
+    for collection_name, collection_indexes in indexes.items():
+        collection = getattr(db_service, collection_name)
+        existing = await collection.index_information()
+        for index in collection_indexes:
+            name = index.document["name"]
+            if name in existing:
+                continue
+            logger.info(f"Building index {collection_name}.{name}")
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                logger.error(f"Could not build index {collection_name}.{name}: {e}")
+                continue
+            logger.info(f"Built index {collection_name}.{name}")
+            built.append(f"{collection_name}.{name}")
+    return built
+
+
+async def check_query_plans():
+    """
+    Explain every service query to check that it is answered from an index.
+
+    Returns:
+        List[dict]: One document per query with keys "query", "collection", "stages" (the stages of the
+        winning plan) and "indexes" (the indexes it uses, empty for a collection scan).
+    """
+
+    plans = []
+    for name, collection_name, query, sort in service_queries:
+        cursor = getattr(db_service, collection_name).find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = []
+        index_names = []
+        _collect_stages(explanation["queryPlanner"]["winningPlan"], stages, index_names)
+        plans.append({"query": name, "collection": collection_name, "stages": stages, "indexes": index_names})
+    return plans
+
+
+def _collect_stages(plan, stages, index_names):
+    """
+    Walk a query plan and collect its stages and the indexes it scans.
+
+    Args:
+        plan (dict | list): A plan, or part of it, as returned by explain().
+        stages (List[str]): Receives the stage names.
+        index_names (List[str]): Receives the index names.
+    """
+
+    if isinstance(plan, list):
+        for stage in plan:
+            _collect_stages(stage, stages, index_names)
+        return
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    if "indexName" in plan:
+        index_names.append(plan["indexName"])
+    for value in plan.values():
+        if isinstance(value, (dict, list)):
+            _collect_stages(value, stages, index_names)
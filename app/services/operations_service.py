@@ -1,7 +1,17 @@
+import base64
+import json
+import logging
+import math
 from datetime import datetime
-from pymongo import DESCENDING
-from app.models.operation import Operation
+from pydantic import ValidationError
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.models.operation import Operation, StoredOperation
 from app.services.db_service import operations
+from app import config
+from app.services import users_service, rollup_service, counters_service
+
+logger = logging.getLogger(__name__)
 
 
 async def get_operation_by_id(operation_id):
@@ -12,12 +22,12 @@ async def get_operation_by_id(operation_id):
         operation_id (int): The ID of the operation to retrieve.
 
     Returns:
-        Operation: The operation object if found, else None.
+        StoredOperation: The operation object if found, else None.
     """
 
     operation = await operations.find_one({"id": operation_id})
     if operation:
-        return Operation(**operation)
+        return StoredOperation.from_document(operation)
     return None
 
 
@@ -29,12 +39,12 @@ async def get_all_operations(user_id: int):
         user_id (int): The ID of the user.
 
     Returns:
-        List[Operation]: A list of operation objects.
+        List[StoredOperation]: A list of operation objects.
     """
 
     cursor = operations.find({"userId": user_id})
     all_operations = await cursor.to_list(None)
-    return [Operation(**operation) for operation in all_operations]
+    return [StoredOperation.from_document(operation) for operation in all_operations]
 
 
 async def get_all_operations_between_dates(user_id: int, start_date: str, end_date: str):
@@ -47,7 +57,7 @@ async def get_all_operations_between_dates(user_id: int, start_date: str, end_da
         end_date (str): The end date of the range in format 'YYYY-MM-DD'.
 
     Returns:
-        List[Operation]: A list of operation objects.
+        List[StoredOperation]: A list of operation objects.
     """
 
     start_date_time = datetime.strptime(start_date, "%Y-%m-%d")
@@ -57,7 +67,179 @@ async def get_all_operations_between_dates(user_id: int, start_date: str, end_da
     )
     operations_in_range_list = await cursor.to_list(None)
 
-    return [Operation(**operation) for operation in operations_in_range_list]
+    return [StoredOperation.from_document(operation) for operation in operations_in_range_list]
+
+
+async def get_operation_values(user_id: int, start_date: datetime = None, end_date: datetime = None):
+    """
+    Retrieve the date, sum and type of a user's operations in a date range, without building models.
+
+    Dates are converted on the server to milliseconds since the epoch, which are much cheaper to decode
+    and to load into arrays than datetime objects.
+
+    Args:
+        user_id (int): The ID of the user.
+        start_date (datetime, optional): The start of the range, included.
+        end_date (datetime, optional): The end of the range, excluded.
+
+    Returns:
+        list: Documents with the date (milliseconds since the epoch), sum and type of each operation.
+    """
+
+    match = {"userId": user_id}
+    if start_date and end_date:
+        match["date"] = {"$gte": start_date, "$lt": end_date}
+    cursor = operations.aggregate([
+        {"$match": match},
+        {"$project": {"_id": 0, "date": {"$toLong": "$date"}, "sum": 1, "type": 1}}
+    ])
+    return await cursor.to_list(None)
+
+
+async def get_operations_page(user_id: int, limit: int, page_token: str = None, start_date: str = None,
+                              end_date: str = None):
+    """
+    Retrieve one page of a user's operations, ordered by date and ID, optionally within a date range.
+
+    Pages continue from the (date, id) of the last operation of the previous page instead of skipping
+    over it, so every page costs the same as the first one.
+
+    Args:
+        user_id (int): The ID of the user.
+        limit (int): The maximum number of operations of the page.
+        page_token (str, optional): The token returned with the previous page. If None, returns the first page.
+        start_date (str, optional): The start date of the range in format 'YYYY-MM-DD'.
+        end_date (str, optional): The end date of the range in format 'YYYY-MM-DD'.
+
+    Returns:
+        tuple: The list of StoredOperation of the page, and the token of the next page or None if it is the last.
+
+    Raises:
+        ValueError: If the page token is not valid.
+    """
+
+    query = _build_listing_query(user_id, page_token, start_date, end_date)
+    cursor = operations.find(query).sort([("date", ASCENDING), ("id", ASCENDING)]).limit(limit + 1)
+    page = await cursor.to_list(limit + 1)
+    next_page_token = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_page_token = encode_page_token(page[-1]["date"], page[-1]["id"])
+    return [StoredOperation.from_document(operation) for operation in page], next_page_token
+
+
+async def stream_operations(user_id: int, page_token: str = None, start_date: str = None, end_date: str = None):
+    """
+    Retrieve a user's operations one by one as the database returns them, ordered by date and ID.
+
+    Args:
+        user_id (int): The ID of the user.
+        page_token (str, optional): A page token to continue from. If None, starts with the first operation.
+        start_date (str, optional): The start date of the range in format 'YYYY-MM-DD'.
+        end_date (str, optional): The end date of the range in format 'YYYY-MM-DD'.
+
+    Yields:
+        StoredOperation: The next operation.
+
+    Raises:
+        ValueError: If the page token is not valid.
+    """
+
+    query = _build_listing_query(user_id, page_token, start_date, end_date)
+    cursor = operations.find(query, batch_size=config.STREAM_BATCH_SIZE).sort([("date", ASCENDING), ("id", ASCENDING)])
+    async for operation in cursor:
+        yield StoredOperation.from_document(operation)
+
+
+def _build_listing_query(user_id: int, page_token: str = None, start_date: str = None, end_date: str = None):
+    """
+    Build the query of an operation listing ordered by date and ID.
+
+    Args:
+        user_id (int): The ID of the user.
+        page_token (str, optional): A page token to continue from.
+        start_date (str, optional): The start date of the range in format 'YYYY-MM-DD'.
+        end_date (str, optional): The end date of the range in format 'YYYY-MM-DD'.
+
+    Returns:
+        dict: The query.
+
+    Raises:
+        ValueError: If the page token is not valid.
+    """
+
+    query = {"userId": user_id}
+    if start_date and end_date:
+        query["date"] = {"$gte": datetime.strptime(start_date, "%Y-%m-%d"),
+                         "$lte": datetime.strptime(end_date, "%Y-%m-%d")}
+    if page_token:
+        last_date, last_id = decode_page_token(page_token)
+        query["$or"] = [{"date": {"$gt": last_date}}, {"date": last_date, "id": {"$gt": last_id}}]
+    return query
+
+
+def encode_page_token(date: datetime, operation_id: int):
+    """
+    Build the opaque token of the page following an operation.
+
+    Args:
+        date (datetime): The date of the last operation of the page.
+        operation_id (int): The ID of the last operation of the page.
+
+    Returns:
+        str: The page token.
+    """
+
+    return base64.urlsafe_b64encode(json.dumps([date.isoformat(), operation_id]).encode()).decode()
+
+
+def decode_page_token(page_token: str):
+    """
+    Read a token built by encode_page_token.
+
+    Args:
+        page_token (str): The page token.
+
+    Returns:
+        tuple: The date and the ID of the last operation of the previous page.
+
+    Raises:
+        ValueError: If the page token is not valid.
+    """
+
+    try:
+        date, operation_id = json.loads(base64.urlsafe_b64decode(page_token.encode()))
+        return datetime.fromisoformat(date), int(operation_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Page token is not valid') from e
+
+
+async def get_monthly_sums(user_id: int, start_date: str = None, end_date: str = None):
+    """
+    Sum a user's operations per year, month and type on the database server.
+
+    Args:
+        user_id (int): The ID of the user.
+        start_date (str, optional): The start date of the range in format 'YYYY-MM-DD'.
+        end_date (str, optional): The end date of the range in format 'YYYY-MM-DD'.
+
+    Returns:
+        List[dict]: One document per (year, month, type) with keys "year", "month", "type" and "total".
+    """
+
+    match = {"userId": user_id}
+    if start_date and end_date:
+        match["date"] = {"$gte": datetime.strptime(start_date, "%Y-%m-%d"),
+                         "$lte": datetime.strptime(end_date, "%Y-%m-%d")}
+    cursor = operations.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"year": {"$year": "$date"}, "month": {"$month": "$date"}, "type": "$type"},
+            "total": {"$sum": "$sum"}
+        }},
+        {"$project": {"_id": 0, "year": "$_id.year", "month": "$_id.month", "type": "$_id.type", "total": 1}}
+    ])
+    return await cursor.to_list(None)
 
 
 async def add_operation(operation: Operation):
@@ -68,27 +250,121 @@ async def add_operation(operation: Operation):
         operation (Operation): The operation object to add.
 
     Returns:
-        bool: True if operation added successfully, else False.
+        bool: True if operation added successfully, else False, e.g. when the write concern does not
+        acknowledge the insert (w=0).
     """
 
-    operation_id = await get_operation_id()
-    operations.insert_one({
+    if not await users_service.user_exists(operation.userId):
+        return False
+    operation_id = await counters_service.allocate_ids("operations")
+    result = await operations.insert_one({
         "id": operation_id,
         "sum": operation.sum,
         "userId": operation.userId,
         "type": operation.type,
         "date": operation.date
     })
-    new_operation_created = await operations.find_one({"id": operation_id})
-    if new_operation_created:
-        return True
-    return False
+    await _increment_monthly_totals(operation_id, [
+        (rollup_service.bucket(operation.userId, operation.date, operation.type), operation.sum)
+    ])
+    return result.acknowledged and result.inserted_id is not None
+
+
+async def add_operations(raw_operations, chunk_size: int = config.BULK_CHUNK_SIZE, operation_ids=None):
+    """
+    Add many operations to the database.
+
+    The operations are validated in one pass, their users are checked with a single query and their IDs
+    are reserved in one step. They are then written with unordered inserts of `chunk_size` operations,
+    so an invalid or failing operation, or a failing chunk, never stops the others from being added.
+
+    Args:
+        raw_operations (List[dict]): The operations to add. Their "id" is ignored.
+        chunk_size (int): The number of operations written per insert.
+        operation_ids (List[int], optional): The IDs to give the operations, in the same order. If None,
+            IDs are reserved for the valid operations.
+
+    Returns:
+        dict: "inserted", the number of operations added, "errors", a list of documents with the
+        "index" of a rejected operation and the "error" that rejected it, and "totals_updated", False
+        if the monthly totals of some added operations could not be updated.
+    """
+
+    errors = []
+    valid_operations = []
+    for index, raw_operation in enumerate(raw_operations):
+        try:
+            valid_operations.append((index, Operation.model_validate({**raw_operation, "id": 0})))
+        except (ValidationError, TypeError) as e:
+            errors.append({"index": index, "error": _describe_error(e)})
+
+    existing_user_ids = await users_service.get_existing_user_ids(
+        operation.userId for _, operation in valid_operations)
+    new_operations = []
+    for index, operation in valid_operations:
+        if operation.userId in existing_user_ids:
+            new_operations.append((index, operation))
+        else:
+            errors.append({"index": index, "error": "User does not exist"})
+
+    inserted = 0
+    totals_updated = True
+    if new_operations:
+        if operation_ids is None:
+            first_id = await counters_service.allocate_ids("operations", len(new_operations))
+            operation_ids = {index: first_id + position for position, (index, _) in enumerate(new_operations)}
+        for chunk_start in range(0, len(new_operations), chunk_size):
+            chunk = new_operations[chunk_start:chunk_start + chunk_size]
+            documents = [{"id": operation_ids[index], "sum": operation.sum, "userId": operation.userId,
+                          "type": operation.type, "date": operation.date}
+                         for index, operation in chunk]
+            failed_positions = set()
+            try:
+                await operations.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                for write_error in e.details["writeErrors"]:
+                    failed_positions.add(write_error["index"])
+                    errors.append({"index": chunk[write_error["index"]][0], "error": write_error["errmsg"]})
+            except PyMongoError as e:
+                # The chunk failed as a whole, the next chunks are still written
+                failed_positions.update(range(len(chunk)))
+                errors += [{"index": index, "error": f"Not written: {e}"} for index, _ in chunk]
+            inserted_chunk = [(operation_ids[index], operation) for position, (index, operation) in enumerate(chunk)
+                              if position not in failed_positions]
+            if inserted_chunk:
+                totals_updated &= await _increment_monthly_totals(
+                    ", ".join(str(operation_id) for operation_id, _ in inserted_chunk),
+                    [(rollup_service.bucket(operation.userId, operation.date, operation.type), operation.sum)
+                     for _, operation in inserted_chunk])
+            inserted += len(inserted_chunk)
+
+    errors.sort(key=lambda error: error["index"])
+    return {"inserted": inserted, "errors": errors, "totals_updated": totals_updated}
+
+
+def _describe_error(error):
+    """
+    Describe why an operation is not valid.
+
+    Args:
+        error (Exception): The error raised while validating the operation.
+
+    Returns:
+        str: A short description of every problem found.
+    """
+
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+                         for detail in error.errors())
+    return str(error)
 
 
 async def update_operation(operation_id: int, operation: Operation):
     """
     Update properties of an operation.
 
+    The amount is moved between monthly totals when the date, type, sum or user changes.
+
     Args:
         operation_id (int): The ID of the operation to update.
         operation (Operation): The updated operation object.
@@ -97,11 +373,17 @@ async def update_operation(operation_id: int, operation: Operation):
         bool: True if operation updated successfully, else False.
     """
 
-    await operations.update_one({"id": operation_id}, {
-        "$set": {"sum": operation.sum, "userId": operation.userId, "type": operation.type.value,
+    if not await users_service.user_exists(operation.userId):
+        return False
+    previous_operation = await operations.find_one_and_update({"id": operation_id}, {
+        "$set": {"sum": operation.sum, "userId": operation.userId, "type": operation.type,
                  "date": operation.date}})
-    updated_operation = operations.find_one({"id": operation_id})
-    if updated_operation:
+    if previous_operation:
+        await _increment_monthly_totals(operation_id, [
+            (rollup_service.bucket(previous_operation["userId"], previous_operation["date"],
+                                   previous_operation["type"]), -previous_operation["sum"]),
+            (rollup_service.bucket(operation.userId, operation.date, operation.type), operation.sum)
+        ])
         return True
     return False
 
@@ -117,22 +399,131 @@ async def delete_operation(operation_id: int):
         bool: True if operation deleted successfully, else False.
     """
 
-    await operations.delete_one({"id": operation_id})
-    if get_operation_by_id(operation_id):
+    deleted_operation = await operations.find_one_and_delete({"id": operation_id})
+    if deleted_operation:
+        await _increment_monthly_totals(operation_id, [
+            (rollup_service.bucket(deleted_operation["userId"], deleted_operation["date"],
+                                   deleted_operation["type"]), -deleted_operation["sum"])
+        ])
         return True
     return False
 
 
+async def _increment_monthly_totals(operation_id, changes):
+    """
+    Apply the changes of written operations to the monthly totals.
+
+    The operations are already written, so a failure is logged rather than raised: the monthly totals
+    then stay wrong until they are rebuilt.
+
+    Args:
+        operation_id (int | str): The ID of the written operation, or the IDs of several.
+        changes (List[tuple]): Pairs of (bucket, amount), see rollup_service.increment.
+
+    Returns:
+        bool: True if the monthly totals were updated.
+    """
+
+    try:
+        await rollup_service.increment(changes)
+    except PyMongoError as e:
+        logger.warning(f"Monthly totals not updated for operation {operation_id}, "
+                       f"run 'python -m app.manage rebuild-rollups': {e}")
+        return False
+    return True
+
+
+async def rebuild_monthly_totals(user_id: int = None):
+    """
+    Recompute monthly totals from the raw operations.
+
+    Monthly totals are eventually consistent with the operations: every write updates them with a
+    separate write, and a failure between the two leaves them wrong (the operation ID is logged as
+    a warning) until they are rebuilt here. verify_monthly_totals reports such drift.
+
+    Should run while operations are not being written, since totals are replaced user by user.
+
+    Args:
+        user_id (int, optional): The ID of the user to rebuild. If None, rebuilds all users.
+
+    Returns:
+        int: The number of users rebuilt.
+    """
+
+    user_ids = await _get_monthly_totals_user_ids(user_id)
+    for current_user_id in user_ids:
+        await rollup_service.replace_monthly_totals(current_user_id, await get_monthly_sums(current_user_id))
+    return len(user_ids)
+
+
+async def rebuild_monthly_totals_of_months(months):
+    """
+    Recompute some monthly totals from the raw operations.
+
+    Args:
+        months (Iterable[tuple]): The (user ID, year, month) of every month to recompute.
+    """
+
+    for user_id, year, month in sorted(set(months)):
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        cursor = operations.aggregate([
+            {"$match": {"userId": user_id, "date": {"$gte": start, "$lt": end}}},
+            {"$group": {"_id": "$type", "total": {"$sum": "$sum"}}}
+        ])
+        totals = {total["_id"]: total["total"] for total in await cursor.to_list(None)}
+        await rollup_service.replace_month(user_id, year, month, totals)
+
+
+async def verify_monthly_totals(user_id: int = None):
+    """
+    Compare monthly totals with totals recomputed from the raw operations.
+
+    Args:
+        user_id (int, optional): The ID of the user to verify. If None, verifies all users.
+
+    Returns:
+        List[dict]: One document per drifted total with keys "userId", "year", "month", "type",
+        "expected" and "actual".
+    """
+
+    drift = []
+    for current_user_id in await _get_monthly_totals_user_ids(user_id):
+        expected = {(monthly_sum["year"], monthly_sum["month"], monthly_sum["type"]): monthly_sum["total"]
+                    for monthly_sum in await get_monthly_sums(current_user_id)}
+        actual = {(monthly_total["year"], monthly_total["month"], monthly_total["type"]): monthly_total["total"]
+                  for monthly_total in await rollup_service.get_all_monthly_totals(current_user_id)}
+        for year, month, operation_type in sorted(expected.keys() | actual.keys()):
+            expected_total = expected.get((year, month, operation_type), 0)
+            actual_total = actual.get((year, month, operation_type), 0)
+            if not math.isclose(expected_total, actual_total, abs_tol=1e-6):
+                drift.append({"userId": current_user_id, "year": year, "month": month, "type": operation_type,
+                              "expected": expected_total, "actual": actual_total})
+    return drift
+
+
+async def _get_monthly_totals_user_ids(user_id: int = None):
+    """
+    Get the users whose monthly totals should be rebuilt or verified.
+
+    Args:
+        user_id (int, optional): A single user ID.
+
+    Returns:
+        List[int]: The given user ID, or every user that has operations or monthly totals.
+    """
+
+    if user_id is not None:
+        return [user_id]
+    return sorted(set(await operations.distinct("userId")) | set(await rollup_service.get_user_ids()))
+
+
 async def get_operation_id():
     """
-    Get the next available operation ID.
+    Get the next available operation ID, without reserving it.
 
     Returns:
         int: The next operation ID.
     """
 
-    max_id_operation = await operations.find_one({}, sort=[("id", DESCENDING)])
-    if max_id_operation:
-        return max_id_operation["id"] + 1
-    else:
-        return 1
+    return await counters_service.get_next_id("operations")
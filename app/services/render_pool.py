@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# Worker processes rendering charts, created by start()
+_executor = None
+
+# Number of renders queued or running in the workers, including renders whose caller timed out
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class RenderPoolBusy(Exception):
+    """
+    Raised when the render queue is full.
+    """
+
+
+def start():
+    """
+    Start the worker processes, if they are not running yet.
+
+    Workers are spawned rather than forked, so they do not inherit the event loop or database clients,
+    and only import the chart functions they are asked to run. Each worker builds the chart templates
+    before taking its first render.
+    """
+
+    global _executor
+    if _executor is None and config.RENDER_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=config.RENDER_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_prepare_worker)
+        logger.info(f"Started {config.RENDER_WORKERS} chart render worker(s)")
+
+
+def _prepare_worker():
+    """
+    Build the chart templates of a new worker process.
+    """
+
+    from app.services import charts
+    charts.prepare_templates()
+
+
+async def shutdown():
+    """
+    Stop the worker processes, cancelling the renders that have not started yet.
+    """
+
+    global _executor
+    if _executor is not None:
+        executor, _executor = _executor, None
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+        logger.info("Stopped chart render workers")
+
+
+async def render(func, *args):
+    """
+    Run a chart function in a worker process, so rendering never blocks the event loop.
+
+    Parameters:
+    - func (Callable): A module-level function, e.g. charts.create_bar_chart.
+    - *args: Its arguments. They and its result must be picklable.
+
+    Returns:
+    - Any: The return value of func.
+
+    Raises:
+    - RenderPoolBusy: If RENDER_QUEUE_SIZE renders are already queued or running.
+    - TimeoutError: If the render takes longer than RENDER_TIMEOUT_SECONDS.
+    """
+    global _pending
+    if config.RENDER_WORKERS <= 0:
+        return func(*args)
+    start()
+    with _pending_lock:
+        if _pending >= config.RENDER_QUEUE_SIZE:
+            raise RenderPoolBusy(f"{_pending} charts are already being rendered")
+        _pending += 1
+    try:
+        future = _executor.submit(func, *args)
+    except BaseException:
+        _release()
+        raise
+    # A worker keeps rendering after its caller timed out, so its slot is freed when it actually finishes
+    future.add_done_callback(_release)
+    return await asyncio.wait_for(asyncio.wrap_future(future), config.RENDER_TIMEOUT_SECONDS)
+
+
+def _release(future=None):
+    """
+    Free the slot of a finished render. Called from the executor's thread.
+    """
+
+    global _pending
+    with _pending_lock:
+        _pending -= 1
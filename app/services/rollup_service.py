@@ -0,0 +1,142 @@
+from datetime import timezone
+from pymongo import UpdateOne
+from app.services.db_service import monthly_totals
+
+
+def bucket(user_id: int, date, operation_type: str):
+    """
+    Build the key of the monthly total an operation belongs to.
+
+    Args:
+        user_id (int): The ID of the user.
+        date (datetime): The date of the operation. Aware dates are bucketed in UTC, like the database does.
+        operation_type (str): The type of the operation.
+
+    Returns:
+        dict: The key fields of the monthly total.
+    """
+
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc)
+    return {"userId": user_id, "year": date.year, "month": date.month, "type": operation_type}
+
+
+async def increment(changes):
+    """
+    Add amounts to monthly totals, creating the totals that do not exist yet.
+
+    Every change is an atomic $inc, so concurrent writers never lose an update. Changes to the same
+    bucket are merged first, so a batch of operations costs one update per bucket.
+
+    Args:
+        changes (List[tuple]): Pairs of (bucket, amount), amount being negative to subtract.
+    """
+
+    merged = {}
+    for key, amount in changes:
+        bucket_key = tuple(key.items())
+        merged[bucket_key] = merged.get(bucket_key, 0) + amount
+    requests = [UpdateOne(dict(bucket_key), {"$inc": {"total": amount}}, upsert=True)
+                for bucket_key, amount in merged.items() if amount]
+    if requests:
+        await monthly_totals.bulk_write(requests, ordered=False)
+
+
+async def get_monthly_totals(user_id: int, year: int):
+    """
+    Retrieve the monthly totals of a user for one year.
+
+    Args:
+        user_id (int): The ID of the user.
+        year (int): The year.
+
+    Returns:
+        List[dict]: At most one document per month and type with keys "month", "type" and "total".
+    """
+
+    cursor = monthly_totals.find({"userId": user_id, "year": year}, {"_id": 0, "month": 1, "type": 1, "total": 1})
+    return await cursor.to_list(None)
+
+
+async def get_all_monthly_totals(user_id: int):
+    """
+    Retrieve every monthly total of a user.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        List[dict]: Documents with keys "year", "month", "type" and "total".
+    """
+
+    cursor = monthly_totals.find({"userId": user_id}, {"_id": 0, "year": 1, "month": 1, "type": 1, "total": 1})
+    return await cursor.to_list(None)
+
+
+async def get_balance_before(user_id: int, year: int, month: int):
+    """
+    Calculate the balance of a user from the monthly totals of the months before a given month.
+
+    Args:
+        user_id (int): The ID of the user.
+        year (int): The year of the month.
+        month (int): The month, not included in the balance.
+
+    Returns:
+        float: The revenues minus the expenses of all earlier months.
+    """
+
+    cursor = monthly_totals.aggregate([
+        {"$match": {"userId": user_id, "$or": [{"year": {"$lt": year}}, {"year": year, "month": {"$lt": month}}]}},
+        {"$group": {"_id": "$type", "total": {"$sum": "$total"}}}
+    ])
+    totals = {total["_id"]: total["total"] for total in await cursor.to_list(None)}
+    return totals.get("revenue", 0.0) - totals.get("expense", 0.0)
+
+
+async def get_user_ids():
+    """
+    Retrieve the IDs of all users that have monthly totals.
+
+    Returns:
+        List[int]: The user IDs.
+    """
+
+    return await monthly_totals.distinct("userId")
+
+
+async def replace_monthly_totals(user_id: int, monthly_sums):
+    """
+    Replace all monthly totals of a user.
+
+    Args:
+        user_id (int): The ID of the user.
+        monthly_sums (List[dict]): Documents with keys "year", "month", "type" and "total".
+    """
+
+    await monthly_totals.delete_many({"userId": user_id})
+    if monthly_sums:
+        await monthly_totals.insert_many([
+            {"userId": user_id, "year": monthly_sum["year"], "month": monthly_sum["month"],
+             "type": monthly_sum["type"], "total": monthly_sum["total"]}
+            for monthly_sum in monthly_sums
+        ])
+
+
+async def replace_month(user_id: int, year: int, month: int, totals: dict):
+    """
+    Replace the monthly totals of a user for one month.
+
+    Args:
+        user_id (int): The ID of the user.
+        year (int): The year.
+        month (int): The month.
+        totals (dict): The total of each operation type of the month.
+    """
+
+    await monthly_totals.delete_many({"userId": user_id, "year": year, "month": month})
+    if totals:
+        await monthly_totals.insert_many([
+            {"userId": user_id, "year": year, "month": month, "type": operation_type, "total": total}
+            for operation_type, total in totals.items()
+        ])
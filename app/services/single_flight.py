@@ -0,0 +1,97 @@
+import asyncio
+from functools import wraps
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call is in flight, callers with the same key await
+    its result instead of starting their own.
+
+    Callers share the result object, so they must not modify it. A caller that is cancelled does not
+    cancel the shared call.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._counters = {}
+
+    async def do(self, name: str, key, func, *args, **kwargs):
+        """
+        Runs func, or joins the identical call already in flight.
+
+        Args:
+            name (str): Name the call is counted under.
+            key: Hashable key identifying the call among the calls of the same name.
+            func (Callable): The coroutine function to call.
+            *args: Its positional arguments.
+            **kwargs: Its keyword arguments.
+
+        Returns:
+            Any: The return value of func.
+        """
+        counters = self._counters.setdefault(name, {"calls": 0, "coalesced": 0})
+        counters["calls"] += 1
+        flight_key = (name, key)
+        task = self._in_flight.get(flight_key)
+        if task is not None:
+            counters["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda done: self._forget(flight_key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, flight_key, task):
+        """
+        Removes a finished call, so the next call with its key runs again.
+        """
+        if self._in_flight.get(flight_key) is task:
+            del self._in_flight[flight_key]
+
+    def stats(self):
+        """
+        Reports how many calls were made and coalesced.
+
+        Returns:
+            dict: The calls in flight, the totals and the counters of each name.
+        """
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": sum(counters["calls"] for counters in self._counters.values()),
+            "coalesced": sum(counters["coalesced"] for counters in self._counters.values()),
+            "functions": {name: dict(counters) for name, counters in self._counters.items()}
+        }
+
+
+def _freeze(value):
+    """
+    Converts an argument to a hashable value, turning lists and dicts into tuples.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def single_flight(func):
+    """
+    Decorator coalescing identical concurrent calls of a coroutine function, keyed by its arguments.
+
+    Args:
+        func (Callable): The coroutine function.
+
+    Returns:
+        Callable: The coalescing function.
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await flights.do(name, (_freeze(args), _freeze(kwargs)), func, *args, **kwargs)
+
+    return wrapper
+
+
+# Calls in flight of this process
+flights = SingleFlight()
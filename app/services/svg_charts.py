@@ -0,0 +1,190 @@
+import io
+import math
+from xml.sax.saxutils import escape, quoteattr
+
+# Size of the chart, the same as the default matplotlib figure
+width, height = 640, 480
+
+# Margins around the plotting area
+margin_left, margin_right, margin_top, margin_bottom = 80, 20, 50, 100
+
+# Colors of the data series, matplotlib's default color cycle
+colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+          '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+
+def _nice_ticks(low, high, count=6):
+    """
+    Chooses round tick values covering a range.
+
+    Parameters:
+    - low (float): Lowest value to cover.
+    - high (float): Highest value to cover.
+    - count (int): Approximate number of ticks.
+
+    Returns:
+    - tuple: The tick values and the step between them.
+    """
+    if low == high:
+        low, high = low - 1, high + 1
+    raw_step = (high - low) / (count - 1)
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(factor * magnitude for factor in (1, 2, 2.5, 5, 10) if factor * magnitude >= raw_step)
+    first = math.floor(low / step)
+    last = math.ceil(high / step)
+    return [i * step for i in range(first, last + 1)], step
+
+
+def _format_tick(value, step):
+    """
+    Formats a tick value with as many decimals as the step needs.
+
+    Parameters:
+    - value (float): The tick value.
+    - step (float): The step between ticks.
+
+    Returns:
+    - str: The tick label.
+    """
+    decimals = 0
+    while decimals < 10 and not math.isclose(round(step, decimals), step):
+        decimals += 1
+    label = f"{value:.{decimals}f}"
+    return "0" if float(label) == 0 else label
+
+
+def _text(x, y, content, size=12, anchor="middle", transform=""):
+    """
+    Builds an SVG text element.
+    """
+    transform = f' transform="{transform}"' if transform else ""
+    return (f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" text-anchor="{anchor}"{transform}>'
+            f'{escape(str(content))}</text>')
+
+
+def _chart(x, y_data, labels, title, ylabel, draw_series, include_zero):
+    """
+    Builds an SVG chart: axes, ticks, labels, title and legend around series drawn by draw_series.
+
+    Parameters:
+    - x (list): X-axis labels.
+    - y_data (list of lists): Y-axis data for each series.
+    - labels (list): Labels for each series.
+    - title (str): Title of the chart.
+    - ylabel (str): Label for the Y-axis.
+    - draw_series (Callable): Called with (y_data, slot_x, slot_width, y_position) and returns SVG elements.
+    - include_zero (bool): Whether the Y-axis must include 0.
+
+    Returns:
+    - BytesIO: In-memory buffer containing the SVG image.
+    """
+    values = [value for y in y_data for value in y]
+    low, high = (min(values), max(values)) if values else (0, 1)
+    if include_zero:
+        low, high = min(low, 0), max(high, 0)
+    ticks, step = _nice_ticks(low, high)
+    low, high = ticks[0], ticks[-1]
+
+    plot_left, plot_top = margin_left, margin_top
+    plot_width = width - margin_left - margin_right
+    plot_height = height - margin_top - margin_bottom
+    slot_width = plot_width / max(len(x), 1)
+
+    def slot_x(index):
+        return plot_left + (index + 0.5) * slot_width
+
+    def y_position(value):
+        return plot_top + plot_height - (value - low) / (high - low) * plot_height
+
+    elements = [f'<rect width="{width}" height="{height}" fill="white"/>',
+                _text(width / 2, margin_top / 2 + 6, title, size=14)]
+    for tick in ticks:
+        y = y_position(tick)
+        elements.append(f'<line x1="{plot_left}" y1="{y:.1f}" x2="{plot_left - 5}" y2="{y:.1f}" stroke="black"/>')
+        elements.append(_text(plot_left - 8, y + 4, _format_tick(tick, step), size=10, anchor="end"))
+    for index, label in enumerate(x):
+        tick_x = slot_x(index)
+        tick_y = plot_top + plot_height
+        elements.append(f'<line x1="{tick_x:.1f}" y1="{tick_y}" x2="{tick_x:.1f}" y2="{tick_y + 5}" stroke="black"/>')
+        elements.append(_text(tick_x, tick_y + 18, label, size=10, anchor="end",
+                              transform=f"rotate(-45 {tick_x:.1f} {tick_y + 18})"))
+    elements.append(_text(plot_left + plot_width / 2, height - 10, 'Month'))
+    elements.append(_text(20, plot_top + plot_height / 2, ylabel,
+                          transform=f"rotate(-90 20 {plot_top + plot_height / 2:.1f})"))
+
+    elements.extend(draw_series(y_data, slot_x, slot_width, y_position))
+    if low < 0 < high:
+        zero = y_position(0)
+        elements.append(f'<line x1="{plot_left}" y1="{zero:.1f}" x2="{plot_left + plot_width}" y2="{zero:.1f}" '
+                        f'stroke="#999" stroke-width="0.5"/>')
+    elements.append(f'<rect x="{plot_left}" y="{plot_top}" width="{plot_width}" height="{plot_height}" '
+                    f'fill="none" stroke="black"/>')
+
+    for index, label in enumerate(labels):
+        legend_y = plot_top + 15 + index * 18
+        legend_x = plot_left + plot_width - 10
+        elements.append(f'<rect x="{legend_x - 20}" y="{legend_y - 9}" width="14" height="10" '
+                        f'fill="{colors[index % len(colors)]}"/>')
+        elements.append(_text(legend_x - 26, legend_y, label, size=10, anchor="end"))
+
+    svg = (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'viewBox="0 0 {width} {height}" font-family="sans-serif" aria-label={quoteattr(str(title))}>'
+           + "".join(elements) + '</svg>')
+    return io.BytesIO(svg.encode())
+
+
+def create_plot(x, y_data, labels, title, ylabel):
+    """
+    Creates a line plot with the given data as an SVG image.
+
+    Parameters:
+    - x (list): X-axis labels.
+    - y_data (list of lists): Y-axis data for multiple lines.
+    - labels (list): Labels for each line.
+    - title (str): Title of the plot.
+    - ylabel (str): Label for the Y-axis.
+
+    Returns:
+    - BytesIO: In-memory buffer containing the SVG image.
+    """
+    def draw_lines(y_data, slot_x, slot_width, y_position):
+        elements = []
+        for series_index, y in enumerate(y_data):
+            color = colors[series_index % len(colors)]
+            points = [(slot_x(index), y_position(value)) for index, value in enumerate(y)]
+            path = " ".join(f"{px:.1f},{py:.1f}" for px, py in points)
+            elements.append(f'<polyline points="{path}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+            elements.extend(f'<circle cx="{px:.1f}" cy="{py:.1f}" r="3" fill="{color}"/>' for px, py in points)
+        return elements
+
+    return _chart(x, y_data, labels, title, ylabel, draw_lines, include_zero=False)
+
+
+def create_bar_chart(x, y_data, labels, title, ylabel):
+    """
+    Creates a bar chart with the given data as an SVG image.
+
+    Parameters:
+    - x (list): X-axis labels.
+    - y_data (list of lists): Y-axis data for multiple bars.
+    - labels (list): Labels for each set of bars.
+    - title (str): Title of the chart.
+    - ylabel (str): Label for the Y-axis.
+
+    Returns:
+    - BytesIO: In-memory buffer containing the SVG image.
+    """
+    def draw_bars(y_data, slot_x, slot_width, y_position):
+        elements = []
+        bar_width = slot_width * 0.7 / max(len(y_data), 1)
+        zero = y_position(0)
+        for series_index, y in enumerate(y_data):
+            color = colors[series_index % len(colors)]
+            for index, value in enumerate(y):
+                bar_x = slot_x(index) - slot_width * 0.35 + series_index * bar_width
+                top = y_position(value)
+                elements.append(f'<rect x="{bar_x:.1f}" y="{min(top, zero):.1f}" width="{bar_width:.1f}" '
+                                f'height="{abs(zero - top):.1f}" fill="{color}"/>')
+        return elements
+
+    return _chart(x, y_data, labels, title, ylabel, draw_bars, include_zero=True)
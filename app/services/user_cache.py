@@ -0,0 +1,68 @@
+import time
+from app import config
+
+
+class UserIdCache:
+    """
+    In-process cache of user IDs known to exist or known to be missing.
+
+    Positive and negative entries expire after their own TTL, so a user created by another worker
+    is seen after at most the negative TTL. When the cache is full the oldest entry is dropped.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_size: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = {}
+
+    def get(self, user_id: int):
+        """
+        Looks up a user ID.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            bool: True or False if the existence of the user is cached, else None.
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        exists, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        return exists
+
+    def set(self, user_id: int, exists: bool):
+        """
+        Records whether a user exists.
+
+        Args:
+            user_id (int): The ID of the user.
+            exists (bool): True if the user exists, else False.
+        """
+        if user_id not in self._entries and len(self._entries) >= self.max_size:
+            del self._entries[next(iter(self._entries))]
+        ttl = self.ttl if exists else self.negative_ttl
+        self._entries[user_id] = (exists, time.monotonic() + ttl)
+
+    def invalidate(self, user_id: int):
+        """
+        Forgets a user ID.
+
+        Args:
+            user_id (int): The ID of the user.
+        """
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        """
+        Forgets all user IDs.
+        """
+        self._entries.clear()
+
+
+known_users = UserIdCache(config.USER_CACHE_TTL_SECONDS, config.USER_CACHE_NEGATIVE_TTL_SECONDS,
+                          config.USER_CACHE_MAX_SIZE)
@@ -1,7 +1,9 @@
-from pymongo import DESCENDING
-from app.services.db_service import synchronise_users
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from app.models.user import User
 from app.services.db_service import users
+from app.services.user_cache import known_users
+from app.services import counters_service
 
 
 async def signin(user: User):
@@ -29,19 +31,22 @@ async def signup(new_user: User):
         new_user (User): The user object containing username and password for the new user.
 
     Returns:
-        bool: True if sign up successful, False otherwise.
+        bool: True if sign up successful, False otherwise, e.g. when the username is taken or the
+        write concern does not acknowledge the insert (w=0).
     """
 
-    user_id = await get_user_id()
-    users.insert_one({
-        "id": user_id,
-        "username": new_user.username,
-        "password": new_user.password
-    })
-    new_user_created = await users.find_one({"id": user_id})
-    if new_user_created:
-        return True
-    return False
+    user_id = await counters_service.allocate_ids("users")
+    try:
+        result = await users.insert_one({
+            "id": user_id,
+            "username": new_user.username,
+            "password": new_user.password
+        })
+    except DuplicateKeyError:
+        return False
+    finally:
+        known_users.invalidate(user_id)
+    return result.acknowledged and result.inserted_id is not None
 
 
 async def update_user_profile(user_id: int, user: User):
@@ -53,30 +58,34 @@ async def update_user_profile(user_id: int, user: User):
         user (User): The user object containing updated details.
 
     Returns:
-        User: The updated user object.
+        User: The updated user object, or None if there is no such user or the username is taken.
     """
 
-    await users.update_one({"id": user_id}, {"$set": {"username": user.username, "password": user.password}})
-    user_updated = await users.find_one({"id": user_id, "username": user.username, "password": user.password})
+    try:
+        user_updated = await users.find_one_and_update(
+            {"id": user_id}, {"$set": {"username": user.username, "password": user.password}},
+            return_document=ReturnDocument.AFTER)
+    except DuplicateKeyError:
+        return None
+    finally:
+        known_users.invalidate(user_id)
+    if user_updated is None:
+        return None
     return User(**user_updated)
 
 
 async def get_user_id():
     """
-    Get the next available user ID.
+    Get the next available user ID, without reserving it.
 
     Returns:
         int: The next available user ID.
     """
 
-    max_id_user = await users.find_one({}, sort=[("id", DESCENDING)])
-    if max_id_user:
-        return max_id_user["id"] + 1
-    else:
-        return 1
+    return await counters_service.get_next_id("users")
 
 
-def get_user_by_id(user_id: int):
+async def get_user_by_id(user_id: int):
     """
     Retrieve a user by their ID.
 
@@ -87,4 +96,50 @@ def get_user_by_id(user_id: int):
         dict: The user document from the database.
     """
 
-    return synchronise_users.find_one({"id": user_id})
+    return await users.find_one({"id": user_id})
+
+
+async def user_exists(user_id: int):
+    """
+    Check whether a user exists, answering from the known-user cache when possible.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        bool: True if the user exists, False otherwise.
+    """
+
+    exists = known_users.get(user_id)
+    if exists is None:
+        exists = await users.find_one({"id": user_id}, {"_id": 1}) is not None
+        known_users.set(user_id, exists)
+    return exists
+
+
+async def get_existing_user_ids(user_ids):
+    """
+    Check which of many users exist, with a single query for the ones not in the known-user cache.
+
+    Args:
+        user_ids (Iterable[int]): The IDs of the users.
+
+    Returns:
+        set: The IDs of the users that exist.
+    """
+
+    existing_user_ids = set()
+    unknown_user_ids = set()
+    for user_id in set(user_ids):
+        exists = known_users.get(user_id)
+        if exists is None:
+            unknown_user_ids.add(user_id)
+        elif exists:
+            existing_user_ids.add(user_id)
+    if unknown_user_ids:
+        cursor = users.find({"id": {"$in": list(unknown_user_ids)}}, {"_id": 0, "id": 1})
+        found_user_ids = {user["id"] for user in await cursor.to_list(None)}
+        for user_id in unknown_user_ids:
+            known_users.set(user_id, user_id in found_user_ids)
+        existing_user_ids |= found_user_ids
+    return existing_user_ids
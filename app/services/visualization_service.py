@@ -1,33 +1,54 @@
+import asyncio
+import base64
+import importlib
 import io
-from datetime import datetime
-from starlette.responses import StreamingResponse
+import json
+import time
+import zipfile
+import numpy as np
+from datetime import date, datetime, timedelta
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from app import config
 from app.models.operation_type import Operation_type
-from app.services import operations_service
-import matplotlib.pyplot as plt
-
-# List of month names
-months_names = ['January', 'February', 'March', 'April', 'May', 'June',
-                'July', 'August', 'September', 'October', 'November', 'December']
-
-# List of the number of days in each month
-months_length = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-
-
-async def fetch_operations(user_id: int, start_date: str = None, end_date: str = None):
+from app.models.operation_frame import OperationFrame
+from fastapi import HTTPException
+from app.services import operations_service, rollup_service, render_pool, chart_cache, aggregation_service
+from app.services.chart_layouts import months_names
+from app.services.single_flight import single_flight
+from utils import metrics
+
+# Chart renderers by image format, as (module, media type). Modules are imported on first use,
+# so serving SVG charts never imports matplotlib.
+chart_formats = {
+    "png": ("app.services.charts", "image/png"),
+    "svg": ("app.services.svg_charts", "image/svg+xml")
+}
+
+# Charts of the dashboard, as (chart function name, series drawn, labels, title), drawn like the chart endpoints
+dashboard_charts = {
+    "expenses_vs_revenues_bar": ('create_bar_chart', ("expenses", "revenues"), ['Expenses', 'Revenues'],
+                                 'Monthly Expenses vs Revenues'),
+    "expenses_vs_revenues_graph": ('create_plot', ("expenses", "revenues"), ['Expenses', 'Revenues'],
+                                   'Monthly Expenses vs Revenues'),
+    "balance_bar": ('create_bar_chart', ("balances",), ['Monthly Balance'], 'Monthly Balance'),
+    "balance_graph": ('create_plot', ("balances",), ['Balance'], 'Monthly Balance')
+}
+
+
+@single_flight
+async def fetch_operation_frame(user_id: int, start_date: datetime = None, end_date: datetime = None):
     """
-    Fetches operations for a given user, optionally within a specified date range.
+    Fetches the operations of a given user as columns, optionally within a date range.
 
     Parameters:
     - user_id (int): ID of the user whose operations are to be fetched.
-    - start_date (str, optional): Start date of the range in 'YYYY-MM-DD' format.
-    - end_date (str, optional): End date of the range in 'YYYY-MM-DD' format.
+    - start_date (datetime, optional): Start of the range, included.
+    - end_date (datetime, optional): End of the range, excluded.
 
     Returns:
-    - List: List of operations within the specified date range or all operations if no date range is provided.
+    - OperationFrame: The dates, sums and types of the operations.
     """
-    if start_date and end_date:
-        return await operations_service.get_all_operations_between_dates(user_id, start_date, end_date)
-    return await operations_service.get_all_operations(user_id)
+    return OperationFrame.from_documents(await operations_service.get_operation_values(user_id, start_date, end_date))
 
 
 def calculate_sums(operations, operation_type):
@@ -35,157 +56,232 @@ def calculate_sums(operations, operation_type):
     Calculates the sum of operations of a given type.
 
     Parameters:
-    - operations (list): List of operations.
+    - operations (OperationFrame | list): The operations, as a frame or a list of operations.
     - operation_type (Operation_type): Type of operations to sum.
 
     Returns:
-    - int: Sum of the specified type of operations.
+    - float: Sum of the specified type of operations.
     """
-    return sum(op.sum for op in operations if op.type == operation_type)
+    if not isinstance(operations, OperationFrame):
+        operations = OperationFrame.from_operations(operations)
+    return operations.total(operation_type)
 
 
-async def get_expenses_and_revenues_by_month(user_id: int, month: str = None):
+@single_flight
+async def get_expenses_and_revenues_by_month(user_id: int, month: str = None, year: int = None):
     """
-    Fetches and calculates monthly expenses and revenues for a given user.
+    Fetches monthly expenses and revenues for a given user.
+
+    The values are read from the monthly totals maintained by operations_service.
 
     Parameters:
     - user_id (int): ID of the user.
     - month (str, optional): Specific month in 'MM' format. If None, calculates for the whole year.
+    - year (int, optional): The year. If None, uses the current year.
 
     Returns:
     - tuple: Two lists containing monthly expenses and revenues.
     """
-    if month:
-        year = datetime.now().year
-        start_date = f"{year}-{month}-1"
-        end_date = f"{year}-{month}-{months_length[int(month) - 1]}"
-        data = await fetch_operations(user_id, start_date, end_date)
-    else:
-        data = await fetch_operations(user_id)
+    monthly_totals = await rollup_service.get_monthly_totals(user_id, year or datetime.now().year)
 
     expenses = [0] * 12
     revenues = [0] * 12
 
-    for operation_ in data:
-        month_index = operation_.date.month - 1
-        if operation_.type == Operation_type.REVENUE:
-            revenues[month_index] += operation_.sum
-        if operation_.type == Operation_type.EXPENSE:
-            expenses[month_index] += operation_.sum
+    for monthly_total in monthly_totals:
+        if month and monthly_total["month"] != int(month):
+            continue
+        month_index = monthly_total["month"] - 1
+        if monthly_total["type"] == Operation_type.REVENUE:
+            revenues[month_index] += monthly_total["total"]
+        if monthly_total["type"] == Operation_type.EXPENSE:
+            expenses[month_index] += monthly_total["total"]
 
     return expenses, revenues
 
 
-def create_plot(x, y_data, labels, title, ylabel):
+async def render_chart(chart_function, *args):
     """
-    Creates a line plot with the given data.
+    Renders a chart in the render worker pool.
 
     Parameters:
-    - x (list): X-axis labels.
-    - y_data (list of lists): Y-axis data for multiple lines.
-    - labels (list): Labels for each line.
-    - title (str): Title of the plot.
-    - ylabel (str): Label for the Y-axis.
+    - chart_function (Callable): charts.create_plot or charts.create_bar_chart.
+    - *args: The arguments of chart_function.
 
     Returns:
-    - BytesIO: In-memory buffer containing the plot image.
+    - BytesIO: In-memory buffer containing the chart image.
+
+    Raises:
+    - HTTPException: If the render queue is full or the render timed out.
     """
-    fig, ax = plt.subplots()
-    for y, label in zip(y_data, labels):
-        ax.plot(x, y, label=label, marker='o')
-    plt.xticks(rotation=45)
-    ax.set_xlabel('Month')
-    ax.set_ylabel(ylabel)
-    ax.set_title(title)
-    ax.legend()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close(fig)
-    return buf
+    try:
+        return await render_pool.render(chart_function, *args)
+    except render_pool.RenderPoolBusy:
+        raise HTTPException(status_code=503, detail="Too many charts are being rendered, please try again")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Rendering the chart took too long")
 
 
-def create_bar_chart(x, y_data, labels, title, ylabel):
+def matches_etag(etag: str, if_none_match: str = None):
     """
-    Creates a bar chart with the given data.
+    Checks whether the client already has the version of a response identified by an ETag.
 
     Parameters:
-    - x (list): X-axis labels.
-    - y_data (list of lists): Y-axis data for multiple bars.
-    - labels (list): Labels for each set of bars.
-    - title (str): Title of the chart.
-    - ylabel (str): Label for the Y-axis.
+    - etag (str): The quoted ETag of the response.
+    - if_none_match (str, optional): The If-None-Match header of the request.
 
     Returns:
-    - BytesIO: In-memory buffer containing the bar chart image.
+    - bool: True if the response can be answered with 304 Not Modified.
     """
-    fig, ax = plt.subplots()
-    bar_width = 0.35
-    index = range(len(x))
-    for i, (y, label) in enumerate(zip(y_data, labels)):
-        ax.bar([p + i * bar_width for p in index], y, bar_width, label=label)
-    plt.xticks(rotation=45)
-    ax.set_xlabel('Month')
-    ax.set_ylabel(ylabel)
-    ax.set_title(title)
-    ax.set_xticks([p + bar_width for p in index])
-    ax.set_xticklabels(x)
-    ax.legend()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close(fig)
-    return buf
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in
+                                    (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")))
 
 
-async def get_expenses_against_revenues_by_month(user_id: int, month: str):
+def get_chart_function(chart_name: str, format: str):
+    """
+    Gets the chart function of the renderer of an image format.
+
+    Parameters:
+    - chart_name (str): 'create_plot' or 'create_bar_chart'.
+    - format (str): The image format, 'png' or 'svg'.
+
+    Returns:
+    - tuple: The chart function and the media type of its images.
+
+    Raises:
+    - HTTPException: If the format is not supported.
+    """
+    if format not in chart_formats:
+        raise HTTPException(status_code=400, detail=f"Chart format must be one of {', '.join(chart_formats)}")
+    module_name, media_type = chart_formats[format]
+    return getattr(importlib.import_module(module_name), chart_name), media_type
+
+
+@single_flight
+async def get_chart(chart_name: str, *args, format: str = "png"):
+    """
+    Gets the image of a chart, rendering it only when it is not cached.
+
+    The ETag of a chart is a hash of its kind, format and data, so it changes exactly when the chart does.
+    PNG charts are rendered in the worker pool; SVG charts are cheap enough to render in place.
+
+    Parameters:
+    - chart_name (str): 'create_plot' or 'create_bar_chart'.
+    - *args: The arguments of the chart function.
+    - format (str, optional): The image format, 'png' or 'svg'.
+
+    Returns:
+    - tuple: The ETag, the image bytes and the media type of the chart.
+    """
+    chart_function, media_type = get_chart_function(chart_name, format)
+    etag = chart_etag(chart_name, *args, format=format)
+    image = chart_cache.charts.get(etag)
+    if image is None:
+        started = time.perf_counter()
+        if format == "png":
+            buf = await render_chart(chart_function, *args)
+        else:
+            buf = chart_function(*args)
+        metrics.chart_render_duration.observe(time.perf_counter() - started, chart=chart_name, format=format)
+        image = buf.getvalue()
+        chart_cache.charts.put(etag, image)
+    return etag, image, media_type
+
+
+def chart_etag(chart_name: str, *args, format: str = "png"):
+    """
+    Builds the ETag of a chart.
+
+    Parameters:
+    - chart_name (str): 'create_plot' or 'create_bar_chart'.
+    - *args: The arguments of the chart function.
+    - format (str, optional): The image format, 'png' or 'svg'.
+
+    Returns:
+    - str: The quoted ETag.
+    """
+    return f'"{chart_cache.chart_key(f"{chart_name}.{format}", *args)}"'
+
+
+async def chart_response(chart_name: str, *args, format: str = "png", if_none_match: str = None):
+    """
+    Builds the response of a chart, rendering it only when it is neither cached nor already held by the client.
+
+    Parameters:
+    - chart_name (str): 'create_plot' or 'create_bar_chart'.
+    - *args: The arguments of the chart function.
+    - format (str, optional): The image format, 'png' or 'svg'.
+    - if_none_match (str, optional): The If-None-Match header of the request.
+
+    Returns:
+    - Response: StreamingResponse containing the chart image, or an empty 304 response if the client already has it.
+    """
+    # Unknown formats are refused before the ETag is compared
+    get_chart_function(chart_name, format)
+    etag = chart_etag(chart_name, *args, format=format)
+    headers = {"ETag": etag, "Cache-Control": config.CHART_CACHE_CONTROL}
+    if matches_etag(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+    etag, image, media_type = await get_chart(chart_name, *args, format=format)
+    return StreamingResponse(io.BytesIO(image), media_type=media_type, headers=headers)
+
+
+async def get_expenses_against_revenues_by_month(user_id: int, month: str, if_none_match: str = None,
+                                                 format: str = "png"):
     """
     Generates a bar chart comparing expenses and revenues for a specific month.
 
     Parameters:
     - user_id (int): ID of the user.
     - month (str): Specific month in 'MM' format.
+    - if_none_match (str, optional): The If-None-Match header of the request.
+    - format (str, optional): The image format, 'png' or 'svg'.
 
     Returns:
-    - StreamingResponse: Response containing the bar chart image.
+    - StreamingResponse: Response containing the bar chart image,
+      or an empty 304 response if the client already has it.
     """
     expenses, revenues = await get_expenses_and_revenues_by_month(user_id, month)
-    month_name = [months_names[int(month) - 1]]
-    buf = create_bar_chart(month_name, [expenses, revenues], ['Expenses', 'Revenues'],
-                           'Monthly Expenses vs Revenues', 'Value')
-    return StreamingResponse(io.BytesIO(buf.read()), media_type="image/png")
+    month_index = int(month) - 1
+    return await chart_response('create_bar_chart', [months_names[month_index]],
+                                [[expenses[month_index]], [revenues[month_index]]], ['Expenses', 'Revenues'],
+                                'Monthly Expenses vs Revenues', 'Value', format=format, if_none_match=if_none_match)
 
 
-async def get_expenses_against_revenues_by_month_all_year(user_id: int):
+async def get_expenses_against_revenues_by_month_all_year(user_id: int, if_none_match: str = None,
+                                                          format: str = "png"):
     """
     Generates a bar chart comparing expenses and revenues for each month of the year.
 
     Parameters:
     - user_id (int): ID of the user.
+    - if_none_match (str, optional): The If-None-Match header of the request.
+    - format (str, optional): The image format, 'png' or 'svg'.
 
     Returns:
-    - StreamingResponse: Response containing the bar chart image.
+    - StreamingResponse: Response containing the bar chart image,
+      or an empty 304 response if the client already has it.
     """
     expenses, revenues = await get_expenses_and_revenues_by_month(user_id)
-    buf = create_bar_chart(months_names, [expenses, revenues], ['Expenses', 'Revenues'],
-                           'Monthly Expenses vs Revenues', 'Value')
-    return StreamingResponse(io.BytesIO(buf.read()), media_type="image/png")
+    return await chart_response('create_bar_chart', months_names, [expenses, revenues], ['Expenses', 'Revenues'],
+                                'Monthly Expenses vs Revenues', 'Value', format=format, if_none_match=if_none_match)
 
 
-async def get_yearly_graph(user_id: int):
+async def get_yearly_graph(user_id: int, if_none_match: str = None, format: str = "png"):
     """
     Generates a line plot comparing monthly expenses and revenues for the year.
 
     Parameters:
     - user_id (int): ID of the user.
+    - if_none_match (str, optional): The If-None-Match header of the request.
+    - format (str, optional): The image format, 'png' or 'svg'.
 
     Returns:
-    - StreamingResponse: Response containing the line plot image.
+    - StreamingResponse: Response containing the line plot image,
+      or an empty 304 response if the client already has it.
     """
     expenses, revenues = await get_expenses_and_revenues_by_month(user_id)
-    buf = create_plot(months_names, [expenses, revenues], ['Expenses', 'Revenues'],
-                      'Monthly Expenses vs Revenues', 'Value')
-    return StreamingResponse(io.BytesIO(buf.read()), media_type="image/png")
+    return await chart_response('create_plot', months_names, [expenses, revenues], ['Expenses', 'Revenues'],
+                                'Monthly Expenses vs Revenues', 'Value', format=format, if_none_match=if_none_match)
 
 
 async def get_balance_divide_to_months(user_id: int):
@@ -203,33 +299,231 @@ async def get_balance_divide_to_months(user_id: int):
     return balances
 
 
-async def get_balances_yearly_graph(user_id: int):
+async def get_balances_yearly_graph(user_id: int, if_none_match: str = None, format: str = "png"):
     """
     Generates a line plot showing the monthly balance for the year.
 
     Parameters:
     - user_id (int): ID of the user.
+    - if_none_match (str, optional): The If-None-Match header of the request.
+    - format (str, optional): The image format, 'png' or 'svg'.
 
     Returns:
-    - StreamingResponse: Response containing the line plot image.
+    - StreamingResponse: Response containing the line plot image,
+      or an empty 304 response if the client already has it.
     """
     balances = await get_balance_divide_to_months(user_id)
-    buf = create_plot(months_names, [balances], ['Balance'],
-                      'Monthly Balance', 'Value')
-    return StreamingResponse(io.BytesIO(buf.read()), media_type="image/png")
+    return await chart_response('create_plot', months_names, [balances], ['Balance'],
+                                'Monthly Balance', 'Value', format=format, if_none_match=if_none_match)
 
 
-async def get_balance_yearly_bar(user_id: int):
+async def get_balance_yearly_bar(user_id: int, if_none_match: str = None, format: str = "png"):
     """
     Generates a bar chart showing the monthly balance for the year.
 
     Parameters:
     - user_id (int): ID of the user.
+    - if_none_match (str, optional): The If-None-Match header of the request.
+    - format (str, optional): The image format, 'png' or 'svg'.
 
     Returns:
-    - StreamingResponse: Response containing the bar chart image.
+    - StreamingResponse: Response containing the bar chart image,
+      or an empty 304 response if the client already has it.
     """
     balances = await get_balance_divide_to_months(user_id)
-    buf = create_bar_chart(months_names, [balances], ['Monthly Balance'],
-                           'Monthly Balance', 'Value')
-    return StreamingResponse(io.BytesIO(buf.read()), media_type="image/png")
+    return await chart_response('create_bar_chart', months_names, [balances], ['Monthly Balance'],
+                                'Monthly Balance', 'Value', format=format, if_none_match=if_none_match)
+
+
+@single_flight
+async def get_series(user_id: int, year: int = None):
+    """
+    Calculates the monthly series of a year with a single read of the monthly totals.
+
+    Parameters:
+    - user_id (int): ID of the user.
+    - year (int, optional): The year. If None, uses the current year.
+
+    Returns:
+    - dict: The year, months, expenses, revenues and balances.
+    """
+    year = year or datetime.now().year
+    expenses, revenues = await get_expenses_and_revenues_by_month(user_id, year=year)
+    return {
+        "year": year,
+        "months": months_names,
+        "expenses": expenses,
+        "revenues": revenues,
+        "balances": [revenue - expense for expense, revenue in zip(expenses, revenues)]
+    }
+
+
+async def get_monthly_series(user_id: int, year: int = None, if_none_match: str = None):
+    """
+    Gets the monthly series the charts are drawn from, so clients can draw them themselves.
+
+    The series are read from the monthly totals, like the charts, and carry an ETag so polling clients
+    get an empty 304 response while they have not changed.
+
+    Parameters:
+    - user_id (int): ID of the user.
+    - year (int, optional): The year. If None, uses the current year.
+    - if_none_match (str, optional): The If-None-Match header of the request.
+
+    Returns:
+    - Response: JSONResponse with the year, months, expenses, revenues and balances,
+      or an empty 304 response if the client already has them.
+    """
+    series = await get_series(user_id, year)
+    etag = f'"{chart_cache.chart_key("series", series)}"'
+    headers = {"ETag": etag, "Cache-Control": config.CHART_CACHE_CONTROL}
+    if matches_etag(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(series, headers=headers)
+
+
+async def get_dashboard(user_id: int, year: int = None, charts=(), format: str = "png", bundle: str = "json",
+                        if_none_match: str = None):
+    """
+    Gets everything the dashboard shows with a single read of the monthly totals: the monthly series and
+    any of the dashboard charts, rendered concurrently.
+
+    Parameters:
+    - user_id (int): ID of the user.
+    - year (int, optional): The year. If None, uses the current year.
+    - charts (list, optional): Names of dashboard_charts to include.
+    - format (str, optional): The image format of the charts, 'png' or 'svg'.
+    - bundle (str, optional): 'json' for a JSON document with base64 charts, 'zip' for a zip archive
+      with series.json and a file per chart.
+    - if_none_match (str, optional): The If-None-Match header of the request.
+
+    Returns:
+    - Response: The dashboard, or an empty 304 response if the client already has it.
+
+    Raises:
+    - HTTPException: If a chart, the format or the bundle is not valid.
+    """
+    unknown_charts = [name for name in charts if name not in dashboard_charts]
+    if unknown_charts:
+        raise HTTPException(status_code=400, detail=f"Unknown charts: {', '.join(unknown_charts)}. "
+                                                    f"Charts are {', '.join(dashboard_charts)}")
+    if bundle not in ("json", "zip"):
+        raise HTTPException(status_code=400, detail="Bundle must be json or zip")
+    # Refuse unknown formats before anything is read
+    get_chart_function('create_plot', format)
+
+    series = await get_series(user_id, year)
+    chart_args = {name: (chart_name, months_names, [series[key] for key in keys], labels, title, 'Value')
+                  for name, (chart_name, keys, labels, title) in dashboard_charts.items() if name in charts}
+    etag = f'"{chart_cache.chart_key(f"dashboard.{bundle}", series, format, sorted(chart_args))}"'
+    headers = {"ETag": etag, "Cache-Control": config.CHART_CACHE_CONTROL}
+    if matches_etag(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    rendered = await asyncio.gather(*(get_chart(*args, format=format) for args in chart_args.values()))
+    images = dict(zip(chart_args, rendered))
+    if bundle == "zip":
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("series.json", json.dumps(series))
+            for name, (_, image, _) in images.items():
+                # PNG images are already compressed
+                archive.writestr(f"{name}.{format}", image,
+                                 zipfile.ZIP_STORED if format == "png" else zipfile.ZIP_DEFLATED)
+        headers["Content-Disposition"] = f'attachment; filename="dashboard-{user_id}-{series["year"]}.zip"'
+        return Response(buf.getvalue(), media_type="application/zip", headers=headers)
+    return JSONResponse({**series, "charts": {
+        name: {"media_type": media_type, "etag": image_etag, "data": base64.b64encode(image).decode()}
+        for name, (image_etag, image, media_type) in images.items()
+    }}, headers=headers)
+
+
+def parse_range(start_date: str, end_date: str, granularity: str):
+    """
+    Validates the date range and granularity of a bucketed aggregation.
+
+    Parameters:
+    - start_date (str): First day of the range in 'YYYY-MM-DD' format.
+    - end_date (str): Last day of the range in 'YYYY-MM-DD' format.
+    - granularity (str): 'day', 'week', 'month', 'quarter' or 'year'.
+
+    Returns:
+    - tuple: The first and last day as datetimes.
+
+    Raises:
+    - HTTPException: If the dates or granularity are not valid, or the range has too many buckets.
+    """
+    if granularity not in aggregation_service.granularities:
+        raise HTTPException(status_code=400,
+                            detail=f"Granularity must be one of {', '.join(aggregation_service.granularities)}")
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    if end < start:
+        raise HTTPException(status_code=400, detail="The end date is before the start date")
+    if end.date() == date.max:
+        # The range is read up to the day after the end date
+        raise HTTPException(status_code=400, detail=f"The end date must be before {date.max.isoformat()}")
+    if aggregation_service.bucket_count(start, end, granularity) > config.MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"The range has more than {config.MAX_BUCKETS} buckets")
+    return start, end
+
+
+@single_flight
+async def get_totals_by_bucket(user_id: int, start_date: str, end_date: str, granularity: str = "month"):
+    """
+    Calculates expenses, revenues and balance per day, week, month, quarter or year over a date range.
+
+    Buckets follow the calendar, so they never mix years and months have their real length.
+
+    Parameters:
+    - user_id (int): ID of the user.
+    - start_date (str): First day of the range in 'YYYY-MM-DD' format.
+    - end_date (str): Last day of the range in 'YYYY-MM-DD' format, included.
+    - granularity (str, optional): 'day', 'week', 'month', 'quarter' or 'year'.
+
+    Returns:
+    - dict: The granularity, the ISO start date of each bucket and its expenses, revenues and balance.
+
+    Raises:
+    - HTTPException: If the dates or granularity are not valid, or the range has too many buckets.
+    """
+    start, end = parse_range(start_date, end_date, granularity)
+    frame = await fetch_operation_frame(user_id, start, end + timedelta(days=1))
+    return {"granularity": granularity, **aggregation_service.aggregate(frame, start, end, granularity)}
+
+
+@single_flight
+async def get_running_balance(user_id: int, start_date: str, end_date: str, granularity: str = "day"):
+    """
+    Calculates the balance of a user at the end of each day, week, month, quarter or year over a date range.
+
+    The balance before the range is seeded from the monthly totals, so only the operations from the
+    first day of the month of start_date are read, however long the history is.
+
+    Parameters:
+    - user_id (int): ID of the user.
+    - start_date (str): First day of the range in 'YYYY-MM-DD' format.
+    - end_date (str): Last day of the range in 'YYYY-MM-DD' format, included.
+    - granularity (str, optional): 'day', 'week', 'month', 'quarter' or 'year'.
+
+    Returns:
+    - dict: The granularity, the balance before the range, and the ISO start date of each bucket
+      with the balance at its end.
+
+    Raises:
+    - HTTPException: If the dates or granularity are not valid, or the range has too many buckets.
+    """
+    start, end = parse_range(start_date, end_date, granularity)
+    month_start = start.replace(day=1)
+    opening_balance, frame = await asyncio.gather(
+        rollup_service.get_balance_before(user_id, start.year, start.month),
+        fetch_operation_frame(user_id, month_start, end + timedelta(days=1))
+    )
+    before_start = frame.dates < np.datetime64(start, "ms")
+    opening_balance += float(frame.select(before_start).signed_sums().sum())
+    running_balance = aggregation_service.running_balance(frame.select(~before_start), start, end, granularity,
+                                                          opening_balance)
+    return {"granularity": granularity, "opening_balance": opening_balance, **running_balance}
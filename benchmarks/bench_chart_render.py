@@ -0,0 +1,101 @@
+"""
+Benchmark for rendering the visualization charts.
+
+Compares the legacy renderer (a new pyplot figure, axes, ticks and legend for every chart) against the
+figure templates of `app.services.charts`, which build each layout once and only update the data,
+and the SVG renderer of `app.services.svg_charts`. All render the four standard layouts with random data;
+the numbers are renders per second of one process.
+
+Usage:
+    python -m benchmarks.bench_chart_render --renders 200
+"""
+import argparse
+import io
+import random
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from app.services import charts, svg_charts
+
+
+def legacy_create_plot(x, y_data, labels, title, ylabel):
+    """
+    The line plot as it was rendered before the templates.
+    """
+    plt.figure()
+    for y, label in zip(y_data, labels):
+        plt.plot(x, y, label=label, marker='o')
+    plt.xticks(rotation=45)
+    plt.xlabel('Month')
+    plt.ylabel(ylabel)
+    plt.title(title)
+    plt.legend()
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png')
+    buf.seek(0)
+    plt.close()
+    return buf
+
+
+def legacy_create_bar_chart(x, y_data, labels, title, ylabel):
+    """
+    The bar chart as it was rendered before the templates.
+    """
+    plt.figure()
+    bar_width = 0.35
+    index = range(len(x))
+    for i, (y, label) in enumerate(zip(y_data, labels)):
+        plt.bar([p + i * bar_width for p in index], y, bar_width, label=label)
+    plt.xticks(rotation=45)
+    plt.xlabel('Month')
+    plt.ylabel(ylabel)
+    plt.title(title)
+    plt.xticks([p + bar_width for p in index], x)
+    plt.legend()
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png')
+    buf.seek(0)
+    plt.close()
+    return buf
+
+
+def measure(renderers, renders: int):
+    """
+    Returns the renders per second and mean image size in bytes of `renders` renders cycling through
+    the standard layouts.
+    """
+    rng = random.Random(0)
+    size = 0
+    started = time.perf_counter()
+    for i in range(renders):
+        chart_function_name, x, labels, title, ylabel = charts.standard_layouts[i % len(charts.standard_layouts)]
+        y_data = [[rng.uniform(-1000, 1000) for _ in x] for _ in labels]
+        size += len(renderers[chart_function_name](x, y_data, labels, title, ylabel).getvalue())
+    return renders / (time.perf_counter() - started), size / renders
+
+
+def main(renders: int):
+    charts.prepare_templates()
+    results = [
+        ("legacy png", measure({"create_plot": legacy_create_plot,
+                                "create_bar_chart": legacy_create_bar_chart}, renders)),
+        ("template png", measure({"create_plot": charts.create_plot,
+                                  "create_bar_chart": charts.create_bar_chart}, renders)),
+        ("svg", measure({"create_plot": svg_charts.create_plot,
+                         "create_bar_chart": svg_charts.create_bar_chart}, renders))
+    ]
+    legacy = results[0][1][0]
+    print(f"{'renderer':>12} {'renders/s':>10} {'mean bytes':>11} {'speedup':>9}")
+    for name, (per_second, size) in results:
+        print(f"{name:>12} {per_second:>10.1f} {size:>11.0f} {per_second / legacy:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=200)
+    args = parser.parse_args()
+    main(args.renders)
@@ -0,0 +1,60 @@
+"""
+Benchmark for the analytics representation of a user's operations.
+
+Compares a list of `StoredOperation` models, as returned by `operations_service.get_all_operations`,
+against an `OperationFrame` built from the same documents: build time, memory per operation and the
+time of the per-type sums `calculate_sums` computes.
+
+Usage:
+    python -m benchmarks.bench_operation_frame --counts 10000 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+from app.models.operation import StoredOperation
+from app.models.operation_frame import OperationFrame
+from app.models.operation_type import Operation_type
+from benchmarks.bench_operations_read import make_documents
+
+
+def measure(func):
+    """
+    Returns the result of `func()`, its wall time in milliseconds and the memory it keeps allocated in bytes.
+    The memory is measured by a second, traced call, so tracing does not slow down the timed one.
+    """
+    started = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - started) * 1000
+    tracemalloc.start()
+    traced = func()
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+    return result, elapsed, kept
+
+
+def legacy_sums(operations):
+    """
+    The per-type sums as calculate_sums computed them over models.
+    """
+    return [sum(op.sum for op in operations if op.type == operation_type) for operation_type in Operation_type]
+
+
+def main(counts):
+    print(f"{'operations':>10} {'':>6} {'build ms':>9} {'bytes/op':>9} {'sums ms':>8}")
+    for count in counts:
+        documents = make_documents(count)
+        models, models_ms, models_bytes = measure(lambda: [StoredOperation.from_document(d) for d in documents])
+        _, models_sums_ms, _ = measure(lambda: legacy_sums(models))
+        frame, frame_ms, frame_bytes = measure(lambda: OperationFrame.from_documents(documents))
+        _, frame_sums_ms, _ = measure(lambda: [frame.total(operation_type) for operation_type in Operation_type])
+        print(f"{count:>10} {'models':>6} {models_ms:>9.1f} {models_bytes / count:>9.0f} {models_sums_ms:>8.2f}")
+        print(f"{'':>10} {'frame':>6} {frame_ms:>9.1f} {frame_bytes / count:>9.0f} {frame_sums_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+    main(args.counts)
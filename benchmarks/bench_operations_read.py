@@ -0,0 +1,108 @@
+"""
+Benchmark for listing a user's operations.
+
+Compares the legacy read path (validating every stored document with `Operation` and a blocking
+user lookup per document) against the `StoredOperation` read path used by `operations_service`.
+The database is replaced by an in-memory cursor and the user lookup by a sleep of `--lookup-ms`,
+so the numbers show how list latency grows with the number of operations without needing MongoDB.
+
+Usage:
+    python -m benchmarks.bench_operations_read --counts 100 1000 10000 --lookup-ms 0.2
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from unittest.mock import patch
+
+from app.models.operation import Operation
+from app.services import operations_service
+
+
+class FakeCursor:
+    """
+    In-memory stand-in for a motor cursor.
+    """
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length):
+        return list(self.documents)
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for the operations collection.
+    """
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, *args, **kwargs):
+        return FakeCursor(self.documents)
+
+
+def make_documents(count: int):
+    """
+    Builds `count` operation documents shaped like the ones stored by `operations_service`.
+
+    Parameters:
+    - count (int): Number of documents to build.
+
+    Returns:
+    - list: The operation documents.
+    """
+    start = datetime(2024, 1, 1)
+    return [{"_id": i, "id": i, "sum": float(i % 500), "userId": 1,
+             "type": "expense" if i % 2 else "revenue", "date": start + timedelta(hours=i)}
+            for i in range(count)]
+
+
+def lookup_user(lookup_ms: float, user_id: int):
+    """
+    Simulates the blocking user lookup the `Operation` validator used to make.
+    """
+    time.sleep(lookup_ms / 1000)
+    return {"id": user_id}
+
+
+async def legacy_get_all_operations(lookup, user_id: int):
+    """
+    The read path as it was before `StoredOperation`: every document is validated with a user lookup.
+    """
+    cursor = operations_service.operations.find({"userId": user_id})
+    all_operations = await cursor.to_list(None)
+    return [Operation(**operation) for operation in all_operations if lookup(operation["userId"])]
+
+
+async def measure(func, repeat: int):
+    """
+    Returns the best wall time in milliseconds of `repeat` calls to `func(1)`.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func(1)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def main(counts, lookup_ms: float, repeat: int):
+    print(f"{'operations':>10} {'legacy ms':>12} {'stored ms':>12} {'speedup':>9}")
+    for count in counts:
+        with patch.object(operations_service, "operations", FakeCollection(make_documents(count))):
+            legacy = await measure(partial(legacy_get_all_operations, partial(lookup_user, lookup_ms)), repeat)
+            stored = await measure(operations_service.get_all_operations, repeat)
+        print(f"{count:>10} {legacy:>12.2f} {stored:>12.2f} {legacy / stored:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--lookup-ms", type=float, default=0.2,
+                        help="simulated round-trip of the per-document user lookup")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.counts, args.lookup_ms, args.repeat))
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routes.admin_router import admin_router
+from utils import profiling
+
+# Create a TestClient instance for an application serving the admin_router, so refused requests get a response.
+app = FastAPI()
+app.include_router(admin_router)
+client = TestClient(app)
+
+
+# Test that admin endpoints require the admin token.
+def test_admin_token_required():
+    """
+    Test that requests without the right X-Admin-Token are refused.
+    """
+    with patch('app.config.ADMIN_TOKEN', "secret"):
+        assert client.get("/chart_cache").status_code == 403
+        assert client.get("/chart_cache", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+# Test that admin endpoints are disabled without an admin token.
+def test_admin_disabled_without_token():
+    """
+    Test that admin endpoints are refused when ADMIN_TOKEN is not set.
+    """
+    with patch('app.config.ADMIN_TOKEN', None):
+        assert client.get("/chart_cache", headers={"X-Admin-Token": ""}).status_code == 403
+
+
+# Test retrieving the chart cache counters.
+def test_get_chart_cache_stats():
+    """
+    Test the endpoint reporting the chart cache counters.
+    """
+    with patch('app.config.ADMIN_TOKEN', "secret"):
+        response = client.get("/chart_cache", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert {"hits", "misses", "evictions"} <= response.json().keys()
+
+
+# Test retrieving the single-flight counters.
+def test_get_single_flight_stats():
+    """
+    Test the endpoint reporting the coalesced call counters.
+    """
+    with patch('app.config.ADMIN_TOKEN', "secret"):
+        response = client.get("/single_flight", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert {"in_flight", "calls", "coalesced", "functions"} <= response.json().keys()
+
+
+# Test retrieving the database pool counters.
+def test_get_db_pool_stats():
+    """
+    Test the endpoint reporting the connection pool usage.
+    """
+    with patch('app.config.ADMIN_TOKEN', "secret"):
+        response = client.get("/db_pool", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert {"max_pool_size", "open", "in_use", "checkouts"} <= response.json().keys()
+
+
+# Test retrieving request profiles.
+def test_get_profiles():
+    """
+    Test listing the stored profiles and retrieving one of them.
+    """
+    profile_id = profiling.profiles.add({"path": "/test", "functions": [], "commands": []})
+    with patch('app.config.ADMIN_TOKEN', "secret"):
+        listing = client.get("/profiles", headers={"X-Admin-Token": "secret"})
+        response = client.get(f"/profiles/{profile_id}", headers={"X-Admin-Token": "secret"})
+    assert listing.status_code == 200
+    assert listing.json()[0] == {"path": "/test", "id": profile_id}
+    assert response.json() == {"path": "/test", "functions": [], "commands": [], "id": profile_id}
+
+
+# Test retrieving a missing profile.
+def test_get_profile_not_found():
+    """
+    Test that a profile that does not exist is not found.
+    """
+    with patch('app.config.ADMIN_TOKEN', "secret"):
+        response = client.get("/profiles/0", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 404
@@ -0,0 +1,89 @@
+import numpy as np
+from datetime import datetime
+from app.models.operation_frame import OperationFrame
+from app.services import aggregation_service
+
+
+def _frame(operations):
+    return OperationFrame.from_documents([{"date": date, "sum": amount, "type": operation_type}
+                                          for date, amount, operation_type in operations])
+
+
+# Test the start of the buckets of dates.
+def test_bucket_starts():
+    """
+    Test the bucket start of a date for every granularity.
+    """
+    dates = np.array([datetime(2024, 2, 29, 13, 30)], dtype="datetime64[ms]")
+    starts = {granularity: str(aggregation_service.bucket_starts(dates, granularity)[0])
+              for granularity in aggregation_service.granularities}
+    assert starts == {"day": "2024-02-29", "week": "2024-02-26", "month": "2024-02-01",
+                      "quarter": "2024-01-01", "year": "2024-01-01"}
+
+
+# Test that every bucket of the range is reported.
+def test_bucket_range():
+    """
+    Test that the range includes the buckets of both dates, including leap days.
+    """
+    days = aggregation_service.bucket_range(datetime(2024, 2, 27), datetime(2024, 3, 1), "day")
+    quarters = aggregation_service.bucket_range(datetime(2023, 11, 5), datetime(2024, 4, 1), "quarter")
+    assert np.datetime_as_string(days).tolist() == ["2024-02-27", "2024-02-28", "2024-02-29", "2024-03-01"]
+    assert np.datetime_as_string(quarters).tolist() == ["2023-10-01", "2024-01-01", "2024-04-01"]
+
+
+# Test that buckets are counted like they are listed.
+def test_bucket_count():
+    """
+    Test that the bucket count matches the length of the bucket range for every granularity.
+    """
+    ranges = [(datetime(2024, 2, 27), datetime(2024, 3, 1)), (datetime(2023, 11, 5), datetime(2024, 4, 1)),
+              (datetime(2021, 1, 3), datetime(2024, 12, 30)), (datetime(2024, 6, 10), datetime(2024, 6, 10))]
+    for start, end in ranges:
+        for granularity in aggregation_service.granularities:
+            assert aggregation_service.bucket_count(start, end, granularity) == \
+                len(aggregation_service.bucket_range(start, end, granularity))
+
+
+# Test totals per month over two years.
+def test_aggregate_by_month():
+    """
+    Test that the same month of different years falls into different buckets.
+    """
+    frame = _frame([
+        (datetime(2023, 5, 3), 100.0, "expense"),
+        (datetime(2024, 5, 3), 30.0, "expense"),
+        (datetime(2024, 5, 20), 500.0, "revenue")
+    ])
+    totals = aggregation_service.aggregate(frame, datetime(2023, 5, 1), datetime(2024, 5, 31), "month")
+    assert len(totals["buckets"]) == 13
+    assert totals["buckets"][0] == "2023-05-01" and totals["buckets"][-1] == "2024-05-01"
+    assert totals["expenses"][0] == 100.0 and totals["expenses"][-1] == 30.0
+    assert totals["revenues"][-1] == 500.0
+    assert totals["balances"][-1] == 470.0
+    assert totals["balances"][6] == 0.0
+
+
+# Test aggregating no operations.
+def test_aggregate_empty():
+    """
+    Test that a range without operations has zero totals in every bucket.
+    """
+    frame = _frame([])
+    totals = aggregation_service.aggregate(frame, datetime(2024, 1, 1), datetime(2024, 12, 31), "year")
+    assert totals == {"buckets": ["2024-01-01"], "expenses": [0.0], "revenues": [0.0], "balances": [0.0]}
+
+
+# Test the running balance of a range.
+def test_running_balance():
+    """
+    Test that the balance at the end of each bucket accumulates from the opening balance.
+    """
+    frame = _frame([
+        (datetime(2024, 1, 1, 9), 100.0, "revenue"),
+        (datetime(2024, 1, 3, 18), 30.0, "expense"),
+        (datetime(2024, 1, 3, 19), 5.0, "revenue")
+    ])
+    balance = aggregation_service.running_balance(frame, datetime(2024, 1, 1), datetime(2024, 1, 4), "day", 10.0)
+    assert balance == {"buckets": ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"],
+                       "balances": [110.0, 110.0, 85.0, 85.0]}
@@ -0,0 +1,38 @@
+from app.services.chart_cache import ChartCache, chart_key
+
+
+# Test that the least recently used images are evicted first.
+def test_eviction_by_size():
+    """
+    Test that the cache stays within max_bytes by evicting the least recently used images.
+    """
+    cache = ChartCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.stats() == {"entries": 2, "bytes": 8, "max_bytes": 10, "hits": 2, "misses": 1, "evictions": 1}
+
+
+# Test that images larger than the cache are not stored.
+def test_image_larger_than_cache():
+    """
+    Test that an image larger than max_bytes does not evict everything else.
+    """
+    cache = ChartCache(max_bytes=4)
+    cache.put("a", b"12")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12"
+    assert cache.get("b") is None
+
+
+# Test that chart keys depend on the kind and the data.
+def test_chart_key():
+    """
+    Test that the same chart always gets the same key and a different chart a different key.
+    """
+    assert chart_key("create_plot", [1, 2]) == chart_key("create_plot", [1, 2])
+    assert chart_key("create_plot", [1, 2]) != chart_key("create_bar_chart", [1, 2])
+    assert chart_key("create_plot", [1, 2]) != chart_key("create_plot", [1, 3])
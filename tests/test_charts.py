@@ -0,0 +1,47 @@
+import io
+import numpy as np
+from matplotlib.image import imread
+from app.services import charts
+from app.services.chart_layouts import months_names
+
+
+def _pixels(buf):
+    return imread(io.BytesIO(buf.getvalue()), format='png')
+
+
+# Test that a chart layout reuses its template.
+def test_template_reused():
+    """
+    Test that rendering the same layout twice reuses one template.
+    """
+    charts.create_bar_chart(['January', 'February'], [[1, 2]], ['Balance'], 'Template test', 'Value')
+    template = charts.get_template(charts.BarChartTemplate, ['January', 'February'], ['Balance'],
+                                   'Template test', 'Value')
+    charts.create_bar_chart(['January', 'February'], [[3, 4]], ['Balance'], 'Template test', 'Value')
+    assert charts.get_template(charts.BarChartTemplate, ['January', 'February'], ['Balance'],
+                               'Template test', 'Value') is template
+
+
+# Test that a reused template renders the same image as a new one.
+def test_template_render_matches_new_template():
+    """
+    Test that a template rendered with other data first gives the same image as a freshly built template.
+    """
+    for template_class in (charts.PlotTemplate, charts.BarChartTemplate):
+        reused = template_class(months_names, ['Expenses', 'Revenues'], 'Title', 'Value')
+        reused.render([[-500] * 12, [10000] * 12])
+        y_data = [list(range(12)), list(range(0, 120, 10))]
+        new = template_class(months_names, ['Expenses', 'Revenues'], 'Title', 'Value')
+        assert np.array_equal(_pixels(reused.render(y_data)), _pixels(new.render(y_data)))
+
+
+# Test that the templates are bounded.
+def test_templates_bounded(monkeypatch):
+    """
+    Test that no more than max_templates templates are kept.
+    """
+    monkeypatch.setattr(charts, 'max_templates', 2)
+    monkeypatch.setattr(charts, '_templates', charts.OrderedDict())
+    for title in ('A', 'B', 'C'):
+        charts.create_plot(['January'], [[1]], ['Balance'], title, 'Value')
+    assert [key[3] for key in charts._templates] == ['B', 'C']
@@ -0,0 +1,65 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.services import counters_service
+
+
+# Fixture to patch the counters collection and forget which counters were seeded.
+@pytest.fixture
+def mock_counters():
+    """
+    Fixture to patch the counters collection methods with AsyncMock.
+
+    Yields:
+        tuple: The patched find_one_and_update and update_one methods.
+    """
+    counters_service._seeded_counters.clear()
+    with patch.object(counters_service.counters, 'find_one_and_update',
+                      new_callable=AsyncMock) as mock_find_one_and_update, \
+            patch.object(counters_service.counters, 'update_one', new_callable=AsyncMock) as mock_update_one, \
+            patch('app.services.counters_service._get_max_id', new_callable=AsyncMock, return_value=41):
+        yield mock_find_one_and_update, mock_update_one
+    counters_service._seeded_counters.clear()
+
+
+# Test that a block of IDs is reserved with a single $inc.
+@pytest.mark.asyncio
+async def test_allocate_ids(mock_counters):
+    """
+    Test that reserving N IDs increments the counter by N and returns the first ID of the block.
+
+    Args:
+        mock_counters (tuple): The patched counters collection methods.
+    """
+    mock_find_one_and_update, _ = mock_counters
+    mock_find_one_and_update.return_value = {"_id": "operations", "seq": 141}
+    assert await counters_service.allocate_ids("operations", 100) == 42
+    assert mock_find_one_and_update.await_args.args[1] == {"$inc": {"seq": 100}}
+
+
+# Test that a counter is seeded from the existing IDs only once.
+@pytest.mark.asyncio
+async def test_allocate_ids_seeds_counter_once(mock_counters):
+    """
+    Test that the counter is raised to the highest stored ID before the first allocation only.
+
+    Args:
+        mock_counters (tuple): The patched counters collection methods.
+    """
+    mock_find_one_and_update, mock_update_one = mock_counters
+    mock_find_one_and_update.return_value = {"_id": "users", "seq": 42}
+    await counters_service.allocate_ids("users")
+    await counters_service.allocate_ids("users")
+    mock_update_one.assert_awaited_once_with({"_id": "users"}, {"$max": {"seq": 41}}, upsert=True)
+
+
+# Test that allocating no IDs is refused.
+@pytest.mark.asyncio
+async def test_allocate_ids_not_valid_count(mock_counters):
+    """
+    Test that a count below one raises ValueError.
+
+    Args:
+        mock_counters (tuple): The patched counters collection methods.
+    """
+    with pytest.raises(ValueError, match='less than one ID'):
+        await counters_service.allocate_ids("operations", 0)
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+from app.services import db_service
+
+
+# Test that collections are resolved on the current client.
+def test_collection_follows_client():
+    """
+    Test that a collection connects on first use and is resolved again after the client is closed.
+    """
+    db_service.close()
+    with patch('app.config.MONGO_MAX_POOL_SIZE', 7), patch('app.config.MONGO_DATABASE', 'test_db'):
+        assert db_service.operations.full_name == 'test_db.operations'
+        first_client = db_service.client
+        assert first_client.options.pool_options.max_pool_size == 7
+        db_service.close()
+        assert db_service.client is None
+        db_service.operations.full_name
+        assert db_service.client is not first_client
+    db_service.close()
+
+
+# Test the connection pool counters.
+def test_pool_stats():
+    """
+    Test that connection pool events are counted.
+    """
+    stats = db_service.PoolStats()
+    stats.connection_created(None)
+    stats.connection_checked_out(None)
+    stats.connection_checked_out(None)
+    stats.connection_checked_in(None)
+    stats.connection_check_out_failed(None)
+    report = stats.stats()
+    assert (report["open"], report["in_use"], report["checkouts"], report["checkout_failures"]) == (1, 1, 2, 1)
@@ -0,0 +1,156 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch, AsyncMock, MagicMock
+from app.services import import_service
+
+
+async def chunks(data: bytes, size: int = 5):
+    """
+    Yields the data in chunks of `size` bytes, like a request body or a file being read.
+    """
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(rows):
+    """
+    Collects the items of an async iterator into a list.
+    """
+    return [row async for row in rows]
+
+
+# Test splitting a chunked stream into lines.
+@pytest.mark.asyncio
+async def test_iter_lines():
+    """
+    Test that lines split across chunks, CRLF line breaks and a byte order mark are handled.
+    """
+    data = '﻿sum,type\r\n1,expense\r\n2,revenue'.encode()
+    assert await collect(import_service.iter_lines(chunks(data))) == ["sum,type", "1,expense", "2,revenue"]
+
+
+# Test parsing CSV rows.
+@pytest.mark.asyncio
+async def test_iter_rows_csv():
+    """
+    Test that CSV rows are mapped to the header, including quoted values over several lines.
+    """
+    lines = chunks('sum,type\n1,"exp\nense"\n\n2\n'.encode())
+    rows = await collect(import_service.iter_rows(import_service.iter_lines(lines), "csv"))
+    assert rows == [({"sum": "1", "type": "exp\nense"}, None), (None, "Expected 2 values, found 1")]
+
+
+# Test that lines and records that are too long become errors.
+@pytest.mark.asyncio
+async def test_iter_rows_too_long():
+    """
+    Test that a line or a quoted CSV record longer than IMPORT_MAX_LINE_LENGTH is reported and skipped,
+    without being held in memory, and the rows after it are still parsed.
+    """
+    with patch('app.config.IMPORT_MAX_LINE_LENGTH', 12):
+        lines = chunks(b'{"sum": 1}\n{"sum": 100000000}\n{"sum": 2}\n', size=4)
+        rows = await collect(import_service.iter_rows(import_service.iter_lines(lines), "ndjson"))
+        assert rows == [({"sum": 1}, None), (None, "Line longer than 12 characters"), ({"sum": 2}, None)]
+        lines = chunks(b'sum,type\n1,"a\nbbbbbbbb\ncccc"\n2,b\n')
+        rows = await collect(import_service.iter_rows(import_service.iter_lines(lines), "csv"))
+        assert rows == [(None, "Row longer than 12 characters"), ({"sum": "2", "type": "b"}, None)]
+
+
+# Test parsing NDJSON rows.
+@pytest.mark.asyncio
+async def test_iter_rows_ndjson():
+    """
+    Test that every NDJSON line becomes a row and invalid lines become errors.
+    """
+    lines = chunks(b'{"sum": 1}\nnot json\n[1]\n')
+    rows = await collect(import_service.iter_rows(import_service.iter_lines(lines), "ndjson"))
+    assert rows[0] == ({"sum": 1}, None)
+    assert rows[1][0] is None and rows[1][1].startswith("Not valid JSON")
+    assert rows[2] == (None, "Row should be a JSON object")
+
+
+# Test that a resumed import skips the committed rows.
+@pytest.mark.asyncio
+async def test_import_operations_resumes_after_committed_rows():
+    """
+    Test that an import resumed with its job ID only writes the rows after the last committed batch.
+    """
+    job = {"_id": "job", "format": "csv", "batchSize": 2, "committedRows": 2, "inserted": 2, "failed": 0,
+           "pendingFirstId": None, "status": "running"}
+    data = b'sum,userId,type,date\n1,1,expense,2024-01-01\n2,1,expense,2024-01-01\n3,1,expense,2024-01-01\n'
+    with patch.object(import_service.import_jobs, 'find_one', new_callable=AsyncMock, return_value=job), \
+            patch.object(import_service.import_jobs, 'update_one', new_callable=AsyncMock), \
+            patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=50), \
+            patch('app.services.operations_service.add_operations', new_callable=AsyncMock,
+                  return_value={"inserted": 1, "errors": [], "totals_updated": True}) as mock_add_operations:
+        report = await import_service.import_operations(chunks(data), "csv", "job", batch_size=100)
+    rows, _, operation_ids = mock_add_operations.await_args.args
+    assert rows == [{"sum": "3", "userId": "1", "type": "expense", "date": "2024-01-01"}]
+    assert operation_ids == [50]
+    assert report["rows"] == 3 and report["inserted"] == 3
+
+
+# Test resuming an import interrupted between writing a batch and updating the monthly totals.
+@pytest.mark.asyncio
+async def test_import_operations_resume_rebuilds_monthly_totals():
+    """
+    Test that a batch whose operations were written but whose monthly totals were not updated has the totals
+    of its months recomputed when the import is resumed.
+    """
+    saved_job = {}
+
+    async def save_job(query, update=None):
+        saved_job.update(query if update is None else update["$set"])
+
+    data = b'sum,userId,type,date\n1,1,expense,2024-01-01\n2,1,expense,2024-02-01\n'
+    with patch.object(import_service.import_jobs, 'find_one', new_callable=AsyncMock, return_value=None), \
+            patch.object(import_service.import_jobs, 'insert_one', new_callable=AsyncMock, side_effect=save_job), \
+            patch.object(import_service.import_jobs, 'update_one', new_callable=AsyncMock, side_effect=save_job), \
+            patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=50), \
+            patch('app.services.users_service.get_existing_user_ids', new_callable=AsyncMock, return_value={1}), \
+            patch('app.services.operations_service.operations.insert_many', new_callable=AsyncMock), \
+            patch('app.services.rollup_service.increment', new_callable=AsyncMock, side_effect=ConnectionError), \
+            pytest.raises(ConnectionError):
+        await import_service.import_operations(chunks(data), "csv", "job", batch_size=2)
+    assert saved_job["pendingFirstId"] == 50 and saved_job["rollupApplied"] is False
+
+    stored = MagicMock()
+    stored.to_list = AsyncMock(return_value=[{"id": 50, "userId": 1, "date": datetime(2024, 1, 1)},
+                                             {"id": 51, "userId": 1, "date": datetime(2024, 2, 1)}])
+    with patch.object(import_service.import_jobs, 'find_one', new_callable=AsyncMock, return_value=saved_job), \
+            patch.object(import_service.import_jobs, 'update_one', new_callable=AsyncMock, side_effect=save_job), \
+            patch.object(import_service.operations, 'find', return_value=stored), \
+            patch('app.services.operations_service.add_operations', new_callable=AsyncMock,
+                  return_value={"inserted": 0, "errors": [], "totals_updated": True}) as mock_add_operations, \
+            patch('app.services.operations_service.rebuild_monthly_totals_of_months',
+                  new_callable=AsyncMock) as mock_rebuild:
+        report = await import_service.import_operations(chunks(data), "csv", "job")
+    assert mock_add_operations.await_args.args[0] == []
+    mock_rebuild.assert_awaited_once_with({(1, 2024, 1), (1, 2024, 2)})
+    assert report["inserted"] == 2
+    assert saved_job["pendingFirstId"] is None and saved_job["rollupApplied"] is True
+
+
+# Test that the monthly totals of a batch are recomputed when they could not be updated.
+@pytest.mark.asyncio
+async def test_import_operations_recomputes_totals_not_updated():
+    """
+    Test that the months of a batch whose monthly totals were not updated are recomputed from its stored operations.
+    """
+    job = {"_id": "job", "format": "csv", "batchSize": 2, "committedRows": 0, "inserted": 0, "failed": 0,
+           "pendingFirstId": None, "rollupApplied": True, "status": "running"}
+    data = b'sum,userId,type,date\n1,1,expense,2024-03-05\n'
+    stored = MagicMock()
+    stored.to_list = AsyncMock(return_value=[{"id": 50, "userId": 1, "date": datetime(2024, 3, 5)}])
+    with patch.object(import_service.import_jobs, 'find_one', new_callable=AsyncMock, return_value=job), \
+            patch.object(import_service.import_jobs, 'update_one', new_callable=AsyncMock), \
+            patch.object(import_service.operations, 'find', return_value=stored), \
+            patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=50), \
+            patch('app.services.operations_service.add_operations', new_callable=AsyncMock,
+                  return_value={"inserted": 1, "errors": [], "totals_updated": False}), \
+            patch('app.services.operations_service.rebuild_monthly_totals_of_months',
+                  new_callable=AsyncMock) as mock_rebuild:
+        report = await import_service.import_operations(chunks(data), "csv", "job")
+    mock_rebuild.assert_awaited_once_with({(1, 2024, 3)})
+    assert report["inserted"] == 1
+
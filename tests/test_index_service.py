@@ -0,0 +1,41 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from pymongo.errors import OperationFailure
+from app.services import index_service
+
+
+# Test that only missing indexes are built.
+@pytest.mark.asyncio
+async def test_ensure_indexes_builds_missing_indexes():
+    """
+    Test that existing indexes are skipped and indexes that fail to build do not stop the others.
+    """
+    async def create_indexes(models):
+        if models[0].document["name"] == "username_unique":
+            raise OperationFailure("E11000 duplicate key")
+
+    with patch('app.services.db_service.users.index_information', new_callable=AsyncMock,
+               return_value={"_id_": {}}), \
+            patch('app.services.db_service.operations.index_information', new_callable=AsyncMock,
+                  return_value={"_id_": {}, "id_unique": {}, "userId_date_id": {}}), \
+            patch('app.services.db_service.monthly_totals.index_information', new_callable=AsyncMock,
+                  return_value={"_id_": {}}), \
+            patch('app.services.db_service.users.create_indexes', side_effect=create_indexes), \
+            patch('app.services.db_service.operations.create_indexes', new_callable=AsyncMock) as mock_operations, \
+            patch('app.services.db_service.monthly_totals.create_indexes', new_callable=AsyncMock):
+        built = await index_service.ensure_indexes()
+    assert built == ["users.id_unique", "monthly_totals.userId_year_month_type_unique"]
+    mock_operations.assert_not_called()
+
+
+# Test reading the stages and indexes of a query plan.
+def test_collect_stages():
+    """
+    Test that nested stages and index names are collected from a winning plan.
+    """
+    plan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN",
+                                                                             "indexName": "id_unique"}}}
+    stages, index_names = [], []
+    index_service._collect_stages(plan, stages, index_names)
+    assert stages == ["LIMIT", "FETCH", "IXSCAN"]
+    assert index_names == ["id_unique"]
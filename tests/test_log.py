@@ -0,0 +1,136 @@
+import json
+import logging
+from unittest.mock import patch
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from utils import log
+
+
+class Records(logging.Handler):
+    """
+    Collects the records of the requests logger.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def logged_app():
+    """
+    Builds an application with logged routes.
+    """
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    @log.log
+    async def get_item(request: Request, item_id: int):
+        return {"item_id": item_id, "values": list(range(1000))}
+
+    @app.get("/missing/{item_id}")
+    @log.log
+    async def get_missing(request: Request, item_id: int):
+        raise HTTPException(status_code=404, detail="not found")
+
+    @app.get("/broken")
+    @log.log
+    async def get_broken(request: Request):
+        raise ValueError("broken")
+
+    return app
+
+
+def capture():
+    """
+    Attaches a collecting handler to the requests logger, at the INFO level.
+    """
+    handler = Records()
+    log.logger.addHandler(handler)
+    log.logger.setLevel(logging.INFO)
+    return handler
+
+
+def release(handler):
+    """
+    Detaches a collecting handler from the requests logger.
+    """
+    log.logger.removeHandler(handler)
+    log.logger.setLevel(logging.NOTSET)
+
+
+# Test the JSON formatter.
+def test_json_formatter_fields():
+    """
+    Test that records are formatted as one JSON object with their extra fields.
+    """
+    record = logging.makeLogRecord({"name": "requests", "levelname": "INFO", "msg": "done", "route": "/a",
+                                    "duration_ms": 1.5})
+    document = json.loads(log.JsonFormatter().format(record))
+    assert document["message"] == "done"
+    assert document["level"] == "INFO"
+    assert document["route"] == "/a"
+    assert document["duration_ms"] == 1.5
+    assert "args" not in document
+
+
+# Test the summaries of large values.
+def test_summarize_truncates():
+    """
+    Test that summaries keep a few items of collections and at most LOG_MAX_FIELD_LENGTH characters.
+    """
+    assert log.summarize(list(range(100000))) == "[0, 1, 2, 3, 4, ...]"
+    assert len(log.summarize("x" * 100000)) <= log.config.LOG_MAX_FIELD_LENGTH
+
+
+# Test that a call is logged as one record.
+def test_log_one_record_per_call():
+    """
+    Test that a sampled call is logged once, with its route template and summarized result.
+    """
+    handler = capture()
+    try:
+        response = TestClient(logged_app()).get("/items/7")
+    finally:
+        release(handler)
+    assert response.status_code == 200
+    assert response.json()["item_id"] == 7
+    assert len(handler.records) == 1
+    record = handler.records[0]
+    assert record.route == "/items/{item_id}"
+    assert record.path == "/items/7"
+    assert record.arguments == "{'item_id': 7}"
+    assert len(record.result) <= log.config.LOG_MAX_FIELD_LENGTH
+
+
+# Test the sampling of a route.
+def test_log_sampled_out():
+    """
+    Test that calls of a route with a sample rate of 0 are not logged, except unexpected errors.
+    """
+    handler = capture()
+    rates = {"/items/{item_id}": 0, "/missing/{item_id}": 0, "/broken": 0}
+    try:
+        with patch.object(log.config, "LOG_SAMPLE_RATES", rates):
+            client = TestClient(logged_app(), raise_server_exceptions=False)
+            assert client.get("/items/7").status_code == 200
+            assert client.get("/missing/7").status_code == 404
+            assert client.get("/broken").status_code == 500
+    finally:
+        release(handler)
+    assert len(handler.records) == 1
+    record = handler.records[0]
+    assert record.levelno == logging.ERROR
+    assert record.route == "/broken"
+    assert "ValueError: broken" in record.traceback
+
+
+# Test parsing the sample rates of routes.
+def test_parse_sample_rates():
+    """
+    Test that entries that are not valid are skipped and rates are clamped to [0, 1].
+    """
+    rates = log.config.parse_sample_rates("/metrics, /a=x, /b=0.5,=1, /c=2, /d=-1, /e=nan,")
+    assert rates == {"/b": 0.5, "/c": 1.0, "/d": 0.0}
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from utils import metrics
+from app.routes.metrics_router import metrics_router
+
+
+# Test the exposition of a histogram.
+def test_histogram_expose():
+    """
+    Test that histogram buckets are cumulative and followed by the sum and count.
+    """
+    histogram = metrics.Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route="/a")
+    assert histogram.expose() == [
+        "# HELP test_seconds Test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a",le="0.1"} 1',
+        'test_seconds_bucket{route="/a",le="1.0"} 2',
+        'test_seconds_bucket{route="/a",le="+Inf"} 3',
+        'test_seconds_sum{route="/a"} 5.55',
+        'test_seconds_count{route="/a"} 3'
+    ]
+
+
+# Test the exposition of a counter.
+def test_counter_expose():
+    """
+    Test that counters are exposed per label values, with quotes escaped.
+    """
+    counter = metrics.Counter("test_total", "Test.", ("route",))
+    counter.inc(route='/"a"')
+    counter.inc(2, route='/"a"')
+    assert counter.expose()[2] == 'test_total{route="/\\"a\\""} 3'
+
+
+# Test that requests are recorded by route template.
+def test_middleware_records_route():
+    """
+    Test that the middleware counts requests under their route template and status.
+    """
+    app = FastAPI()
+    app.middleware("http")(metrics.metrics_middleware)
+    app.include_router(metrics_router)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return item_id
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    exposition = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"} 2' in exposition
+
+
+# Test that database commands are timed.
+def test_command_metrics():
+    """
+    Test that the command listener records the duration reported by the driver.
+    """
+    metrics.command_metrics.succeeded(SimpleNamespace(command_name="test_find", duration_micros=1500))
+    exposition = metrics.registry.expose()
+    assert 'mongodb_command_duration_seconds_bucket{command="test_find",outcome="success",le="0.0025"} 1' in exposition
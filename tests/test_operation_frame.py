@@ -0,0 +1,48 @@
+import numpy as np
+from datetime import datetime, timezone
+from app.models.operation import StoredOperation
+from app.models.operation_frame import OperationFrame
+from app.models.operation_type import Operation_type
+
+# Mock operation documents, as stored
+mock_documents = [
+    {"id": 1, "sum": 100.0, "userId": 1, "type": "expense", "date": datetime(2024, 2, 29, 12)},
+    {"id": 2, "sum": 500, "userId": 1, "type": "revenue", "date": datetime(2024, 3, 1)},
+    {"id": 3, "sum": 25.5, "userId": 1, "type": "expense", "date": datetime(1969, 12, 31, 23, 59)}
+]
+
+
+# Test building a frame from stored documents.
+def test_from_documents():
+    """
+    Test that the columns hold the dates, sums and type codes of the documents.
+    """
+    frame = OperationFrame.from_documents(mock_documents)
+    assert len(frame) == 3
+    assert frame.dates.dtype == np.dtype("datetime64[ms]")
+    assert frame.dates.tolist() == [document["date"] for document in mock_documents]
+    assert frame.sums.dtype == np.float64
+    assert frame.types.tolist() == [0, 1, 0]
+    assert frame.nbytes == 3 * 17
+
+
+# Test building a frame from documents with other date representations.
+def test_from_documents_dates():
+    """
+    Test that aware datetimes and milliseconds since the epoch give the same dates.
+    """
+    aware = OperationFrame.from_documents([{"sum": 1, "type": "revenue",
+                                            "date": datetime(2024, 1, 1, tzinfo=timezone.utc)}])
+    milliseconds = OperationFrame.from_documents([{"sum": 1, "type": "revenue", "date": 1704067200000}])
+    assert str(aware.dates[0]) == str(milliseconds.dates[0]) == "2024-01-01T00:00:00.000"
+
+
+# Test the totals and signed sums of a frame.
+def test_totals():
+    """
+    Test the sum per type and the effect of each operation on the balance.
+    """
+    frame = OperationFrame.from_operations([StoredOperation.from_document(document) for document in mock_documents])
+    assert frame.total(Operation_type.EXPENSE) == 125.5
+    assert frame.total(Operation_type.REVENUE) == 500.0
+    assert frame.signed_sums().tolist() == [-100.0, 500.0, -25.5]
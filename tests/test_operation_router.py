@@ -1,7 +1,12 @@
+import json
 import pytest
+from datetime import datetime
+from unittest.mock import patch
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from app.routes.operation_router import operation_router
 from app.services import operations_service
+from app.models.operation import StoredOperation
 import pytest_asyncio
 import httpx
 
@@ -101,3 +106,56 @@ async def test_delete_operation(operation_id):
     async with httpx.AsyncClient(base_url="http://127.0.0.1:8080/operations") as async_client:
         response = await async_client.delete(f"/{operation_id - 1}")
     assert response.status_code == 200
+
+
+# Test adding many operations at once.
+def test_add_operations():
+    """
+    Test the bulk operation addition endpoint.
+    """
+    response = client.post("/bulk", json=[{
+        "sum": 230.5,
+        "userId": 1,
+        "type": 'revenue',
+        "date": "2024-01-22T15:49:07.376+00:00"
+    }] * 3)
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 3
+
+
+# Test importing operations from a CSV file.
+def test_import_operations():
+    """
+    Test the endpoint importing operations from a CSV request body.
+    """
+    response = client.post("/import?format=csv", content=b"sum,userId,type,date\n230.5,1,revenue,2024-01-22\n")
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+
+
+# Test streaming all operations of a user as NDJSON.
+def test_get_operations_ndjson():
+    """
+    Test that operations are streamed one JSON object per line when NDJSON is accepted.
+    """
+    async def stream_operations(*args):
+        for operation_id in (1, 2):
+            yield StoredOperation.from_document({"id": operation_id, "sum": 1, "userId": 1, "type": "expense",
+                                                 "date": datetime(2024, 1, 22)})
+
+    with patch('app.services.operations_service.stream_operations', stream_operations):
+        response = client.get("/all_operations/1", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [1, 2]
+
+
+# Test that imports cannot ask for batches larger than the maximum.
+def test_import_operations_batch_size_limit():
+    """
+    Test that a batch size above MAX_IMPORT_BATCH_SIZE is refused.
+    """
+    app = FastAPI()
+    app.include_router(operation_router)
+    response = TestClient(app).post("/import?format=csv&batch_size=100000000", content=b"")
+    assert response.status_code == 422
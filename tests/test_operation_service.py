@@ -2,6 +2,9 @@ import os
 import sys
 import pytest
 from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock, MagicMock
+from pymongo.errors import BulkWriteError, AutoReconnect
+from pymongo.results import InsertOneResult
 from app.services import operations_service, users_service
 from app.models.operation import Operation
 from app.models.operation_type import Operation_type
@@ -158,3 +161,233 @@ async def test_delete():
     current_id = await operations_service.get_operation_id()
     result = await operations_service.delete_operation(current_id)
     assert result is True
+
+
+# Test that reading stored operations does not look up their user.
+@pytest.mark.asyncio
+async def test_get_all_operations_skips_user_lookup():
+    """
+    Test that stored operations are built without validation or database calls per document.
+    """
+    documents = [{"_id": "a", "id": 7, "sum": 12, "userId": 3, "type": "expense", "date": datetime(2024, 5, 1)}]
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=documents)
+    with patch.object(operations_service.operations, 'find', return_value=cursor), \
+            patch('app.services.users_service.get_user_by_id') as mock_get_user_by_id:
+        result = await operations_service.get_all_operations(3)
+    mock_get_user_by_id.assert_not_called()
+    assert [operation.model_dump() for operation in result] == [
+        {"id": 7, "sum": 12.0, "userId": 3, "type": "expense", "date": datetime(2024, 5, 1)}
+    ]
+
+
+# Test that operations of an unknown user are not written.
+@pytest.mark.asyncio
+async def test_add_operation_unknown_user():
+    """
+    Test that adding an operation for a user that does not exist returns False without writing.
+    """
+    operation = Operation(id=1, sum=10, userId=999, type=Operation_type.EXPENSE, date=datetime(2024, 5, 1))
+    with patch('app.services.users_service.user_exists', new_callable=AsyncMock, return_value=False), \
+            patch.object(operations_service.operations, 'insert_one') as mock_insert_one:
+        assert await operations_service.add_operation(operation) is False
+    mock_insert_one.assert_not_called()
+
+
+# Test that adding an operation takes a single write.
+@pytest.mark.asyncio
+async def test_add_operation_single_write():
+    """
+    Test that add_operation awaits the insert and updates the monthly totals without reading the operation back.
+    """
+    operation = Operation(id=1, sum=10, userId=3, type=Operation_type.EXPENSE, date=datetime(2024, 5, 1))
+    with patch('app.services.users_service.user_exists', new_callable=AsyncMock, return_value=True), \
+            patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=8), \
+            patch('app.services.rollup_service.increment', new_callable=AsyncMock) as mock_increment, \
+            patch.object(operations_service.operations, 'insert_one', new_callable=AsyncMock,
+                         return_value=InsertOneResult("oid", True)) as mock_insert_one, \
+            patch.object(operations_service.operations, 'find_one', new_callable=AsyncMock) as mock_find_one:
+        assert await operations_service.add_operation(operation) is True
+    mock_insert_one.assert_awaited_once()
+    assert mock_insert_one.await_args.args[0]["id"] == 8
+    mock_find_one.assert_not_called()
+    mock_increment.assert_awaited_once()
+
+
+# Test that an unacknowledged insert is not reported as successful.
+@pytest.mark.asyncio
+async def test_add_operation_unacknowledged():
+    """
+    Test that add_operation returns False when the write concern does not acknowledge the insert.
+    """
+    operation = Operation(id=1, sum=10, userId=3, type=Operation_type.EXPENSE, date=datetime(2024, 5, 1))
+    with patch('app.services.users_service.user_exists', new_callable=AsyncMock, return_value=True), \
+            patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=8), \
+            patch('app.services.rollup_service.increment', new_callable=AsyncMock), \
+            patch.object(operations_service.operations, 'insert_one', new_callable=AsyncMock,
+                         return_value=InsertOneResult("oid", False)):
+        assert await operations_service.add_operation(operation) is False
+
+
+# Test that a failed monthly total update is logged with the operation ID.
+@pytest.mark.asyncio
+async def test_add_operation_rollup_failure_logged(caplog):
+    """
+    Test that add_operation reports the stored operation when the monthly totals cannot be updated,
+    and logs a warning naming it.
+    """
+    operation = Operation(id=1, sum=10, userId=3, type=Operation_type.EXPENSE, date=datetime(2024, 5, 1))
+    with patch('app.services.users_service.user_exists', new_callable=AsyncMock, return_value=True), \
+            patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=8), \
+            patch('app.services.rollup_service.increment', new_callable=AsyncMock, side_effect=AutoReconnect("down")), \
+            patch.object(operations_service.operations, 'insert_one', new_callable=AsyncMock,
+                         return_value=InsertOneResult("oid", True)):
+        assert await operations_service.add_operation(operation) is True
+    assert "Monthly totals not updated for operation 8" in caplog.text
+
+
+# Test that a failed monthly total update after a delete is logged.
+@pytest.mark.asyncio
+async def test_delete_operation_rollup_failure_logged(caplog):
+    """
+    Test that delete_operation logs a warning naming the operation when the monthly totals cannot be updated.
+    """
+    deleted = {"id": 5, "sum": 10, "userId": 3, "type": "expense", "date": datetime(2024, 5, 1)}
+    with patch('app.services.rollup_service.increment', new_callable=AsyncMock, side_effect=AutoReconnect("down")), \
+            patch.object(operations_service.operations, 'find_one_and_delete', new_callable=AsyncMock,
+                         return_value=deleted):
+        assert await operations_service.delete_operation(5) is True
+    assert "Monthly totals not updated for operation 5" in caplog.text
+
+
+# Test that monthly sums are grouped by the database.
+@pytest.mark.asyncio
+async def test_get_monthly_sums():
+    """
+    Test that monthly sums are computed with an aggregation pipeline grouped by year, month and type.
+    """
+    rows = [{"year": 2024, "month": 5, "type": "expense", "total": 15.5}]
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=rows)
+    with patch.object(operations_service.operations, 'aggregate', return_value=cursor) as mock_aggregate:
+        result = await operations_service.get_monthly_sums(3, '2024-05-01', '2024-05-31')
+    pipeline = mock_aggregate.call_args.args[0]
+    assert pipeline[0]["$match"] == {"userId": 3, "date": {"$gte": datetime(2024, 5, 1), "$lte": datetime(2024, 5, 31)}}
+    assert set(pipeline[1]["$group"]["_id"]) == {"year", "month", "type"}
+    assert result == rows
+
+
+# Test that updating an operation moves its amount between monthly totals.
+@pytest.mark.asyncio
+async def test_update_operation_moves_monthly_total():
+    """
+    Test that the previous amount is subtracted from its month and the new amount added to the new month.
+    """
+    previous = {"id": 7, "sum": 10.0, "userId": 3, "type": "expense", "date": datetime(2024, 5, 1)}
+    operation = Operation(id=7, sum=4, userId=3, type=Operation_type.REVENUE, date=datetime(2024, 6, 1))
+    with patch('app.services.users_service.user_exists', new_callable=AsyncMock, return_value=True), \
+            patch.object(operations_service.operations, 'find_one_and_update', new_callable=AsyncMock,
+                         return_value=previous), \
+            patch('app.services.rollup_service.increment', new_callable=AsyncMock) as mock_increment:
+        assert await operations_service.update_operation(7, operation) is True
+    mock_increment.assert_awaited_once_with([
+        ({"userId": 3, "year": 2024, "month": 5, "type": "expense"}, -10.0),
+        ({"userId": 3, "year": 2024, "month": 6, "type": "revenue"}, 4.0)
+    ])
+
+
+# Test that monthly totals drifting from the operations are reported.
+@pytest.mark.asyncio
+async def test_verify_monthly_totals():
+    """
+    Test that a monthly total differing from the recomputed sum is reported as drift.
+    """
+    sums = [{"year": 2024, "month": 5, "type": "expense", "total": 15.5}]
+    totals = [{"year": 2024, "month": 5, "type": "expense", "total": 10.0},
+              {"year": 2024, "month": 6, "type": "expense", "total": 0.0}]
+    with patch('app.services.operations_service.get_monthly_sums', new_callable=AsyncMock, return_value=sums), \
+            patch('app.services.rollup_service.get_all_monthly_totals', new_callable=AsyncMock,
+                  return_value=totals):
+        drift = await operations_service.verify_monthly_totals(3)
+    assert drift == [{"userId": 3, "year": 2024, "month": 5, "type": "expense", "expected": 15.5, "actual": 10.0}]
+
+
+# Test adding many operations at once.
+@pytest.mark.asyncio
+async def test_add_operations_reports_errors_per_operation():
+    """
+    Test that invalid operations, unknown users and failed writes are reported without stopping the batch.
+    """
+    date = "2024-05-01T00:00:00"
+    raw_operations = [
+        {"sum": 10, "userId": 3, "type": "expense", "date": date},
+        {"sum": -1, "userId": 3, "type": "expense", "date": date},
+        {"sum": 5, "userId": 999, "type": "revenue", "date": date},
+        {"sum": 7, "userId": 3, "type": "revenue", "date": date},
+        {"sum": 8, "userId": 3, "type": "revenue", "date": date}
+    ]
+    write_error = BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "duplicate key"}]})
+    with patch('app.services.users_service.get_existing_user_ids', new_callable=AsyncMock, return_value={3}), \
+            patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=100), \
+            patch.object(operations_service.operations, 'insert_many', new_callable=AsyncMock,
+                         side_effect=[write_error, None]) as mock_insert_many, \
+            patch('app.services.rollup_service.increment', new_callable=AsyncMock) as mock_increment:
+        result = await operations_service.add_operations(raw_operations, chunk_size=2)
+    assert result["inserted"] == 2
+    assert [error["index"] for error in result["errors"]] == [1, 2, 3]
+    assert [[document["id"] for document in call.args[0]]
+            for call in mock_insert_many.await_args_list] == [[100, 101], [102]]
+    assert sum(amount for call in mock_increment.await_args_list for _, amount in call.args[0]) == 18
+    assert result["totals_updated"] is True
+
+
+# Test that a failing chunk and a failing monthly totals update do not fail the batch.
+@pytest.mark.asyncio
+async def test_add_operations_chunk_failure(caplog):
+    """
+    Test that the operations of a chunk that could not be written are reported, the next chunks are still written,
+    and a failed monthly totals update is logged instead of raised.
+    """
+    date = "2024-05-01T00:00:00"
+    raw_operations = [{"sum": amount, "userId": 3, "type": "expense", "date": date} for amount in (1, 2, 3)]
+    with patch('app.services.users_service.get_existing_user_ids', new_callable=AsyncMock, return_value={3}), \
+            patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=100), \
+            patch.object(operations_service.operations, 'insert_many', new_callable=AsyncMock,
+                         side_effect=[AutoReconnect("down"), None]), \
+            patch('app.services.rollup_service.increment', new_callable=AsyncMock,
+                  side_effect=AutoReconnect("down")):
+        result = await operations_service.add_operations(raw_operations, chunk_size=2)
+    assert result["inserted"] == 1
+    assert [error["index"] for error in result["errors"]] == [0, 1]
+    assert result["totals_updated"] is False
+    assert "Monthly totals not updated for operation 102" in caplog.text
+
+
+# Test that page tokens can be read back.
+def test_page_token_round_trip():
+    """
+    Test that a page token gives back the date and ID it was built from, and that garbage is refused.
+    """
+    token = operations_service.encode_page_token(datetime(2024, 5, 1, 12, 30), 7)
+    assert operations_service.decode_page_token(token) == (datetime(2024, 5, 1, 12, 30), 7)
+    with pytest.raises(ValueError, match='Page token is not valid'):
+        operations_service.decode_page_token("not a token")
+
+
+# Test that pages continue after the last operation of the previous page.
+@pytest.mark.asyncio
+async def test_get_operations_page():
+    """
+    Test that a page is fetched by (date, id) after the token and that the next token points to its last operation.
+    """
+    documents = [{"id": i, "sum": 1, "userId": 3, "type": "expense", "date": datetime(2024, 5, 2)} for i in (8, 9, 10)]
+    cursor = MagicMock()
+    cursor.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=documents)
+    token = operations_service.encode_page_token(datetime(2024, 5, 1), 7)
+    with patch.object(operations_service.operations, 'find', return_value=cursor) as mock_find:
+        page, next_page_token = await operations_service.get_operations_page(3, 2, token)
+    assert mock_find.call_args.args[0] == {"userId": 3, "$or": [{"date": {"$gt": datetime(2024, 5, 1)}},
+                                                                 {"date": datetime(2024, 5, 1), "id": {"$gt": 7}}]}
+    cursor.sort.return_value.limit.assert_called_once_with(3)
+    assert [operation.id for operation in page] == [8, 9]
+    assert operations_service.decode_page_token(next_page_token) == (datetime(2024, 5, 2), 9)
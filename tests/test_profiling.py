@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from motor.frameworks import asyncio as motor_asyncio
+from utils import profiling
+
+
+def command_events(request_id, duration_micros):
+    """
+    Builds the started and succeeded events of a find command.
+    """
+    started = SimpleNamespace(request_id=request_id, command_name="find", command={"find": "operations"})
+    succeeded = SimpleNamespace(request_id=request_id, command_name="find", duration_micros=duration_micros)
+    return started, succeeded
+
+
+def send_command(request_id, duration_micros):
+    """
+    Reports a find command to the listener, as the driver does.
+    """
+    started, succeeded = command_events(request_id, duration_micros)
+    profiling.command_timings.started(started)
+    profiling.command_timings.succeeded(succeeded)
+
+
+def profiled_app():
+    """
+    Builds an application with the profiling middleware and a route sending a database command.
+    """
+    app = FastAPI()
+    app.middleware("http")(profiling.profiling_middleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        # Send the command from motor's thread pool, as the services do
+        await motor_asyncio.run_on_executor(asyncio.get_running_loop(), send_command, item_id, 2500)
+        return sum(range(1000))
+
+    return app
+
+
+# Test profiling a request asking for it.
+def test_profile_requested_with_token():
+    """
+    Test that a request with the admin token in X-Profile is profiled with its database commands.
+    """
+    with patch('app.config.ADMIN_TOKEN', "secret"):
+        response = TestClient(profiled_app()).get("/items/7", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    profile = profiling.profiles.get(int(response.headers["X-Profile-Id"]))
+    assert profile["route"] == "/items/{item_id}"
+    assert profile["status"] == 200
+    assert profile["commands"] == [{"command": "find", "collection": "operations", "duration_ms": 2.5,
+                                    "outcome": "success"}]
+    assert profile["command_count"] == 1
+    assert any("get_item" in function["function"] for function in profile["functions"])
+
+
+# Test that requests are not profiled without the token.
+def test_profile_not_requested():
+    """
+    Test that requests with a wrong token, without one or with the token in the URL are not profiled.
+    """
+    with patch('app.config.ADMIN_TOKEN', "secret"):
+        client = TestClient(profiled_app())
+        assert "X-Profile-Id" not in client.get("/items/7").headers
+        assert "X-Profile-Id" not in client.get("/items/7", headers={"X-Profile": "wrong"}).headers
+        assert "X-Profile-Id" not in client.get("/items/7?profile=secret").headers
+    with patch('app.config.ADMIN_TOKEN', None):
+        assert "X-Profile-Id" not in client.get("/items/7", headers={"X-Profile": ""}).headers
+
+
+# Test sampled profiling.
+def test_profile_sampled():
+    """
+    Test that every request is profiled with a sample rate of 1.
+    """
+    with patch('app.config.PROFILE_SAMPLE_RATE', 1.0):
+        response = TestClient(profiled_app()).get("/items/7")
+    assert "X-Profile-Id" in response.headers
+
+
+# Test that commands outside profiled requests are ignored.
+def test_command_timings_outside_profile():
+    """
+    Test that the listener records nothing when no request is profiled.
+    """
+    send_command(1, 1000)
+    assert profiling.current_commands.get() is None
+
+
+# Test the bound on stored profiles.
+def test_profile_store_bounded():
+    """
+    Test that the oldest profiles are dropped and summaries list the newest first.
+    """
+    store = profiling.ProfileStore(2)
+    ids = [store.add({"path": f"/{index}", "functions": [], "commands": []}) for index in range(3)]
+    assert store.get(ids[0]) is None
+    assert [summary["path"] for summary in store.summaries()] == ["/2", "/1"]
+    assert "functions" not in store.summaries()[0]
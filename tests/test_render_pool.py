@@ -0,0 +1,70 @@
+import time
+import pytest
+from unittest.mock import patch
+from app.services import render_pool
+from app.services.charts import create_plot
+
+
+# Test rendering a chart in a worker process.
+@pytest.mark.asyncio
+async def test_render_in_worker():
+    """
+    Test that a chart rendered by a worker process comes back as a PNG image.
+    """
+    try:
+        buf = await render_pool.render(create_plot, ['January', 'February'], [[1, 2]], ['Balance'], 'Title', 'Value')
+    finally:
+        await render_pool.shutdown()
+    assert buf.read(8) == b'\x89PNG\r\n\x1a\n'
+
+
+# Test that a render taking too long times out.
+@pytest.mark.asyncio
+async def test_render_timeout():
+    """
+    Test that a render running longer than RENDER_TIMEOUT_SECONDS raises TimeoutError.
+    """
+    try:
+        with patch('app.config.RENDER_TIMEOUT_SECONDS', 0.1), pytest.raises(TimeoutError):
+            await render_pool.render(time.sleep, 1)
+    finally:
+        await render_pool.shutdown()
+
+
+# Test that renders are refused when the queue is full.
+@pytest.mark.asyncio
+async def test_render_queue_full():
+    """
+    Test that a render is refused when RENDER_QUEUE_SIZE renders are already pending.
+    """
+    with patch('app.config.RENDER_QUEUE_SIZE', 0), pytest.raises(render_pool.RenderPoolBusy):
+        await render_pool.render(time.sleep, 0)
+
+
+# Test rendering on the event loop when there are no workers.
+@pytest.mark.asyncio
+async def test_render_without_workers():
+    """
+    Test that renders run in the calling process when RENDER_WORKERS is 0.
+    """
+    with patch('app.config.RENDER_WORKERS', 0):
+        assert await render_pool.render(max, 1, 2) == 2
+
+
+# Test that a render that timed out keeps its slot until its worker finishes.
+@pytest.mark.asyncio
+async def test_render_timeout_keeps_slot():
+    """
+    Test that a render is refused while a render that timed out is still running in its worker.
+    """
+    try:
+        # Start the worker, so the slow render is running when it times out
+        await render_pool.render(max, 1, 2)
+        with patch('app.config.RENDER_TIMEOUT_SECONDS', 0.5), patch('app.config.RENDER_QUEUE_SIZE', 1):
+            with pytest.raises(TimeoutError):
+                await render_pool.render(time.sleep, 3)
+            with pytest.raises(render_pool.RenderPoolBusy):
+                await render_pool.render(time.sleep, 0)
+    finally:
+        await render_pool.shutdown()
+    assert render_pool._pending == 0
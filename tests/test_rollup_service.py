@@ -0,0 +1,70 @@
+import pytest
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch, AsyncMock
+from app.services import rollup_service
+
+
+# Test that aware dates are bucketed in UTC.
+def test_bucket_uses_utc():
+    """
+    Test that an operation is bucketed in the month the database sees it in.
+    """
+    date = datetime(2024, 6, 1, 1, 0, tzinfo=timezone(timedelta(hours=3)))
+    assert rollup_service.bucket(1, date, "expense") == {"userId": 1, "year": 2024, "month": 5, "type": "expense"}
+
+
+# Test that monthly totals are incremented with upserts in one bulk write.
+@pytest.mark.asyncio
+async def test_increment():
+    """
+    Test that every non-zero change becomes an upserted $inc.
+    """
+    old_bucket = rollup_service.bucket(1, datetime(2024, 5, 3), "expense")
+    new_bucket = rollup_service.bucket(1, datetime(2024, 6, 3), "revenue")
+    with patch.object(rollup_service.monthly_totals, 'bulk_write', new_callable=AsyncMock) as mock_bulk_write:
+        await rollup_service.increment([(old_bucket, -10.0), (new_bucket, 4.0), (new_bucket, 0)])
+    requests = mock_bulk_write.await_args.args[0]
+    assert [(request._filter, request._doc, request._upsert) for request in requests] == [
+        (old_bucket, {"$inc": {"total": -10.0}}, True),
+        (new_bucket, {"$inc": {"total": 4.0}}, True)
+    ]
+
+
+# Test that no write is made when there is nothing to change.
+@pytest.mark.asyncio
+async def test_increment_nothing():
+    """
+    Test that an empty list of changes does not reach the database.
+    """
+    with patch.object(rollup_service.monthly_totals, 'bulk_write', new_callable=AsyncMock) as mock_bulk_write:
+        await rollup_service.increment([])
+    mock_bulk_write.assert_not_called()
+
+
+# Test the balance of the months before a month.
+@pytest.mark.asyncio
+async def test_get_balance_before():
+    """
+    Test that the balance is revenues minus expenses of the earlier months, grouped on the server.
+    """
+    cursor = AsyncMock()
+    cursor.to_list.return_value = [{"_id": "revenue", "total": 300.0}, {"_id": "expense", "total": 120.0}]
+    with patch.object(rollup_service.monthly_totals, 'aggregate', return_value=cursor) as mock_aggregate:
+        balance = await rollup_service.get_balance_before(1, 2024, 3)
+    assert balance == 180.0
+    match = mock_aggregate.call_args.args[0][0]["$match"]
+    assert match == {"userId": 1, "$or": [{"year": {"$lt": 2024}}, {"year": 2024, "month": {"$lt": 3}}]}
+
+
+# Test replacing the totals of one month.
+@pytest.mark.asyncio
+async def test_replace_month():
+    """
+    Test that the totals of a month are deleted and written again with the given totals.
+    """
+    with patch.object(rollup_service.monthly_totals, 'delete_many', new_callable=AsyncMock) as mock_delete_many, \
+            patch.object(rollup_service.monthly_totals, 'insert_many', new_callable=AsyncMock) as mock_insert_many:
+        await rollup_service.replace_month(1, 2024, 5, {"expense": 10.0})
+    mock_delete_many.assert_awaited_once_with({"userId": 1, "year": 2024, "month": 5})
+    mock_insert_many.assert_awaited_once_with([{"userId": 1, "year": 2024, "month": 5, "type": "expense",
+                                                "total": 10.0}])
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight, single_flight, flights
+
+
+# Test that concurrent identical calls share one call.
+@pytest.mark.asyncio
+async def test_concurrent_calls_coalesced():
+    """
+    Test that callers with the same key while a call is in flight get its result without calling again.
+    """
+    group = SingleFlight()
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return [value]
+
+    results = await asyncio.gather(*(group.do("compute", 1, compute, 1) for _ in range(5)),
+                                   group.do("compute", 2, compute, 2))
+    assert calls == [1, 2]
+    assert results[0] is results[4]
+    assert results[5] == [2]
+    assert group.stats() == {"in_flight": 0, "calls": 6, "coalesced": 4,
+                             "functions": {"compute": {"calls": 6, "coalesced": 4}}}
+
+
+# Test that finished calls are not reused.
+@pytest.mark.asyncio
+async def test_sequential_calls_not_coalesced():
+    """
+    Test that a call made after the previous one finished runs again.
+    """
+    group = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+
+    await group.do("compute", None, compute)
+    await group.do("compute", None, compute)
+    assert len(calls) == 2
+
+
+# Test that errors reach every caller.
+@pytest.mark.asyncio
+async def test_error_shared():
+    """
+    Test that every coalesced caller gets the exception of the shared call.
+    """
+    group = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(group.do("fail", None, fail), group.do("fail", None, fail), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+# Test that a cancelled caller does not cancel the shared call.
+@pytest.mark.asyncio
+async def test_cancelled_caller():
+    """
+    Test that the other callers still get the result when one of them is cancelled.
+    """
+    group = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return 1
+
+    first = asyncio.ensure_future(group.do("compute", None, compute))
+    second = asyncio.ensure_future(group.do("compute", None, compute))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == 1
+
+
+# Test the decorator keys.
+@pytest.mark.asyncio
+async def test_decorator_keys_by_arguments():
+    """
+    Test that the decorator coalesces calls with equal arguments, including lists.
+    """
+    calls = []
+
+    @single_flight
+    async def compute(user_id, charts=()):
+        calls.append((user_id, tuple(charts)))
+        await asyncio.sleep(0.01)
+
+    await asyncio.gather(compute(1, charts=["a"]), compute(1, charts=["a"]), compute(2, charts=["a"]))
+    assert calls == [(1, ("a",)), (2, ("a",))]
+    assert flights.stats()["functions"]["test_single_flight.compute"]["coalesced"] == 1
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+import xml.etree.ElementTree as ElementTree
+from app.services import svg_charts
+from app.services.chart_layouts import months_names
+
+svg_namespace = '{http://www.w3.org/2000/svg}'
+
+
+# Test the bars of an SVG bar chart.
+def test_create_bar_chart():
+    """
+    Test that an SVG bar chart has a bar per month and series, and escapes its texts.
+    """
+    buf = svg_charts.create_bar_chart(months_names, [[1] * 12, [-2] * 12], ['Expenses', 'Revenues'],
+                                      'Expenses & <Revenues>', 'Value')
+    root = ElementTree.fromstring(buf.getvalue())
+    bars = [rect for rect in root.iter(f'{svg_namespace}rect') if rect.get('fill') in svg_charts.colors]
+    texts = [text.text for text in root.iter(f'{svg_namespace}text')]
+    assert len(bars) == 2 * 12 + 2
+    assert 'Expenses & <Revenues>' in texts
+    assert 'December' in texts
+
+
+# Test the lines of an SVG plot.
+def test_create_plot():
+    """
+    Test that an SVG plot has a line per series with a point per month.
+    """
+    buf = svg_charts.create_plot(months_names, [list(range(12))], ['Balance'], 'Monthly Balance', 'Value')
+    root = ElementTree.fromstring(buf.getvalue())
+    assert len(list(root.iter(f'{svg_namespace}polyline'))) == 1
+    assert len(list(root.iter(f'{svg_namespace}circle'))) == 12
+
+
+# Test the Y-axis ticks.
+def test_nice_ticks():
+    """
+    Test that the ticks are round values covering the data.
+    """
+    ticks, step = svg_charts._nice_ticks(-50, 100)
+    assert ticks == [-50, 0, 50, 100]
+    assert [svg_charts._format_tick(tick, 0.25) for tick in (0, 0.25, 0.5)] == ['0', '0.25', '0.50']
+
+
+# Test that the SVG renderer does not need matplotlib.
+def test_no_matplotlib_import():
+    """
+    Test that importing the visualization service and rendering an SVG chart does not import matplotlib.
+    """
+    code = ("import sys; from app.services import visualization_service, svg_charts; "
+            "svg_charts.create_plot(['January'], [[1]], ['Balance'], 'Title', 'Value'); "
+            "print('matplotlib' in sys.modules)")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,43 @@
+from unittest.mock import patch
+from app.services.user_cache import UserIdCache
+
+
+# Test that cached entries are returned until they expire.
+def test_get_returns_cached_value_until_expired():
+    """
+    Test that positive and negative entries expire after their own TTL.
+    """
+    cache = UserIdCache(ttl=10, negative_ttl=1, max_size=10)
+    with patch('app.services.user_cache.time.monotonic', return_value=100):
+        cache.set(1, True)
+        cache.set(2, False)
+    with patch('app.services.user_cache.time.monotonic', return_value=105):
+        assert cache.get(1) is True
+        assert cache.get(2) is None
+    with patch('app.services.user_cache.time.monotonic', return_value=111):
+        assert cache.get(1) is None
+
+
+# Test that invalidated entries are forgotten.
+def test_invalidate():
+    """
+    Test that an invalidated user ID is looked up again.
+    """
+    cache = UserIdCache(ttl=10, negative_ttl=10, max_size=10)
+    cache.set(1, False)
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+# Test that the oldest entry is dropped when the cache is full.
+def test_max_size():
+    """
+    Test that the cache never holds more than max_size entries.
+    """
+    cache = UserIdCache(ttl=10, negative_ttl=10, max_size=2)
+    cache.set(1, True)
+    cache.set(2, True)
+    cache.set(3, True)
+    assert cache.get(1) is None
+    assert cache.get(2) is True
+    assert cache.get(3) is True
@@ -1,8 +1,12 @@
 import os
 import sys
 import pytest
+from unittest.mock import patch, AsyncMock
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import InsertOneResult
 from app.models.user import User
 from app.services import users_service
+from app.services.user_cache import known_users
 
 # Add the parent directory to the system path to allow imports from it.
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -125,3 +129,70 @@ async def test_update_not_valid_password(user_data):
     last_user_id = await users_service.get_user_id() - 1
     with pytest.raises(ValueError, match='String should have at least 8 character'):
         await users_service.update_user_profile(last_user_id, User(id=last_user_id, username="Noam", password=""))
+
+
+# Test that user existence checks are answered from the cache.
+@pytest.mark.asyncio
+async def test_user_exists_uses_cache():
+    """
+    Test that a second existence check for the same user does not query the database.
+    """
+    known_users.clear()
+    with patch.object(users_service.users, 'find_one', new_callable=AsyncMock,
+                      return_value={"_id": "a"}) as mock_find_one:
+        assert await users_service.user_exists(42) is True
+        assert await users_service.user_exists(42) is True
+    mock_find_one.assert_awaited_once()
+    known_users.clear()
+
+
+# Test that signing up takes a single write.
+@pytest.mark.asyncio
+async def test_signup_single_write(user_data):
+    """
+    Test that signup reports success from the insert, without reading the user back.
+    """
+    with patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=5), \
+            patch.object(users_service.users, 'insert_one', new_callable=AsyncMock,
+                         return_value=InsertOneResult("oid", True)) as mock_insert_one, \
+            patch.object(users_service.users, 'find_one', new_callable=AsyncMock) as mock_find_one:
+        assert await users_service.signup(user_data) is True
+    mock_insert_one.assert_awaited_once_with({"id": 5, "username": "Miryam", "password": "Mv1813243"})
+    mock_find_one.assert_not_called()
+
+
+# Test that an unacknowledged signup is not reported as successful.
+@pytest.mark.asyncio
+async def test_signup_unacknowledged(user_data):
+    """
+    Test that signup returns False when the write concern does not acknowledge the insert.
+    """
+    with patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=5), \
+            patch.object(users_service.users, 'insert_one', new_callable=AsyncMock,
+                         return_value=InsertOneResult("oid", False)):
+        assert await users_service.signup(user_data) is False
+
+
+# Test signing up with a username that is taken.
+@pytest.mark.asyncio
+async def test_signup_duplicate_username(user_data):
+    """
+    Test that signup returns False when the insert hits the unique username index.
+    """
+    with patch('app.services.counters_service.allocate_ids', new_callable=AsyncMock, return_value=5), \
+            patch.object(users_service.users, 'insert_one', new_callable=AsyncMock,
+                         side_effect=DuplicateKeyError("duplicate username")):
+        assert await users_service.signup(user_data) is False
+
+
+# Test that updating a profile takes a single round-trip.
+@pytest.mark.asyncio
+async def test_update_user_profile_single_round_trip(user_data):
+    """
+    Test that the updated user is the document returned by find_one_and_update, and None for unknown users.
+    """
+    with patch.object(users_service.users, 'find_one_and_update', new_callable=AsyncMock,
+                      return_value={"_id": "a", "id": 1, "username": "Miryam", "password": "Mv1813243"}):
+        assert await users_service.update_user_profile(1, user_data) == user_data
+    with patch.object(users_service.users, 'find_one_and_update', new_callable=AsyncMock, return_value=None):
+        assert await users_service.update_user_profile(999, user_data) is None
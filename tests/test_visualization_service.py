@@ -1,11 +1,15 @@
+import base64
+import io
+import json
+import zipfile
 import pytest
-from datetime import datetime
+from datetime import datetime, timezone
 from unittest.mock import patch, AsyncMock
+from fastapi import HTTPException
 from starlette.responses import StreamingResponse
 from app.models.operation import Operation
 from app.models.operation_type import Operation_type
 from app.services.visualization_service import (
-    fetch_operations,
     calculate_sums,
     get_expenses_and_revenues_by_month,
     get_expenses_against_revenues_by_month,
@@ -13,219 +17,323 @@ from app.services.visualization_service import (
     get_yearly_graph,
     get_balance_divide_to_months,
     get_balances_yearly_graph,
-    get_balance_yearly_bar
+    get_balance_yearly_bar,
+    get_monthly_series,
+    get_totals_by_bucket,
+    get_running_balance,
+    get_dashboard
 )
 
-# Mock data for operations
+# Mock operations, for the functions that take operations directly
 mock_operations = [
     Operation(id=1, sum=100.0, userId=1, type=Operation_type.EXPENSE, date=datetime.now()),
     Operation(id=2, sum=500.0, userId=1, type=Operation_type.REVENUE, date=datetime.now())
-    # Add more mock data as needed
 ]
 
 
-# Fixture to provide mock operations data
-@pytest.fixture
-def mock_operations_data():
-    """
-    Fixture to provide mock operations data for testing.
-
-    Returns:
-        list: A list of mock Operation objects.
-    """
-    return mock_operations
+# Mock data for the monthly totals of a year
+mock_monthly_totals = [
+    {"month": 5, "type": "expense", "total": 100.0},
+    {"month": 5, "type": "revenue", "total": 500.0},
+    {"month": 6, "type": "revenue", "total": 40.0}
+]
 
 
-# Fixture to patch the operations_service methods
+# Fixture to patch the rollup_service monthly totals
 @pytest.fixture(autouse=True)
-def mock_operations_service():
+def mock_get_monthly_totals():
     """
-    Fixture to patch the operations_service methods with AsyncMock.
+    Fixture to patch rollup_service.get_monthly_totals with AsyncMock returning mock_monthly_totals.
 
     Yields:
-        tuple: A tuple containing the patched get_all_operations and get_all_operations_between_dates methods.
-    """
-    with patch('app.services.operations_service.get_all_operations', new_callable=AsyncMock) as mock_get_all_operations:
-        with patch('app.services.operations_service.get_all_operations_between_dates',
-                   new_callable=AsyncMock) as mock_get_all_operations_between_dates:
-            yield mock_get_all_operations, mock_get_all_operations_between_dates
-
-
-# Test the fetch_operations function
-@pytest.mark.asyncio
-async def test_fetch_operations(mock_operations_service, mock_operations_data):
-    """
-    Test fetching all operations for a given user.
-
-    Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
+        AsyncMock: The patched get_monthly_totals method.
     """
-    mock_get_all_operations, _ = mock_operations_service
-    mock_get_all_operations.return_value = mock_operations_data
-
-    user_id = 1
-    operations = await fetch_operations(user_id)
-    assert operations == mock_operations_data
-
-
-# Test the fetch_operations function with date range
-@pytest.mark.asyncio
-async def test_fetch_operations_with_dates(mock_operations_service, mock_operations_data):
-    """
-    Test fetching operations for a given user within a date range.
-
-    Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
-    """
-    _, mock_get_all_operations_between_dates = mock_operations_service
-    mock_get_all_operations_between_dates.return_value = mock_operations_data
-
-    user_id = 1
-    start_date = '2023-01-01'
-    end_date = '2023-01-31'
-    operations = await fetch_operations(user_id, start_date, end_date)
-    assert operations == mock_operations_data
+    with patch('app.services.rollup_service.get_monthly_totals', new_callable=AsyncMock,
+               return_value=mock_monthly_totals) as mock:
+        yield mock
 
 
 # Test the calculate_sums function
-def test_calculate_sums(mock_operations_data):
+def test_calculate_sums():
     """
     Test calculating the sum of operations for a given type.
-
-    Args:
-        mock_operations_data (list): The mock operations data.
     """
-    result = calculate_sums(mock_operations_data, Operation_type.REVENUE)
+    result = calculate_sums(mock_operations, Operation_type.REVENUE)
     assert result == 500
 
-    result = calculate_sums(mock_operations_data, Operation_type.EXPENSE)
+    result = calculate_sums(mock_operations, Operation_type.EXPENSE)
     assert result == 100
 
 
 # Test the get_expenses_and_revenues_by_month function
 @pytest.mark.asyncio
-async def test_get_expenses_and_revenues_by_month(mock_operations_service, mock_operations_data):
+async def test_get_expenses_and_revenues_by_month(mock_get_monthly_totals):
     """
     Test fetching expenses and revenues by month for a given user.
 
     Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
+        mock_get_monthly_totals (AsyncMock): The patched get_monthly_totals method.
     """
-    mock_get_all_operations, _ = mock_operations_service
-    mock_get_all_operations.return_value = mock_operations_data
-
     user_id = 1
-    expenses, revenues = await get_expenses_and_revenues_by_month(user_id, '05')
+    expenses, revenues = await get_expenses_and_revenues_by_month(user_id, '05', 2024)
     assert revenues[4] == 500
     assert expenses[4] == 100
+    assert sum(revenues) == 500
+    mock_get_monthly_totals.assert_awaited_with(user_id, 2024)
 
 
 # Test the get_expenses_against_revenues_by_month function
 @pytest.mark.asyncio
-async def test_get_expenses_against_revenues_by_month(mock_operations_service, mock_operations_data):
+async def test_get_expenses_against_revenues_by_month(mock_get_monthly_totals):
     """
     Test fetching expenses against revenues by month for a given user.
 
     Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
+        mock_get_monthly_totals (AsyncMock): The patched get_monthly_totals method.
     """
-    mock_get_all_operations, _ = mock_operations_service
-    mock_get_all_operations.return_value = mock_operations_data
-
     user_id = 1
     response = await get_expenses_against_revenues_by_month(user_id, '05')
     assert isinstance(response, StreamingResponse)
+    mock_get_monthly_totals.assert_awaited_with(user_id, datetime.now().year)
 
 
 # Test the get_expenses_against_revenues_by_month_all_year function
 @pytest.mark.asyncio
-async def test_get_expenses_against_revenues_by_month_all_year(mock_operations_service, mock_operations_data):
+async def test_get_expenses_against_revenues_by_month_all_year(mock_get_monthly_totals):
     """
     Test fetching expenses against revenues for the entire year for a given user.
 
     Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
+        mock_get_monthly_totals (AsyncMock): The patched get_monthly_totals method.
     """
-    mock_get_all_operations, _ = mock_operations_service
-    mock_get_all_operations.return_value = mock_operations_data
-
     user_id = 1
     response = await get_expenses_against_revenues_by_month_all_year(user_id)
     assert isinstance(response, StreamingResponse)
+    mock_get_monthly_totals.assert_awaited_with(user_id, datetime.now().year)
 
 
 # Test the get_yearly_graph function
 @pytest.mark.asyncio
-async def test_get_yearly_graph(mock_operations_service, mock_operations_data):
+async def test_get_yearly_graph(mock_get_monthly_totals):
     """
     Test fetching the yearly graph for a given user.
 
     Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
+        mock_get_monthly_totals (AsyncMock): The patched get_monthly_totals method.
     """
-    mock_get_all_operations, _ = mock_operations_service
-    mock_get_all_operations.return_value = mock_operations_data
-
     user_id = 1
     response = await get_yearly_graph(user_id)
     assert isinstance(response, StreamingResponse)
+    mock_get_monthly_totals.assert_awaited_with(user_id, datetime.now().year)
 
 
 # Test the get_balance_divide_to_months function
 @pytest.mark.asyncio
-async def test_get_balance_divide_to_months(mock_operations_service, mock_operations_data):
+async def test_get_balance_divide_to_months():
     """
     Test calculating the monthly balances for a given user.
-
-    Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
     """
-    mock_get_all_operations, _ = mock_operations_service
-    mock_get_all_operations.return_value = mock_operations_data
-
     user_id = 1
     balances = await get_balance_divide_to_months(user_id)
-    assert balances[4] == 400  # Revenue - Expense for January
+    assert balances[4] == 400  # Revenue - Expense for May
 
 
 # Test the get_balances_yearly_graph function
 @pytest.mark.asyncio
-async def test_get_balances_yearly_graph(mock_operations_service, mock_operations_data):
+async def test_get_balances_yearly_graph(mock_get_monthly_totals):
     """
     Test fetching the yearly balances graph for a given user.
 
     Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
+        mock_get_monthly_totals (AsyncMock): The patched get_monthly_totals method.
     """
-    mock_get_all_operations, _ = mock_operations_service
-    mock_get_all_operations.return_value = mock_operations_data
-
     user_id = 1
     response = await get_balances_yearly_graph(user_id)
     assert isinstance(response, StreamingResponse)
+    mock_get_monthly_totals.assert_awaited_with(user_id, datetime.now().year)
 
 
 # Test the get_balance_yearly_bar function
 @pytest.mark.asyncio
-async def test_get_balance_yearly_bar(mock_operations_service, mock_operations_data):
+async def test_get_balance_yearly_bar(mock_get_monthly_totals):
     """
     Test fetching the yearly balance bar chart for a given user.
 
     Args:
-        mock_operations_service (tuple): The patched operations_service methods.
-        mock_operations_data (list): The mock operations data.
+        mock_get_monthly_totals (AsyncMock): The patched get_monthly_totals method.
     """
-    mock_get_all_operations, _ = mock_operations_service
-    mock_get_all_operations.return_value = mock_operations_data
-
     user_id = 1
     response = await get_balance_yearly_bar(user_id)
     assert isinstance(response, StreamingResponse)
+    mock_get_monthly_totals.assert_awaited_with(user_id, datetime.now().year)
+
+
+# Test that a chart the client already has is not rendered again.
+@pytest.mark.asyncio
+async def test_chart_not_modified():
+    """
+    Test that the ETag of a chart answers 304 to a matching If-None-Match without rendering.
+    """
+    response = await get_balance_yearly_bar(1)
+    etag = response.headers["etag"]
+    with patch('app.services.render_pool.render', new_callable=AsyncMock) as mock_render:
+        not_modified = await get_balance_yearly_bar(1, if_none_match=etag)
+        cached = await get_balance_yearly_bar(1)
+    assert not_modified.status_code == 304
+    assert cached.headers["etag"] == etag
+    mock_render.assert_not_called()
+
+
+# Test that charts are drawn from the monthly totals.
+@pytest.mark.asyncio
+async def test_chart_reads_monthly_totals(mock_get_monthly_totals):
+    """
+    Test that a chart changes with the monthly totals it is drawn from.
+
+    Args:
+        mock_get_monthly_totals (AsyncMock): The patched get_monthly_totals method.
+    """
+    response = await get_balance_yearly_bar(1, format="svg")
+    mock_get_monthly_totals.return_value = mock_monthly_totals + [{"month": 7, "type": "expense", "total": 25.0}]
+    changed = await get_balance_yearly_bar(1, format="svg")
+    assert changed.headers["etag"] != response.headers["etag"]
+
+
+# Test rendering a chart as SVG.
+@pytest.mark.asyncio
+async def test_chart_svg():
+    """
+    Test that format='svg' serves an SVG image without using the render pool.
+    """
+    with patch('app.services.render_pool.render', new_callable=AsyncMock) as mock_render:
+        response = await get_balances_yearly_graph(1, format="svg")
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    assert response.media_type == "image/svg+xml"
+    assert body.startswith(b"<svg")
+    mock_render.assert_not_called()
+
+
+# Test that an unknown chart format is refused.
+@pytest.mark.asyncio
+async def test_chart_unknown_format():
+    """
+    Test that an unsupported format raises a 400 HTTPException.
+    """
+    with pytest.raises(HTTPException) as error:
+        await get_balance_yearly_bar(1, format="gif")
+    assert error.value.status_code == 400
+
+
+# Test the monthly series of a year.
+@pytest.mark.asyncio
+async def test_get_monthly_series(mock_get_monthly_totals):
+    """
+    Test that the monthly series are read from the monthly totals and answer 304 to their ETag.
+    """
+    response = await get_monthly_series(1, 2024)
+    series = json.loads(response.body)
+    assert series["year"] == 2024
+    assert series["months"][4] == "May"
+    assert series["expenses"][4] == 100
+    assert series["revenues"][5] == 40
+    assert series["balances"][4] == 400
+    mock_get_monthly_totals.assert_awaited_with(1, 2024)
+    not_modified = await get_monthly_series(1, 2024, if_none_match=response.headers["etag"])
+    assert not_modified.status_code == 304
+
+
+# Test the totals of a range by bucket.
+@pytest.mark.asyncio
+async def test_get_totals_by_bucket():
+    """
+    Test that the totals are read for the whole end day and bucketed by week.
+    """
+    documents = [{"date": int(datetime(2024, 1, 1, 10, tzinfo=timezone.utc).timestamp() * 1000), "sum": 20.0,
+                  "type": "expense"},
+                 {"date": int(datetime(2024, 1, 14, 23, tzinfo=timezone.utc).timestamp() * 1000), "sum": 50.0,
+                  "type": "revenue"}]
+    with patch('app.services.operations_service.get_operation_values', new_callable=AsyncMock,
+               return_value=documents) as mock_get_operation_values:
+        totals = await get_totals_by_bucket(1, "2024-01-01", "2024-01-14", "week")
+    mock_get_operation_values.assert_awaited_once_with(1, datetime(2024, 1, 1), datetime(2024, 1, 15))
+    assert totals == {"granularity": "week", "buckets": ["2024-01-01", "2024-01-08"],
+                      "expenses": [20.0, 0.0], "revenues": [0.0, 50.0], "balances": [-20.0, 50.0]}
+
+
+# Test that invalid bucketed aggregations are refused.
+@pytest.mark.asyncio
+async def test_get_totals_by_bucket_invalid():
+    """
+    Test that an unknown granularity, a reversed range, too many buckets and the last representable day
+    raise a 400 HTTPException.
+    """
+    for args in [("2024-01-01", "2024-12-31", "hour"), ("2024-12-31", "2024-01-01", "day"),
+                 ("1900-01-01", "2024-12-31", "day"), ("0001-01-01", "9999-12-31", "day"),
+                 ("9999-01-01", "9999-12-31", "month")]:
+        with pytest.raises(HTTPException) as error:
+            await get_totals_by_bucket(1, *args)
+        assert error.value.status_code == 400
+
+
+# Test the running balance of a range.
+@pytest.mark.asyncio
+async def test_get_running_balance():
+    """
+    Test that the balance is seeded from the earlier months and the operations of the first month before the range.
+    """
+    documents = [{"date": datetime(2024, 3, 2), "sum": 20.0, "type": "expense"},
+                 {"date": datetime(2024, 3, 10, 8), "sum": 50.0, "type": "revenue"},
+                 {"date": datetime(2024, 3, 11, 8), "sum": 5.0, "type": "expense"}]
+    with patch('app.services.rollup_service.get_balance_before', new_callable=AsyncMock,
+               return_value=1000.0) as mock_get_balance_before, \
+            patch('app.services.operations_service.get_operation_values', new_callable=AsyncMock,
+                  return_value=documents) as mock_get_operation_values:
+        balance = await get_running_balance(1, "2024-03-10", "2024-03-12")
+    mock_get_balance_before.assert_awaited_once_with(1, 2024, 3)
+    mock_get_operation_values.assert_awaited_once_with(1, datetime(2024, 3, 1), datetime(2024, 3, 13))
+    assert balance == {"granularity": "day", "opening_balance": 980.0,
+                       "buckets": ["2024-03-10", "2024-03-11", "2024-03-12"],
+                       "balances": [1030.0, 1025.0, 1025.0]}
+
+
+# Test the dashboard as JSON.
+@pytest.mark.asyncio
+async def test_get_dashboard(mock_get_monthly_totals):
+    """
+    Test that the dashboard reads the monthly totals once and includes the series and the requested charts.
+    """
+    response = await get_dashboard(1, 2024, ["balance_bar", "expenses_vs_revenues_graph"], format="svg")
+    dashboard = json.loads(response.body)
+    mock_get_monthly_totals.assert_awaited_once_with(1, 2024)
+    assert dashboard["balances"][4] == 400
+    assert sorted(dashboard["charts"]) == ["balance_bar", "expenses_vs_revenues_graph"]
+    chart = dashboard["charts"]["balance_bar"]
+    assert chart["media_type"] == "image/svg+xml"
+    assert base64.b64decode(chart["data"]).startswith(b"<svg")
+    not_modified = await get_dashboard(1, 2024, ["expenses_vs_revenues_graph", "balance_bar"], format="svg",
+                                       if_none_match=response.headers["etag"])
+    assert not_modified.status_code == 304
+
+
+# Test the dashboard as a zip archive.
+@pytest.mark.asyncio
+async def test_get_dashboard_zip():
+    """
+    Test that the zip bundle holds the series and a file per chart.
+    """
+    response = await get_dashboard(1, 2024, ["balance_graph"], format="svg", bundle="zip")
+    with zipfile.ZipFile(io.BytesIO(response.body)) as archive:
+        assert sorted(archive.namelist()) == ["balance_graph.svg", "series.json"]
+        assert json.loads(archive.read("series.json"))["revenues"][5] == 40
+    assert response.media_type == "application/zip"
+
+
+# Test that unknown dashboard charts are refused.
+@pytest.mark.asyncio
+async def test_get_dashboard_unknown_chart():
+    """
+    Test that an unknown chart name raises a 400 HTTPException.
+    """
+    with pytest.raises(HTTPException) as error:
+        await get_dashboard(1, 2024, ["pie"])
+    assert error.value.status_code == 400
@@ -1,17 +1,103 @@
+import atexit
+import json
 import logging
+import queue
+import random
+import reprlib
+import time
+import traceback
 from functools import wraps
-from fastapi import Request
+from logging.handlers import QueueHandler, QueueListener
+from fastapi import HTTPException, Request
 from typing import Callable
+from app import config
+
+# Summaries of arguments and results: a few items of each collection, and at most LOG_MAX_FIELD_LENGTH characters
+_summary = reprlib.Repr()
+_summary.maxlist = _summary.maxtuple = _summary.maxset = _summary.maxdict = 5
+_summary.maxstring = _summary.maxother = config.LOG_MAX_FIELD_LENGTH
+_summary.maxlevel = 3
+
+# Attributes of every log record, the other ones are structured fields given with extra=
+_record_attributes = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats log records as one JSON object per line, with the fields given in extra= as keys.
+    """
+
+    def format(self, record):
+        document = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        document.update((key, value) for key, value in vars(record).items() if key not in _record_attributes)
+        return json.dumps(document, default=str)
+
+
+def configure_logging():
+    """
+    Sends the log records of the process through a queue to a listener thread writing JSON lines to LOG_FILE,
+    so logging never waits on file I/O. Does nothing if logging is already configured.
+
+    Returns:
+    - QueueListener: The started listener, or None if logging was already configured.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    records = queue.SimpleQueue()
+    file_handler = logging.FileHandler(config.LOG_FILE)
+    file_handler.setFormatter(JsonFormatter())
+    listener = QueueListener(records, file_handler, respect_handler_level=True)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(config.LOG_LEVEL)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def summarize(value) -> str:
+    """
+    Summarizes a value for a log record, in time and size independent of the size of the value.
+
+    Parameters:
+    - value (Any): The value.
+
+    Returns:
+    - str: A truncated representation of the value.
+    """
+    return _summary.repr(value)[:config.LOG_MAX_FIELD_LENGTH]
+
+
+def sample_rate(route: str) -> float:
+    """
+    Gets the share of the calls of a route that are logged.
+
+    Parameters:
+    - route (str): The route template, e.g. '/operations/{operation_id}'.
+
+    Returns:
+    - float: The rate from LOG_SAMPLE_RATES, else LOG_SAMPLE_RATE.
+    """
+    return config.LOG_SAMPLE_RATES.get(route, config.LOG_SAMPLE_RATE)
+
 
 # Configure logging
-logging.basicConfig(filename='app.log', level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+listener = configure_logging()
+logger = logging.getLogger("requests")
 
 
 def log(func: Callable) -> Callable:
     """
     Decorator function to log information about function calls and their return values.
 
+    Each call is logged as one structured record with summaries of its arguments and result, for the
+    sampled share of the calls of its route. Unexpected errors are always logged.
+
     Parameters:
     - func (Callable): The function to be decorated.
 
@@ -32,18 +118,33 @@ def log(func: Callable) -> Callable:
         Returns:
         - Any: The return value of the decorated function.
         """
-        # Log the request method and path
-        logging.info(f"Request: {request.method} {request.url.path}")
-
-        # Log the function call with arguments
-        logging.info(f"Calling function '{func.__name__}' with arguments: {args} and keyword arguments: {kwargs}")
-
-        # Execute the function and capture the return value
-        result = await func(request, *args, **kwargs)
-
-        # Log the return value
-        logging.info(f"Function '{func.__name__}' returned: {result}")
-
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else request.url.path
+        sampled = logger.isEnabledFor(logging.INFO) and random.random() < sample_rate(route_path)
+        started = time.perf_counter()
+        try:
+            # Execute the function and capture the return value
+            result = await func(request, *args, **kwargs)
+        except Exception as error:
+            # Refused requests are logged like the others, unexpected errors always and with their traceback
+            expected = isinstance(error, HTTPException) and error.status_code < 500
+            if sampled or not expected:
+                fields = {
+                    "method": request.method, "route": route_path, "path": request.url.path,
+                    "function": func.__name__, "arguments": summarize(kwargs), "error": summarize(error),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+                }
+                if not expected:
+                    fields["traceback"] = traceback.format_exc()
+                logger.log(logging.INFO if expected else logging.ERROR, f"Function '{func.__name__}' failed",
+                           extra=fields)
+            raise
+        if sampled:
+            logger.info(f"Function '{func.__name__}' returned", extra={
+                "method": request.method, "route": route_path, "path": request.url.path, "function": func.__name__,
+                "arguments": summarize(kwargs), "result": summarize(result),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+            })
         return result
 
     return wrapper
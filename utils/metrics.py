@@ -0,0 +1,196 @@
+import bisect
+import threading
+import time
+from pymongo import monitoring
+from fastapi import Request
+
+# Default histogram buckets in seconds, from 1 millisecond to 10 seconds
+default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Histogram buckets of database commands in seconds, from 0.25 millisecond to 2.5 seconds
+command_buckets = (0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    """
+    Formats the labels of a sample in the Prometheus text format.
+    """
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """
+    A monotonically increasing count per combination of label values.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increments the count of the given label values.
+
+        Parameters:
+        - amount (float): The increment.
+        - **labels: A value for each label name.
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self):
+        """
+        Renders the counter in the Prometheus text format.
+
+        Returns:
+        - list: The lines of the counter.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    """
+    The distribution of observed values per combination of label values, in cumulative buckets.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=default_buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """
+        Records a value for the given label values.
+
+        Parameters:
+        - value (float): The observed value, e.g. a duration in seconds.
+        - **labels: A value for each label name.
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def expose(self):
+        """
+        Renders the histogram in the Prometheus text format.
+
+        Returns:
+        - list: The lines of the histogram.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics of the process.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """
+        Adds a metric to the exposition.
+
+        Parameters:
+        - metric (Counter | Histogram): The metric.
+
+        Returns:
+        - Counter | Histogram: The metric.
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self):
+        """
+        Renders every metric in the Prometheus text format.
+
+        Returns:
+        - str: The exposition.
+        """
+        return "\n".join(line for metric in self._metrics for line in metric.expose()) + "\n"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Records the latency of every database command, from the driver's command events.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongodb_command_duration.observe(event.duration_micros / 1e6, command=event.command_name, outcome="success")
+
+    def failed(self, event):
+        mongodb_command_duration.observe(event.duration_micros / 1e6, command=event.command_name, outcome="failure")
+
+
+# Metrics of this process
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to the response headers of HTTP requests by route.", ("method", "route")))
+chart_render_duration = registry.register(Histogram(
+    "chart_render_duration_seconds", "Time to render a chart that was not cached.", ("chart", "format")))
+mongodb_command_duration = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "Round-trip time of database commands.", ("command", "outcome"),
+    buckets=command_buckets))
+
+# Listener registered on the database client
+command_metrics = CommandMetrics()
+
+
+async def metrics_middleware(request: Request, call_next):
+    """
+    Middleware recording the count and latency of every request, by route template and status.
+
+    Parameters:
+    - request (Request): The incoming request.
+    - call_next (Callable): The rest of the application.
+
+    Returns:
+    - Response: The response of the application.
+    """
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        http_request_duration.observe(time.perf_counter() - started, method=request.method, route=route_path)
+        http_requests.inc(method=request.method, route=route_path, status=str(status))
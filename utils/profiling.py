@@ -0,0 +1,174 @@
+import cProfile
+import contextvars
+import itertools
+import pstats
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from pymongo import monitoring
+from fastapi import Request
+from app import config
+
+# Database commands of the request being profiled. Motor runs the driver in a thread pool with a copy of the
+# caller's context, so the command listener sees the variable of the request that sent the command.
+current_commands = contextvars.ContextVar("current_commands", default=None)
+
+
+class CommandTimings(monitoring.CommandListener):
+    """
+    Records the database commands of profiled requests, from the driver's command events.
+    """
+
+    def started(self, event):
+        commands = current_commands.get()
+        if commands is not None:
+            commands["started"][event.request_id] = (event.command_name, event.command.get(event.command_name))
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+    def _finish(self, event, outcome):
+        commands = current_commands.get()
+        if commands is not None:
+            name, target = commands["started"].pop(event.request_id, (event.command_name, None))
+            commands["finished"].append({"command": name, "collection": target if isinstance(target, str) else None,
+                                         "duration_ms": event.duration_micros / 1000, "outcome": outcome})
+
+
+class ProfileStore:
+    """
+    The latest request profiles of the process, the oldest ones are dropped beyond PROFILE_MAX_COUNT.
+    """
+
+    def __init__(self, max_count: int):
+        self._profiles = deque(maxlen=max_count)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict):
+        """
+        Stores a profile under a new id.
+
+        Parameters:
+        - profile (dict): The profile.
+
+        Returns:
+        - int: The id of the profile.
+        """
+        with self._lock:
+            profile["id"] = next(self._ids)
+            self._profiles.append(profile)
+        return profile["id"]
+
+    def get(self, profile_id: int):
+        """
+        Gets a stored profile.
+
+        Parameters:
+        - profile_id (int): The id of the profile.
+
+        Returns:
+        - dict: The profile, or None if it was dropped or never existed.
+        """
+        with self._lock:
+            return next((profile for profile in self._profiles if profile["id"] == profile_id), None)
+
+    def summaries(self):
+        """
+        Lists the stored profiles without their functions and commands, newest first.
+
+        Returns:
+        - list: The request, status, duration and database time of each profile.
+        """
+        with self._lock:
+            profiles = list(self._profiles)
+        return [{key: value for key, value in profile.items() if key not in ("functions", "commands")}
+                for profile in reversed(profiles)]
+
+
+def function_rows(profiler: cProfile.Profile):
+    """
+    Extracts the functions that took the most time, including their callees, from a profiler.
+
+    Parameters:
+    - profiler (cProfile.Profile): The stopped profiler.
+
+    Returns:
+    - list: Up to PROFILE_MAX_FUNCTIONS functions with their calls, own time and cumulative time in milliseconds.
+    """
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:config.PROFILE_MAX_FUNCTIONS]
+    return [{"function": pstats.func_std_string(function), "calls": calls,
+             "own_ms": round(own * 1000, 3), "cumulative_ms": round(cumulative * 1000, 3)}
+            for function, (_, calls, own, cumulative, _) in rows]
+
+
+def profile_requested(request: Request) -> bool:
+    """
+    Tells whether a request is profiled: it carries ADMIN_TOKEN in an X-Profile header, or it is among the
+    PROFILE_SAMPLE_RATE share of the requests. The token is never taken from the URL, which ends up in logs.
+
+    Parameters:
+    - request (Request): The incoming request.
+
+    Returns:
+    - bool: Whether to profile the request.
+    """
+    token = request.headers.get("x-profile")
+    if token and config.ADMIN_TOKEN and secrets.compare_digest(token, config.ADMIN_TOKEN):
+        return True
+    return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+
+# Profiles of this process, listener registered on the database client, and the lock held by the request
+# being profiled: the profiler of Python sees every task of the event loop, so one request is profiled at a time
+profiles = ProfileStore(config.PROFILE_MAX_COUNT)
+command_timings = CommandTimings()
+_profiling = threading.Lock()
+
+
+async def profiling_middleware(request: Request, call_next):
+    """
+    Middleware profiling the requests asking for it, with cProfile and the timings of their database commands.
+
+    The profile is stored for the /admin/profiles endpoints and its id is returned in an X-Profile-Id header.
+    While a request is profiled, the other requests asking for it are served without a profile.
+
+    Parameters:
+    - request (Request): The incoming request.
+    - call_next (Callable): The rest of the application.
+
+    Returns:
+    - Response: The response of the application.
+    """
+    if not profile_requested(request) or not _profiling.acquire(blocking=False):
+        return await call_next(request)
+    commands = {"started": {}, "finished": []}
+    token = current_commands.set(commands)
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    status = 500
+    try:
+        profiler.enable()
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - started
+        current_commands.reset(token)
+        _profiling.release()
+        route = request.scope.get("route")
+        profile_id = profiles.add({
+            "time": time.time(), "method": request.method, "path": request.url.path,
+            "route": route.path if route is not None else "unmatched", "status": status,
+            "duration_ms": round(duration * 1000, 3), "command_count": len(commands["finished"]),
+            "command_ms": round(sum(command["duration_ms"] for command in commands["finished"]), 3),
+            "functions": function_rows(profiler), "commands": commands["finished"]
+        })
+    response.headers["X-Profile-Id"] = str(profile_id)
+    return response